@@ -0,0 +1,93 @@
+# Compares EntityIndex against the per-market get_relevant_entities scan.
+# Run from the project root: python3 -m benchmarks.entity_index_benchmark
+import random
+import time
+from types import SimpleNamespace
+
+from data_analysis.data_analysis import DataAnalysis
+from data_analysis.entity_index import EntityIndex
+from benchmarks.synthetic import random_name, make_markets
+
+
+# Builds fake annotation entities: a mix of exact market names, misspelled
+# market names, Wikipedia-only matches and unrelated names. Unrelated names
+# mostly come from a recurring pool, the way the same people and places keep
+# showing up in the news.
+def make_articles(rng, markets, count, pool_size=300):
+    pool = [random_name(rng) for _ in range(pool_size)]
+    articles = []
+    for _ in range(count):
+        entities = []
+        for _ in range(rng.randint(1, 4)):
+            roll = rng.random()
+            market = rng.choice(markets)
+            if roll < 0.2:
+                entities.append(SimpleNamespace(name=market["entities"][0], wikipedia_url=None))
+            elif roll < 0.3:
+                name = market["entities"][0]
+                at = rng.randrange(len(name))
+                entities.append(SimpleNamespace(name=name[:at] + name[at + 1:], wikipedia_url=None))
+            elif roll < 0.4:
+                entities.append(SimpleNamespace(name=random_name(rng), wikipedia_url=market["wikipedia_urls"][0].upper()))
+            elif roll < 0.9:
+                entities.append(SimpleNamespace(name=rng.choice(pool), wikipedia_url=None))
+            else:
+                entities.append(SimpleNamespace(name=random_name(rng), wikipedia_url=None))
+        articles.append(entities)
+
+    return articles
+
+
+def scan(markets, entities):
+    markets_and_entities = []
+    for market in markets:
+        relevant_entities = DataAnalysis.get_relevant_entities(None, entities, market["entities"], market["wikipedia_urls"])
+        if relevant_entities:
+            markets_and_entities.append([relevant_entities, market])
+
+    return markets_and_entities
+
+
+def matched_ids(markets_and_entities):
+    return [(market["contract_id"], sorted(set(entities))) for entities, market in markets_and_entities]
+
+
+def run(market_counts=(10, 100, 1000), num_articles=500, seed=0):
+    results = []
+    for market_count in market_counts:
+        rng = random.Random(seed)
+        markets = make_markets(rng, market_count)
+        articles = make_articles(rng, markets, num_articles)
+
+        start = time.perf_counter()
+        expected = [scan(markets, entities) for entities in articles]
+        scan_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = EntityIndex(markets)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = [index.relevant_markets(entities) for entities in articles]
+        index_seconds = time.perf_counter() - start
+
+        agree = sum(1 for a, b in zip(expected, actual) if matched_ids(a) == matched_ids(b))
+        results.append({
+            "markets": market_count,
+            "articles": num_articles,
+            "scan_ms_per_article": scan_seconds * 1000 / num_articles,
+            "index_ms_per_article": index_seconds * 1000 / num_articles,
+            "index_build_ms": build_seconds * 1000,
+            "speedup": scan_seconds / index_seconds if index_seconds else float("inf"),
+            "agreement": agree / num_articles
+        })
+
+    return results
+
+
+if __name__ == "__main__":
+    print("markets  scan ms/article  index ms/article  build ms  speedup  agreement")
+    for result in run():
+        print("%7d  %15.3f  %16.3f  %8.1f  %7.1f  %9.3f" % (
+            result["markets"], result["scan_ms_per_article"], result["index_ms_per_article"],
+            result["index_build_ms"], result["speedup"], result["agreement"]))
@@ -0,0 +1,85 @@
+# Per-call timings of the hot analysis and de-dup functions on synthetic data.
+# Run from the project root: python3 -m benchmarks.micro_benchmark
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import make_markets, make_articles, make_config, make_model
+from data_analysis.annotation_cache import CachedAnnotator
+from data_analysis.data_analysis import DataAnalysis
+from data_analysis.fake_annotator import FakeAnnotator
+from data_input.deduplicator import Deduplicator, normalize_title
+from data_input.seen_store import SeenStore
+
+
+# Best of `repeat` passes over items, in microseconds per call.
+# setup, if given, is called before each pass and returns the function to time.
+def time_per_call(function, items, repeat=3, setup=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            function = setup()
+
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1000000 / len(items)
+
+
+def run(num_markets=20, num_articles=500, seed=0):
+    rng = random.Random(seed)
+    markets = make_markets(rng, num_markets, keywords=3)
+    articles = make_articles(rng, markets, num_articles)
+
+    with tempfile.TemporaryDirectory() as work_path:
+        config = make_config(markets, work_path)
+        analysis = DataAnalysis(config, None, None, None, load_model=False, annotator=CachedAnnotator(FakeAnnotator.from_markets(markets)))
+        analysis.scaler = None
+        analysis.model = make_model(seed)
+
+        responses = [analysis.analyze_text_google_cloud(article) for article in articles]
+
+        # Every relevant (relevant entities, market, annotation, article)
+        pairs = []
+        for article, response in zip(articles, responses):
+            for relevant_entities, market in analysis.get_relevant_markets(response["entities"]):
+                pairs.append((relevant_entities, market, response, article))
+
+        # Warm the synset and feature caches, as a long-running worker's would be
+        for pair in pairs:
+            analysis.article_features(*pair)
+
+        def scan_markets(response):
+            for market in markets:
+                analysis.get_relevant_entities(response["entities"], market["entities"], market["wikipedia_urls"])
+
+        runs = [0]
+
+        def fresh_deduplicator():
+            runs[0] += 1
+            store = SeenStore(os.path.join(work_path, "seen" + str(runs[0]) + ".log"), normalize=normalize_title)
+            deduplicator = Deduplicator(store)
+            return lambda article: deduplicator.add(article["title"], "benchmark")
+
+        results = {
+            "markets": num_markets,
+            "articles": num_articles,
+            "relevant_pairs": len(pairs),
+            "annotate_fake_us": time_per_call(analysis.analyze_text_google_cloud, articles),
+            "get_relevant_entities_all_markets_us": time_per_call(scan_markets, responses),
+            "get_relevant_markets_us": time_per_call(lambda response: analysis.get_relevant_markets(response["entities"]), responses),
+            "article_features_us": time_per_call(lambda pair: analysis.article_features(*pair), pairs),
+            "score_article_us": time_per_call(lambda pair: analysis.score_article(*pair), pairs),
+            "score_batch_us_per_pair": time_per_call(lambda batch: analysis.score_features_batch(analysis.pair_features(batch)), [[(pair[3], pair[1]) for pair in pairs]]) / max(1, len(pairs)),
+            "dedup_add_us": time_per_call(None, articles, setup=fresh_deduplicator)
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,185 @@
+# End-to-end throughput of the Bot's process topology, headless.
+# Runs DataInput -> DataAnalysis workers -> Trader as in Bot.__init__, with the
+# external services stubbed: NewsApiStub for newsapi.org, FakeAnnotator for
+# Google Cloud, SimulatedWebInterface for the broker and a synthetic model.
+# Run from the project root: python3 -m benchmarks.pipeline_benchmark
+#
+# "queue" mode fills the article queue directly and measures how fast the
+# analysis workers drain it; "news_api" mode publishes to the stub at a fixed
+# rate and measures what DataInput delivers.
+import json
+import os
+import queue
+import random
+import tempfile
+import time
+from multiprocessing import Process, Queue
+
+import arrow
+
+from benchmarks.synthetic import make_markets, make_articles, make_config, make_model, SOURCES
+from data_analysis.annotation_cache import CachedAnnotator
+from data_analysis.data_analysis import DataAnalysis
+from data_analysis.fake_annotator import FakeAnnotator
+from data_input.data_input import DataInput
+from data_input.news_api_stub import NewsApiStub
+from logger import Logger, format_record, SOURCE, TYPE, MESSAGE, ARGS
+from messages import ArticleCodec, ResultCodec
+from metrics import Metrics, mark
+from trader.simulated_web_interface import SimulatedWebInterface
+from trader.position_store import PositionStore
+from trader.trader import Trader
+from transport import MessageQueue
+
+
+class Pipeline:
+
+    def __init__(self, config, markets, num_workers, with_input, work_path):
+        self.message_queue = Queue()
+        self.article_queue = MessageQueue.from_config(config, "article_queue", ArticleCodec())
+        self.result_queue = MessageQueue.from_config(config, "result_queue", ResultCodec(config["markets"]))
+        self.logger = Logger(self.message_queue)
+        self.metrics = Metrics()
+        self.analyzed = 0
+        self.traded = 0
+
+        self.processes = []
+        if with_input:
+            scraper = DataInput(self.article_queue, self.logger, config)
+            self.processes.append(Process(target=scraper.run))
+
+        for _ in range(num_workers):
+            analysis = DataAnalysis(config, self.logger, self.article_queue, self.result_queue, load_model=False, annotator=CachedAnnotator(FakeAnnotator.from_markets(markets)))
+            analysis.scaler = None
+            analysis.model = make_model()
+            self.processes.append(Process(target=analysis.run))
+
+        trader = Trader(self.result_queue, self.logger, config, web_interface=SimulatedWebInterface(), positions=PositionStore(os.path.join(work_path, "positions.db")))
+        self.processes.append(Process(target=trader.run))
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+
+    # Drains log records for up to `timeout` seconds, counting analyzed and
+    # traded articles from their timing metrics
+    def drain(self, timeout):
+        try:
+            records = self.message_queue.get(True, timeout)
+        except queue.Empty:
+            return
+
+        for record in records:
+            if record[TYPE] == "metric" and record[MESSAGE] == "timings":
+                self.metrics.record_timings(record[ARGS][0])
+                if record[SOURCE] == "Data Analysis":
+                    self.analyzed += 1
+                else:
+                    self.traded += 1
+            elif record[TYPE] == "error":
+                print(format_record(record))
+
+    def wait_for(self, count, timeout):
+        deadline = time.time() + timeout
+        while self.analyzed < count and time.time() < deadline:
+            self.drain(0.1)
+
+
+def latency_summary(metrics):
+    return {name: stage for name, stage in metrics.snapshot()["stages"].items() if stage["count"]}
+
+
+# Fills the article queue with num_articles unique articles and times how long
+# the workers take to analyze them all
+def run_queue(config, markets, articles, num_workers, work_path, timeout=300):
+    pipeline = Pipeline(config, markets, num_workers, False, work_path)
+    pipeline.start()
+
+    start = time.time()
+    for article in articles:
+        mark(article, "received")
+        pipeline.article_queue.put(article)
+
+    pipeline.wait_for(len(articles), timeout)
+    elapsed = time.time() - start
+    pipeline.stop()
+
+    return {
+        "mode": "queue",
+        "workers": num_workers,
+        "articles": len(articles),
+        "analyzed": pipeline.analyzed,
+        "results": pipeline.traded,
+        "seconds": elapsed,
+        "articles_per_second": pipeline.analyzed / elapsed,
+        "latency": latency_summary(pipeline.metrics)
+    }
+
+
+# Publishes articles to the NewsAPI stub at `rate` per second for `duration`
+# seconds, then waits `settle` seconds for the pipeline to catch up
+def run_news_api(config, markets, articles, num_workers, work_path, rate, duration, settle=5, latency=0.02):
+    stub = NewsApiStub(latency=latency)
+    config["data_input"]["news_api"]["base_uri"] = stub.start()
+    pipeline = Pipeline(config, markets, num_workers, True, work_path)
+    pipeline.start()
+
+    rng = random.Random(0)
+    published = 0
+    start = time.time()
+    while time.time() - start < duration and published < len(articles):
+        due = int((time.time() - start) * rate) + 1
+        while published < min(due, len(articles)):
+            article = dict(articles[published])
+            article["publishedAt"] = str(arrow.utcnow())
+            stub.publish(rng.choice(config["data_input"]["sources"]), article)
+            published += 1
+
+        pipeline.drain(0.01)
+
+    deadline = time.time() + settle
+    while time.time() < deadline:
+        pipeline.drain(0.1)
+
+    elapsed = time.time() - start
+    pipeline.stop()
+    stub.stop()
+
+    return {
+        "mode": "news_api",
+        "workers": num_workers,
+        "offered_per_second": rate,
+        "published": published,
+        "analyzed": pipeline.analyzed,
+        "results": pipeline.traded,
+        "seconds": elapsed,
+        "latency": latency_summary(pipeline.metrics)
+    }
+
+
+def run(worker_counts=(1, 2, 4), num_markets=20, num_articles=2000, rate=50, duration=10, seed=0):
+    rng = random.Random(seed)
+    markets = make_markets(rng, num_markets, keywords=3)
+    articles = make_articles(rng, markets, num_articles, duplicate_fraction=0)
+
+    results = []
+    for num_workers in worker_counts:
+        with tempfile.TemporaryDirectory() as work_path:
+            config = make_config(markets, work_path, num_workers=num_workers)
+            results.append(run_queue(config, markets, [dict(article) for article in articles], num_workers, work_path))
+
+    with tempfile.TemporaryDirectory() as work_path:
+        config = make_config(markets, work_path, sources=SOURCES, num_workers=worker_counts[0])
+        results.append(run_news_api(config, markets, articles, worker_counts[0], work_path, rate, duration))
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
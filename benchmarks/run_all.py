@@ -0,0 +1,79 @@
+# Runs every benchmark and writes the results as JSON, tagged with the commit,
+# so runs can be compared between commits.
+# Run from the project root:
+#   python3 -m benchmarks.run_all --output bench.json [--compare old.json]
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+from benchmarks import entity_index_benchmark, micro_benchmark, pipeline_benchmark, transport_benchmark
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Flattens nested results into {"a.b.c": number}, keying lists by position
+def flatten(results, prefix=""):
+    flat = {}
+    items = results.items() if isinstance(results, dict) else enumerate(results)
+    for key, value in items:
+        name = prefix + str(key)
+        if isinstance(value, (dict, list)):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+
+    return flat
+
+
+# Prints every numeric result next to the baseline's, with the ratio
+def compare(baseline, current):
+    old = flatten(baseline["results"])
+    new = flatten(current["results"])
+    print("Compared with " + str(baseline.get("commit")) + ":")
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name] / old[name] if old[name] else float("inf")
+        print("  %-70s %12.3f %12.3f %7.2fx" % (name, old[name], new[name], ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    parser.add_argument("--skip-pipeline", action="store_true", help="skip the multi-process benchmarks")
+    args = parser.parse_args()
+
+    results = {
+        "entity_index": entity_index_benchmark.run(),
+        "micro": micro_benchmark.run()
+    }
+    if not args.skip_pipeline:
+        results["pipeline"] = pipeline_benchmark.run()
+        results["transport"] = transport_benchmark.run()
+
+    report = {
+        "commit": current_commit(),
+        "time": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Synthetic markets, headlines and configs for the benchmarks.
+import arrow
+import numpy as np
+
+from data_analysis.fast_model import FastModel
+
+SYLLABLES = ["an", "ber", "cor", "dan", "el", "fin", "gar", "hol", "is", "jon", "kel", "lin",
+             "mar", "nor", "os", "per", "quin", "ros", "sten", "tor", "ul", "vin", "wes", "yor"]
+
+TARGET_WORDS = ["wins", "clinches", "secures", "leads", "gains", "takes", "captures"]
+ANTI_TARGET_WORDS = ["loses", "concedes", "withdraws", "trails", "drops", "quits", "falls"]
+NEUTRAL_WORDS = ["visits", "meets", "says", "speaks", "attends", "announces", "responds"]
+FILLER_WORDS = ["after", "state", "primary", "vote", "debate", "poll", "report", "officials", "rally",
+                "senate", "campaign", "amid", "questions", "over", "plan", "budget", "court", "ruling"]
+
+SOURCES = ["associated-press", "bbc-news", "bloomberg", "cnn", "reuters", "the-new-york-times", "the-washington-post", "usa-today"]
+
+
+def random_name(rng, words=2):
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize() for _ in range(words))
+
+
+# Markets with one entity each, and the first `keywords` target/anti-target words
+def make_markets(rng, count, keywords=1):
+    markets = []
+    for i in range(count):
+        name = random_name(rng, rng.randint(1, 3))
+        markets.append({
+            "contract_id": str(i),
+            "entities": [name],
+            "wikipedia_urls": ["http://en.wikipedia.org/wiki/" + name.replace(" ", "_").lower()],
+            "target_words": TARGET_WORDS[:keywords],
+            "anti_target_words": ANTI_TARGET_WORDS[:keywords]
+        })
+
+    return markets
+
+
+# Headline about a market's entity (with relevant_fraction probability) or
+# about someone unrelated, with a target, anti-target or neutral verb
+def make_headline(rng, markets, relevant_fraction=0.3):
+    if markets and rng.random() < relevant_fraction:
+        name = rng.choice(markets)["entities"][0]
+    else:
+        name = random_name(rng)
+
+    verb = rng.choice(rng.choice([TARGET_WORDS, ANTI_TARGET_WORDS, NEUTRAL_WORDS]))
+    filler = " ".join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(2, 6)))
+    return name + " " + verb + " " + filler
+
+
+# NewsAPI-shaped articles, published `interval` seconds apart ending now.
+# duplicate_fraction of them repeat an earlier headline (as a wire copy would).
+def make_articles(rng, markets, count, relevant_fraction=0.3, duplicate_fraction=0.1, interval=1.0):
+    start = arrow.utcnow().shift(seconds=-count * interval)
+    titles = []
+    articles = []
+    for i in range(count):
+        if titles and rng.random() < duplicate_fraction:
+            title = rng.choice(titles) + rng.choice(["", " - Reuters", " | CNN"])
+        else:
+            title = make_headline(rng, markets, relevant_fraction)
+            titles.append(title)
+
+        articles.append({
+            "author": random_name(rng),
+            "title": title,
+            "description": title + ".",
+            "url": "http://example.com/" + str(i),
+            "urlToImage": None,
+            "publishedAt": str(start.shift(seconds=i * interval))
+        })
+
+    return articles
+
+
+# Minimal config for DataAnalysis/DataInput/Trader over the given markets
+def make_config(markets, work_path, sources=SOURCES, num_workers=1):
+    return {
+        "markets": markets,
+        "data_input": {
+            "num_workers": 1,
+            "poll_interval": 0.5,
+            "min_poll_interval": 0.05,
+            "max_poll_interval": 1,
+            "max_backoff": 5,
+            "request_timeout": 5,
+            "poll_threads": len(sources),
+            "dedup": {
+                "path": work_path + "/articles.seen.log"
+            },
+            "news_api": {
+                "api_key": "benchmark"
+            },
+            "sources": list(sources)
+        },
+        "data_analysis": {
+            "num_workers": num_workers,
+            "model": "fast",
+            "annotation_cache": {
+                "path": work_path + "/annotations"
+            }
+        },
+        "trader": {
+            "user": "benchmark",
+            "pass": "benchmark"
+        },
+        "logging": {
+            "level": "informative"
+        }
+    }
+
+
+# Random linear FastModel with the production model's shape (4 features, 3
+# classes), so scoring can be benchmarked without a trained model on disk
+def make_model(seed=0):
+    rng = np.random.RandomState(seed)
+    return FastModel([0, 1, 2], rng.randn(3, 4), rng.randn(3))
@@ -0,0 +1,95 @@
+# Throughput and size of the messages passed between stages: results as
+# pickled dicts through a multiprocessing.Queue, one per put (how results were
+# sent before messages.py), against compact frames over the Queue fallback
+# and over the shared-memory ring buffer, one result or a batch per frame.
+# Run from the project root: python3 -m benchmarks.transport_benchmark
+import json
+import pickle
+import queue
+import random
+import time
+from multiprocessing import Process, Queue
+
+import numpy as np
+
+from benchmarks.synthetic import make_markets, make_articles
+from bounded_queue import BoundedQueue
+from messages import ResultCodec
+from metrics import mark
+from ring_buffer import RingBuffer
+from transport import MessageQueue
+
+
+# Results shaped like DataAnalysis's: a few markets per article, sharing the
+# article dict, with the timings marked so far
+def make_results(rng, markets, count):
+    articles = make_articles(rng, markets, count, duplicate_fraction=0)
+    results = []
+    for article in articles:
+        for name in ("published", "received", "analysis_dequeued", "annotated", "scored"):
+            mark(article, name)
+        for market in rng.sample(markets, 2):
+            results.append({"market": market, "article": article, "score": np.array([0.2, 0.3, 0.5])})
+            if len(results) == count:
+                return results
+    return results
+
+
+def send_plain(q, results, batch_size):
+    for result in results:
+        q.put(result)
+
+
+def send_batched(q, results, batch_size):
+    for start in range(0, len(results), batch_size):
+        q.put_many(results[start:start + batch_size])
+
+
+# Messages/second from a producer process to this one
+def throughput(q, send, results, batch_size, timeout=60):
+    producer = Process(target=send, args=(q, results, batch_size))
+    start = time.perf_counter()
+    producer.start()
+
+    received = 0
+    deadline = time.time() + timeout
+    while received < len(results) and time.time() < deadline:
+        try:
+            q.get(True, 1)
+            received += 1
+        except queue.Empty:
+            pass
+    elapsed = time.perf_counter() - start
+    producer.join()
+
+    return received / elapsed
+
+
+def run(num_markets=20, num_results=20000, batch_size=8, seed=0):
+    rng = random.Random(seed)
+    markets = make_markets(rng, num_markets, keywords=3)
+    results = make_results(rng, markets, num_results)
+    codec = ResultCodec(markets)
+
+    sample = results[:1000]
+    framed_bytes = sum(len(codec.encode(sample[start:start + batch_size])) for start in range(0, len(sample), batch_size))
+
+    return {
+        "results": len(results),
+        "batch_size": batch_size,
+        "bytes_per_message": {
+            "pickle": sum(len(pickle.dumps(result)) for result in sample) / len(sample),
+            "frame": sum(len(codec.encode([result])) for result in sample) / len(sample),
+            "frame_batched": framed_bytes / len(sample)
+        },
+        "messages_per_second": {
+            "queue_pickle": throughput(Queue(), send_plain, results, 1),
+            "queue_frame_batched": throughput(MessageQueue(BoundedQueue(), codec), send_batched, results, batch_size),
+            "ring_frame": throughput(MessageQueue(RingBuffer(), codec), send_plain, results, 1),
+            "ring_frame_batched": throughput(MessageQueue(RingBuffer(), codec), send_batched, results, batch_size)
+        }
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
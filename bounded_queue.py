@@ -0,0 +1,66 @@
+from multiprocessing import Queue, Value
+import queue
+
+# What put() does when the queue is full:
+#   block        wait for room (an unbounded queue never fills)
+#   drop_oldest  drop the oldest queued item to make room
+#   shed         drop the new item
+POLICIES = ("block", "drop_oldest", "shed")
+
+
+# Multiprocessing queue with a size limit and an overflow policy.
+# Drops are counted in shared memory so the main process can report them.
+class BoundedQueue:
+
+    def __init__(self, maxsize=0, policy="block"):
+        if policy not in POLICIES:
+            raise ValueError("Unknown queue policy: " + str(policy))
+
+        self.queue = Queue(maxsize)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = Value("i", 0)
+
+    # Reads config["queues"][name]: {"size": ..., "policy": ...}
+    @classmethod
+    def from_config(cls, config, name):
+        queue_config = config.get("queues", {}).get(name, {})
+        return cls(queue_config.get("size", 0), queue_config.get("policy", "block"))
+
+    # Returns True if the item was queued, False if it was shed
+    def put(self, item):
+        if self.policy == "block":
+            self.queue.put(item)
+            return True
+
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                if self.policy == "shed":
+                    self.record_drop()
+                    return False
+
+            try:
+                self.queue.get_nowait()
+                self.record_drop()
+            except queue.Empty:
+                # Another consumer got there first; just retry
+                pass
+
+    def record_drop(self):
+        with self.dropped.get_lock():
+            self.dropped.value += 1
+
+    def get(self, block=True, timeout=None):
+        return self.queue.get(block, timeout)
+
+    def get_nowait(self):
+        return self.queue.get_nowait()
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def empty(self):
+        return self.queue.empty()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+# Converts a Google Cloud Language annotate_text result into plain, JSON-able data
+def annotation_to_dict(annotations):
+    return {
+        "entities": [{
+            "name": entity.name,
+            "entity_type": getattr(entity, "entity_type", None),
+            "wikipedia_url": getattr(entity, "wikipedia_url", None),
+            "metadata": getattr(entity, "metadata", None) or {},
+            "salience": getattr(entity, "salience", None),
+            "mentions": [mention if isinstance(mention, str) else str(mention) for mention in getattr(entity, "mentions", None) or []]
+        } for entity in annotations.entities],
+        "tokens": [{
+            "text_content": getattr(token, "text_content", None),
+            "text_begin": getattr(token, "text_begin", None),
+            "part_of_speech": getattr(token, "part_of_speech", None),
+            "edge_index": getattr(token, "edge_index", None),
+            "edge_label": getattr(token, "edge_label", None),
+            "lemma": getattr(token, "lemma", None)
+        } for token in annotations.tokens],
+        "sentiment": {
+            "score": getattr(annotations.sentiment, "score", None),
+            "magnitude": getattr(annotations.sentiment, "magnitude", None)
+        } if annotations.sentiment is not None else None
+    }
+
+
+# Builds the response dict handed to the rest of DataAnalysis.
+# Entities/tokens/sentiment keep the attribute names of the Google objects.
+def annotation_from_dict(data):
+    return {
+        "entities": [SimpleNamespace(**entity) for entity in data["entities"]],
+        "tokens": [SimpleNamespace(**token) for token in data["tokens"]],
+        "sentiment": SimpleNamespace(**data["sentiment"]) if data["sentiment"] is not None else None
+    }
+
+
+# Disk-backed annotation cache, content-addressed by a hash of the text.
+# Each entry is its own file, written to a temp file and renamed into place,
+# so any number of worker processes can read and write the cache at once.
+class AnnotationCache:
+
+    # Run eviction after this many writes (per process)
+    EVICT_INTERVAL = 200
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, max_age=30 * 24 * 60 * 60):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.writes = 0
+
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get("data_analysis", {}).get("annotation_cache", {})
+        return cls(
+            cache_config.get("path", "db/annotations"),
+            max_bytes=int(cache_config.get("max_megabytes", 256) * 1024 * 1024),
+            max_age=cache_config.get("max_age_days", 30) * 24 * 60 * 60
+        )
+
+    def key(self, text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    # Returns the cached annotation for the text, or None
+    def get(self, text):
+        path = self.entry_path(self.key(text))
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                self.remove(path)
+                return None
+
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Missing, evicted by another worker, or half-written by a crashed one
+            return None
+
+    def put(self, text, data):
+        path = self.entry_path(self.key(text))
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_path, path)
+        except OSError:
+            self.remove(temp_path)
+            raise
+
+        self.writes += 1
+        if self.writes % self.EVICT_INTERVAL == 0:
+            self.evict()
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # Drops expired entries, then the oldest ones until the cache fits in max_bytes
+    def evict(self):
+        now = time.time()
+        entries = []
+        total = 0
+        for directory, _, files in os.walk(self.path):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                if now - stat.st_mtime > self.max_age:
+                    self.remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+
+            self.remove(path)
+            total -= size
+
+
+# Wraps an annotator (anything with annotate(text) returning annotation_to_dict
+# data) with an optional AnnotationCache
+class CachedAnnotator:
+
+    def __init__(self, annotator, cache=None):
+        self.annotator = annotator
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def annotate(self, text):
+        data = self.cache.get(text) if self.cache is not None else None
+        if data is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            data = self.annotator.annotate(text)
+            if self.cache is not None:
+                self.cache.put(text, data)
+
+        return annotation_from_dict(data)
@@ -1,39 +1,84 @@
+import os
+import queue
 import time
 
-from google.cloud import language
-from nltk.corpus import wordnet
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.externals import joblib
-from sklearn.multiclass import OneVsRestClassifier
-from sklearn import svm
-from sklearn import preprocessing
 from difflib import SequenceMatcher
+from data_analysis.synset_cache import SynsetCache
+from data_analysis.feature_engine import FeatureEngine
+from data_analysis.entity_index import EntityIndex
+from data_analysis.annotation_cache import AnnotationCache, CachedAnnotator
+from data_analysis.fast_model import FastModel, train_fast_model, compare_models
+from data_analysis.model_store import ModelStore
+from metrics import mark
+from supervisor import HEARTBEAT_INTERVAL
+
 class DataAnalysis:
 
-    def __init__(self, config, logger, article_queue, score_queue, load_model=True):
+    # Where models were saved before there was a ModelStore; still loaded
+    # until a version has been published
+    SCALER_PATH = "data_analysis/scaler.pkl"
+    MODEL_PATH = "data_analysis/model.pkl"
+    FAST_MODEL_PATH = "data_analysis/model_fast.npz"
+
+    # Hyperparameters tried by fit_model's grid search
+    PARAMETER_GRID = {
+        "estimator__C": [0.1, 1, 10, 100],
+        "estimator__gamma": ["auto", 0.01, 0.1, 1]
+    }
+
+    # How often (in articles) to log cache hit/miss counters
+    CACHE_STATS_INTERVAL = 100
+
+    def __init__(self, config, logger, article_queue, score_queue, load_model=True, annotator=None):
         self.config = config
         self.logger = logger
         self.article_queue = article_queue
         self.score_queue = score_queue
 
+        # Annotations are cached on disk and shared between workers, unless
+        # the caller passes in its own CachedAnnotator
+        if annotator is None:
+            from data_analysis.google_annotator import GoogleCloudAnnotator
+            annotator = GoogleCloudAnnotator()
+        if not isinstance(annotator, CachedAnnotator):
+            annotator = CachedAnnotator(annotator, AnnotationCache.from_config(config))
+        self.annotator = annotator
+
+        # Resolve every market's target words once, up front
+        self.synset_cache = SynsetCache(config["markets"])
+        self.feature_engine = FeatureEngine(self.synset_cache, config["markets"])
+        self.entity_index = EntityIndex(config["markets"])
+        self.articles_handled = 0
+
+        # Micro-batching: score up to max_batch_size articles together, waiting
+        # at most max_batch_wait seconds after the first one for the rest
+        self.max_batch_size = config["data_analysis"].get("max_batch_size", 8)
+        self.max_batch_wait = config["data_analysis"].get("max_batch_wait", 0.01)
+
+        # Models are published to the store by training; workers check for a
+        # new version every model_check_interval seconds, between batches
+        self.model_store = ModelStore(config["data_analysis"].get("model_path", ModelStore.ROOT))
+        self.model_version = None
+        self.model_check_interval = config["data_analysis"].get("model_check_interval", 5)
+        self.next_model_check = 0
+
         if load_model:
             self.load_model()
 
-    # For use during training
-    def create_model(self, training_articles):
-        model = OneVsRestClassifier(svm.SVC(probability=True))
-
+    # For use during training.
+    # fast_model ("linear" or "rff") also trains and exports a FastModel,
+    # and reports its accuracy and latency against the SVC.
+    # See data_analysis/training.py for the parallel, cached entry point.
+    def create_model(self, training_articles, fast_model=None):
         features = []
         labels = []
         i = 0
         for article in training_articles:
             print("Generating features for article " + str(i) + "...")
-            google_cloud_response = self.analyze_text_google_cloud(article["article"])
-            relevant_entities = self.get_relevant_entities(google_cloud_response["entities"], article["market"]["entities"], article["market"]["wikipedia_urls"])
+            article_features = self.training_features(article)
 
             # Only count this article if a relevant entity is present
-            if relevant_entities:
-                article_features = self.article_features(relevant_entities, article["market"], google_cloud_response, article["article"])
+            if article_features is not None:
                 features.append(article_features)
                 labels.append(article["label"])
             else:
@@ -41,66 +86,233 @@ class DataAnalysis:
 
             i = i + 1
 
+        self.fit_model(features, labels, fast_model=fast_model)
+
+        print("Annotation cache: " + str(self.annotator.hits) + " hits, " + str(self.annotator.misses) + " misses")
+        print("Done!")
+
+    # Features for one training example, or None if it has no relevant entity
+    def training_features(self, article):
+        google_cloud_response = self.analyze_text_google_cloud(article["article"])
+        relevant_entities = self.get_relevant_entities(google_cloud_response["entities"], article["market"]["entities"], article["market"]["wikipedia_urls"])
+
+        if not relevant_entities:
+            return None
+
+        return self.article_features(relevant_entities, article["market"], google_cloud_response, article["article"])
+
+    # Fits the scaler and SVC and publishes them as a new model version.
+    # With folds, C/gamma are picked by a cross-validated grid search run
+    # across `workers` processes.
+    def fit_model(self, features, labels, fast_model=None, folds=None, workers=1):
+        from sklearn.multiclass import OneVsRestClassifier
+        from sklearn import svm
+        from sklearn import preprocessing
+
         print("Performing feature scaling...")
         scaler = preprocessing.StandardScaler().fit(features)
         features_scaled = scaler.transform(features)
 
-        print("Fitting model...")
-        model.fit(features_scaled, labels)
+        model = OneVsRestClassifier(svm.SVC(probability=True))
+        if folds:
+            from sklearn.model_selection import GridSearchCV
+
+            print("Searching hyperparameters (" + str(folds) + "-fold cross-validation)...")
+            search = GridSearchCV(model, self.PARAMETER_GRID, cv=folds, n_jobs=workers)
+            search.fit(features_scaled, labels)
+            print("Best parameters: " + str(search.best_params_) + " (accuracy " + str(round(search.best_score_, 3)) + ")")
+            model = search.best_estimator_
+        else:
+            print("Fitting model...")
+            model.fit(features_scaled, labels)
+
+        if fast_model:
+            self.compare_fast_model(features, labels, fast_model)
+
+        from sklearn.externals import joblib
+
+        version = self.model_store.new_version()
+        path = self.model_store.version_path(version)
+
+        # Uncompressed, so the arrays can be memory-mapped when loaded
+        print("Saving model version " + version + "...")
+        joblib.dump(scaler, os.path.join(path, "scaler.pkl"))
+        joblib.dump(model, os.path.join(path, "model.pkl"))
+
+        if fast_model:
+            print("Fitting and saving " + fast_model + " fast model...")
+            fast = train_fast_model(features, labels, kind=fast_model)
+            fast.save_arrays(os.path.join(path, "fast"))
+
+        # Running workers switch to it within model_check_interval
+        self.model_store.activate(version)
+
+    # Prints held-out accuracy and per-row latency of the SVC next to a FastModel
+    def compare_fast_model(self, features, labels, fast_model):
+        from sklearn.model_selection import train_test_split
+        from sklearn.multiclass import OneVsRestClassifier
+        from sklearn import svm
+        from sklearn import preprocessing
+
+        train_features, test_features, train_labels, test_labels = train_test_split(features, labels, test_size=0.3, random_state=0)
+
+        scaler = preprocessing.StandardScaler().fit(train_features)
+        svc = OneVsRestClassifier(svm.SVC(probability=True)).fit(scaler.transform(train_features), train_labels)
+        fast = train_fast_model(train_features, train_labels, kind=fast_model)
+
+        report = compare_models({
+            "svc": (svc.classes_, lambda rows: svc.predict_proba(scaler.transform(rows))),
+            fast_model: (fast.classes, fast.predict_proba)
+        }, test_features, test_labels)
+
+        print("Model comparison (held-out accuracy, per-row latency):")
+        for name, result in report.items():
+            print("  " + name + ": accuracy " + str(round(result["accuracy"], 3)) + ", " + str(round(result["latency_ms"], 4)) + " ms/row")
+
+    # For use in prod.
+    # Loads the store's current version, or if it has no model of the
+    # configured kind the newest version that does, or the pre-store model
+    # files if no version has one.
+    # With config["data_analysis"]["model"] == "fast", scores with the exported
+    # FastModel (scaler folded in) instead of the pickled scaler + SVC, and
+    # sklearn is never loaded.
+    def load_model(self):
+        kind = self.config["data_analysis"].get("model", "svc")
+        version = self.model_store.usable_version(kind)
+
+        if version is not None:
+            self.scaler, self.model = self.model_store.load(version, kind)
+        elif kind == "fast":
+            self.scaler = None
+            self.model = FastModel.load(self.FAST_MODEL_PATH)
+        else:
+            from sklearn.externals import joblib
+
+            self.scaler = joblib.load(self.SCALER_PATH)
+            self.model = joblib.load(self.MODEL_PATH)
+
+        self.model_version = version or "legacy"
+
+    # Swaps in a newly published model version. Only called between batches,
+    # so an article is always scored by a single version; queued articles just
+    # wait for the load. Models set directly (benchmarks) are left alone.
+    def reload_model_if_changed(self):
+        if self.model_version is None or time.time() < self.next_model_check:
+            return
+
+        self.next_model_check = time.time() + self.model_check_interval
+        version = self.model_store.usable_version(self.config["data_analysis"].get("model", "svc"))
+        if version is None or version == self.model_version:
+            return
+
+        previous = self.model_version
+        try:
+            self.load_model()
+        except Exception as e:
+            self.logger.log("Data Analysis", "error", "Error loading model version %s, keeping %s: %s", version, previous, str(e))
+            return
 
-        print("Saving model...")
-        joblib.dump(scaler, "data_analysis/caler.pkl")
-        joblib.dump(model, "data_analysis/model.pkl")
+        self.logger.log("Data Analysis", "informative", "Switched from model version %s to %s", previous, self.model_version)
 
-        print("Done!")
+    # Called once in the worker process before it takes articles: loads the
+    # WordNet corpus and runs the feature and scoring path end to end, so the
+    # first article doesn't pay for it
+    def warm_up(self):
+        self.synset_cache.lookup("warm")
+        if hasattr(self.annotator.annotator, "get_client"):
+            self.annotator.annotator.get_client()
 
-    # For use in prod
-    def load_model(self):
-        self.scaler = joblib.load("data_analysis/scaler.pkl")
-        self.model = joblib.load("data_analysis/model.pkl")
+        if self.config["markets"]:
+            self.score_features_batch(self.feature_engine.features(["Warm up"], self.config["markets"][:1])[:, 0])
 
     # Processes the given article and stores the results in the queue
     def handle_article(self, article):
-        self.logger.log("Data Analysis", "informative", "Received article: " + article["title"])
-
-        # Run the article through Google Cloud Language API,
-        # and figure out if it relates to a relevant entity.
-        google_cloud_response = self.analyze_text_google_cloud(article)
-        relevant_entities_and_markets = self.get_relevant_markets(google_cloud_response["entities"])
-
-        # For each market, come up with a score to represent
-        # whether the article represents a strong positive
-        # or negative statement.
-        # Queue this for the trader.
-        for entities_and_market in relevant_entities_and_markets:
-            score = self.score_article(entities_and_market[0], entities_and_market[1], google_cloud_response, article)
-            self.logger.log("Data Analysis", "informative", "Scored article for market " + entities_and_market[1]["contract_id"] + ": " + article["title"])
-
-            result = {
-                "market": entities_and_market[1],
-                "article": article,
-                "score": score
-            }
-            self.queue_result(result)
+        self.handle_articles([article])
+
+    # Processes a micro-batch of articles, scoring every relevant
+    # (article, market) pair with a single model call
+    def handle_articles(self, articles):
+        pairs = []
+        for article in articles:
+            self.logger.log("Data Analysis", "informative", "Received article: %s", article["title"])
+            if "analysis_dequeued" not in article.get("timings", {}):
+                mark(article, "analysis_dequeued")
+
+            # Run the article through Google Cloud Language API,
+            # and figure out if it relates to a relevant entity.
+            google_cloud_response = self.analyze_text_google_cloud(article)
+            mark(article, "annotated")
+            for entities_and_market in self.get_relevant_markets(google_cloud_response["entities"]):
+                pairs.append((article, entities_and_market[1]))
+
+        if pairs:
+            # For each market, come up with a score to represent
+            # whether the article represents a strong positive
+            # or negative statement.
+            scores = self.score_features_batch(self.pair_features(pairs))
+            for article, _ in pairs:
+                mark(article, "scored")
+
+            # Queue these for the trader, in one send.
+            results = []
+            for (article, market), score in zip(pairs, scores):
+                self.logger.log("Data Analysis", "informative", "Scored article for market %s with model %s: %s", market["contract_id"], self.model_version, article["title"])
+
+                results.append({
+                    "market": market,
+                    "article": article,
+                    "score": score,
+                    "model_version": self.model_version
+                })
+            self.queue_results(results)
+
+        for article in articles:
+            self.logger.metric("Data Analysis", "timings", dict(article["timings"]))
+
+        previous = self.articles_handled
+        self.articles_handled += len(articles)
+        if previous // self.CACHE_STATS_INTERVAL != self.articles_handled // self.CACHE_STATS_INTERVAL:
+            self.log_cache_stats()
+
+    # Feature rows for a list of (article, market) pairs, computed in one
+    # FeatureEngine call over the batch's titles and markets
+    def pair_features(self, pairs):
+        titles = []
+        title_indices = {}
+        markets = []
+        market_indices = {}
+        for article, market in pairs:
+            if article["title"] not in title_indices:
+                title_indices[article["title"]] = len(titles)
+                titles.append(article["title"])
+            if id(market) not in market_indices:
+                market_indices[id(market)] = len(markets)
+                markets.append(market)
+
+        features = self.feature_engine.features(titles, markets)
+        return features[
+            [title_indices[article["title"]] for article, _ in pairs],
+            [market_indices[id(market)] for _, market in pairs]
+        ]
+
+    def log_cache_stats(self):
+        stats = self.synset_cache.stats()
+        self.logger.log("Data Analysis", "informative", "Synset cache: %d hits %d misses %.1f%% hit rate", stats["hits"], stats["misses"], stats["hit_rate"] * 100)
+        self.logger.log("Data Analysis", "informative", "Annotation cache: %d hits %d misses", self.annotator.hits, self.annotator.misses)
 
     def analyze_text_google_cloud(self, article):
-        client = language.Client()
-        document = client.document_from_text(article["title"])
-        annotations = document.annotate_text()
-
-        return {
-            "entities": annotations.entities,
-            "tokens": annotations.tokens,
-            "sentiment": annotations.sentiment
-        }
+        return self.annotator.annotate(article["title"])
 
     def score_article(self, relevant_entities, market, google_cloud_response, article):
         features = self.article_features(relevant_entities, market, google_cloud_response, article)
-        features_scaled = self.scaler.transform([features])[0]
+        return self.score_features_batch([features])[0]
 
-        score = self.model.predict_proba([features_scaled])[0]
+    # Scores many feature rows with one transform and one predict call
+    def score_features_batch(self, features):
+        if self.scaler is not None:
+            features = self.scaler.transform(features)
 
-        return score
+        return self.model.predict_proba(features)
 
     def array_avg(arr):
         total = 0.0
@@ -109,60 +321,9 @@ class DataAnalysis:
 
         return total / len(arr)
 
+    # Features for a single (article, market) pair; see FeatureEngine.features
     def article_features(self, relevant_entities, market, google_cloud_response, article):
-        features = []
-
-        # Vectorize headline and get unique words
-        article_headline = article["title"]
-        vec = CountVectorizer()
-        headline_features = vec.fit_transform([article_headline]).toarray()
-        headline_words = vec.get_feature_names()
-
-        # Perform similarity check against target and anti-target words
-        target_words_matched = []
-        target_similarities = []
-        anti_target_words_matched = []
-        anti_target_similarities = []
-        for headline_word in headline_words:
-            try:
-                headline_word_synset = wordnet.synsets(headline_word)[0]
-            except IndexError:
-                # No synset available for this word, skip
-                continue
-
-            for target_word in market["target_words"]:
-                try:
-                    target_word_synset = wordnet.synsets(target_word)[0]
-                except IndexError:
-                    # No synset available for this word, skip
-                    continue
-
-                similarity = headline_word_synset.path_similarity(target_word_synset) or 0
-                target_similarities.append(similarity)
-
-                if similarity > 0.5 and target_word not in target_words_matched:
-                    target_words_matched.append(target_word)
-
-            for anti_target_word in market["anti_target_words"]:
-                try:
-                    anti_target_word_synset = wordnet.synsets(anti_target_word)[0]
-                except IndexError:
-                    # No synset available for this word, skip
-                    continue
-
-                similarity = headline_word_synset.path_similarity(anti_target_word_synset) or 0
-                anti_target_similarities.append(similarity)
-
-                if similarity > 0.5 and target_word not in anti_target_words_matched:
-                    anti_target_words_matched.append(target_word)
-
-        # Compute avg/max similarities
-        features.append(max(target_similarities or [0]))
-        features.append(max(anti_target_similarities or [0]))
-        features.append(len(target_words_matched))
-        features.append(len(anti_target_words_matched))
-
-        return features
+        return list(self.feature_engine.features([article["title"]], [market])[0, 0])
 
     def get_relevant_entities(self, google_cloud_entities, target_entities, target_wikipedia_urls):
         entities_to_return = []
@@ -179,7 +340,7 @@ class DataAnalysis:
             for target_entity in target_entities:
                 b = target_entity.lower().split(" ")
 
-                if google_cloud_entity in entities_to_return:
+                if google_cloud_entity.name in entities_to_return:
                     break
 
                 for google_cloud_entity_part in a:
@@ -190,30 +351,70 @@ class DataAnalysis:
                             entities_to_return.append(google_cloud_entity.name)
                             break
 
-                    if google_cloud_entity in entities_to_return:
+                    if google_cloud_entity.name in entities_to_return:
                         break
 
         return entities_to_return
 
     def get_relevant_markets(self, google_cloud_entities):
-        markets_and_entities = []
-        for market in self.config["markets"]:
-            relevant_entities = self.get_relevant_entities(google_cloud_entities, market["entities"], market["wikipedia_urls"])
+        return self.entity_index.relevant_markets(google_cloud_entities)
+
+    # Stores the results in the result queue, as one message if it's a
+    # MessageQueue; plain queues (replays, benchmarks) take them one at a time
+    def queue_results(self, results):
+        if hasattr(self.score_queue, "put_many"):
+            if self.score_queue.put_many(results) is False:
+                self.logger.log("Data Analysis", "warning", "Result queue full, shed %d result(s) for: %s", len(results), "; ".join(result["article"]["title"] for result in results))
+            return
+
+        for result in results:
+            if self.score_queue.put(result) is False:
+                self.logger.log("Data Analysis", "warning", "Result queue full, shed result for market %s: %s", result["market"]["contract_id"], result["article"]["title"])
+
+    # Waits up to `timeout` for an article, then keeps collecting more until
+    # the batch is full or the wait budget runs out. Returns [] on timeout.
+    def next_batch(self, timeout=None):
+        self.logger.flush()
+        try:
+            batch = [self.article_queue.get(True, timeout)]
+        except queue.Empty:
+            return []
+
+        mark(batch[0], "analysis_dequeued")
+        deadline = time.time() + self.max_batch_wait
 
-            if relevant_entities:
-                markets_and_entities.append([relevant_entities, market])
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
 
-        return markets_and_entities
+            try:
+                article = self.article_queue.get(True, remaining)
+            except queue.Empty:
+                break
 
-    # Stores the result in the result queue
-    def queue_result(self, result):
-        self.score_queue.put(result)
+            mark(article, "analysis_dequeued")
+            batch.append(article)
 
-    # Entry point for process
-    def run(self):
+        return batch
+
+    # Entry point for process; runs until stopping is set
+    def run(self, heartbeat=None, stopping=None):
         try:
-            while True:
-                article = self.article_queue.get(True) # Gets articles from the queue and analyzes them
-                self.handle_article(article)
+            while stopping is None or not stopping.is_set():
+                if heartbeat is not None:
+                    heartbeat.beat()
+
+                self.reload_model_if_changed()
+                articles = self.next_batch(HEARTBEAT_INTERVAL) # Gets articles from the queue and analyzes them
+                if not articles:
+                    continue
+
+                # A bad article only costs its own batch, not the worker
+                try:
+                    self.handle_articles(articles)
+                except Exception as e:
+                    self.logger.log("Data Analysis", "error", "Error analyzing %d article(s) (%s): %s", len(articles), "; ".join(article["title"] for article in articles), str(e))
         except Exception as e:
-            self.logger.log("Data Analysis", "error", "Crashed: " + str(e))
+            self.logger.log("Data Analysis", "error", "Crashed: %s", str(e))
+            raise
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+
+# Inverted index from entity names/Wikipedia URLs to markets.
+# Replaces scanning every market (and every pair of name tokens) per article:
+# Wikipedia URLs and exact tokens are dict lookups, and fuzzy token matches only
+# run SequenceMatcher against target tokens that share a character n-gram and
+# are close enough in length to possibly clear the ratio threshold.
+class EntityIndex:
+
+    # Same threshold get_relevant_entities uses for name tokens
+    RATIO_THRESHOLD = 0.7
+
+    # Padded character n-grams used to find fuzzy candidates. Bigrams rather
+    # than trigrams, since short names can clear the ratio without sharing one.
+    NGRAM_SIZE = 2
+
+    def __init__(self, markets, max_cached_tokens=50000):
+        self.markets = list(markets)
+        self.max_cached_tokens = max_cached_tokens
+
+        self.url_markets = {}
+        self.token_markets = {}
+        self.token_matchers = {}
+        self.ngram_tokens = {}
+        self.token_cache = OrderedDict()
+
+        for market_index, market in enumerate(self.markets):
+            for url in market["wikipedia_urls"]:
+                if url:
+                    self.url_markets.setdefault(url.lower(), set()).add(market_index)
+
+            for entity in market["entities"]:
+                for token in self.tokenize(entity):
+                    self.token_markets.setdefault(token, set()).add(market_index)
+
+        for token in self.token_markets:
+            # SequenceMatcher caches its analysis of the second sequence,
+            # so keep one per target token
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(token)
+            self.token_matchers[token] = matcher
+
+            for ngram in self.ngrams(token):
+                self.ngram_tokens.setdefault(ngram, set()).add(token)
+
+    # Splits names the same way get_relevant_entities does
+    def tokenize(self, name):
+        return [token for token in name.lower().split(" ") if token]
+
+    def ngrams(self, token):
+        padded = "$" + token + "$"
+        return set(padded[i:i + self.NGRAM_SIZE] for i in range(len(padded) - self.NGRAM_SIZE + 1))
+
+    # Returns the set of markets with a target token similar to the given token
+    def token_matches(self, token):
+        if token in self.token_cache:
+            self.token_cache.move_to_end(token)
+            return self.token_cache[token]
+
+        candidates = set()
+        for ngram in self.ngrams(token):
+            candidates |= self.ngram_tokens.get(ngram, set())
+
+        market_indices = set()
+        for candidate in candidates:
+            # Length bound: the ratio can't exceed 2 * min / (len(a) + len(b))
+            if 2.0 * min(len(token), len(candidate)) / (len(token) + len(candidate)) <= self.RATIO_THRESHOLD:
+                continue
+
+            if candidate != token:
+                matcher = self.token_matchers[candidate]
+                matcher.set_seq1(token)
+
+                # quick_ratio is a cheap upper bound on ratio
+                if matcher.quick_ratio() <= self.RATIO_THRESHOLD or matcher.ratio() <= self.RATIO_THRESHOLD:
+                    continue
+
+            market_indices |= self.token_markets[candidate]
+
+        self.token_cache[token] = market_indices
+        if len(self.token_cache) > self.max_cached_tokens:
+            self.token_cache.popitem(last=False)
+
+        return market_indices
+
+    # Same output as DataAnalysis.get_relevant_markets:
+    # a list of [relevant entity names, market] pairs, in config order.
+    def relevant_markets(self, google_cloud_entities):
+        matched = {}
+        for google_cloud_entity in google_cloud_entities:
+            market_indices = set()
+
+            if google_cloud_entity.wikipedia_url:
+                market_indices |= self.url_markets.get(google_cloud_entity.wikipedia_url.lower(), set())
+
+            for token in self.tokenize(google_cloud_entity.name):
+                market_indices |= self.token_matches(token)
+
+            for market_index in market_indices:
+                names = matched.setdefault(market_index, [])
+                if google_cloud_entity.name not in names:
+                    names.append(google_cloud_entity.name)
+
+        return [[matched[market_index], self.markets[market_index]] for market_index in sorted(matched)]
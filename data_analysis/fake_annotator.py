@@ -0,0 +1,66 @@
+import re
+
+
+# Local stand-in for GoogleCloudAnnotator, for tests, replays and benchmarks.
+# Entities are runs of capitalized words, plus any known entity names found in
+# the text; known entities get their Wikipedia URL attached.
+class FakeAnnotator:
+
+    WORD_PATTERN = re.compile(r"[A-Za-z0-9'\-]+")
+
+    def __init__(self, known_entities=None):
+        # Maps entity name -> Wikipedia URL (or None)
+        self.known_entities = known_entities or {}
+        self.calls = 0
+
+    @classmethod
+    def from_markets(cls, markets):
+        known_entities = {}
+        for market in markets:
+            urls = [url for url in market["wikipedia_urls"] if url]
+            for entity in market["entities"]:
+                known_entities[entity] = urls[0] if urls else None
+
+        return cls(known_entities)
+
+    def annotate(self, text):
+        self.calls += 1
+
+        words = [(match.group(0), match.start()) for match in self.WORD_PATTERN.finditer(text)]
+        names = []
+
+        run = []
+        for word, _ in words + [("", -1)]:
+            if word[:1].isupper():
+                run.append(word)
+            elif run:
+                names.append(" ".join(run))
+                run = []
+
+        lower_text = text.lower()
+        for name in self.known_entities:
+            if name.lower() in lower_text and name not in names:
+                names.append(name)
+
+        return {
+            "entities": [{
+                "name": name,
+                "entity_type": "UNKNOWN",
+                "wikipedia_url": self.known_entities.get(name),
+                "metadata": {},
+                "salience": 1.0 / len(names),
+                "mentions": [name]
+            } for name in names],
+            "tokens": [{
+                "text_content": word,
+                "text_begin": begin,
+                "part_of_speech": None,
+                "edge_index": None,
+                "edge_label": None,
+                "lemma": word.lower()
+            } for word, begin in words],
+            "sentiment": {
+                "score": 0.0,
+                "magnitude": 0.0
+            }
+        }
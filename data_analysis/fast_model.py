@@ -0,0 +1,147 @@
+import os
+import time
+
+import numpy as np
+
+
+# Compact, pure-NumPy stand-in for the scaler + OneVsRest SVC pair.
+# Holds a one-vs-rest logistic model, optionally on top of random Fourier
+# features approximating the SVC's RBF kernel, with the StandardScaler folded
+# into the weights so raw feature rows can be scored directly.
+class FastModel:
+
+    def __init__(self, classes, coef, intercept, random_weights=None, random_offset=None):
+        self.classes = np.asarray(classes)
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = np.asarray(intercept, dtype=float)
+        self.random_weights = None if random_weights is None else np.asarray(random_weights, dtype=float)
+        self.random_offset = None if random_offset is None else np.asarray(random_offset, dtype=float)
+
+    @property
+    def kind(self):
+        return "linear" if self.random_weights is None else "rff"
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(
+            arrays["classes"],
+            arrays["coef"],
+            arrays["intercept"],
+            arrays["random_weights"] if "random_weights" in arrays else None,
+            arrays["random_offset"] if "random_offset" in arrays else None
+        )
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_arrays(np.load(path))
+
+    # Loads a directory written by save_arrays; with mmap_mode the arrays are
+    # mapped from disk rather than copied into this process
+    @classmethod
+    def load_arrays(cls, path, mmap_mode=None):
+        arrays = {}
+        for name in os.listdir(path):
+            if name.endswith(".npy"):
+                arrays[name[:-len(".npy")]] = np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+        return cls.from_arrays(arrays)
+
+    def arrays(self):
+        arrays = {"classes": self.classes, "coef": self.coef, "intercept": self.intercept}
+        if self.random_weights is not None:
+            arrays["random_weights"] = self.random_weights
+            arrays["random_offset"] = self.random_offset
+        return arrays
+
+    def save(self, path):
+        # np.savez appends .npz unless given a file object
+        with open(path, "wb") as f:
+            np.savez(f, **self.arrays())
+
+    # One .npy file per array, which (unlike .npz) can be memory-mapped
+    def save_arrays(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name, array in self.arrays().items():
+            np.save(os.path.join(path, name + ".npy"), array)
+
+    # Same output as OneVsRestClassifier.predict_proba: per-class sigmoid
+    # scores, normalized to sum to one
+    def predict_proba(self, features):
+        features = np.asarray(features, dtype=float)
+
+        if self.random_weights is not None:
+            features = np.cos(features.dot(self.random_weights) + self.random_offset)
+            features *= np.sqrt(2.0 / self.random_weights.shape[1])
+
+        probabilities = 1.0 / (1.0 + np.exp(-(features.dot(self.coef.T) + self.intercept)))
+
+        # Two classes means a single estimator for the positive class
+        if self.coef.shape[0] == 1:
+            return np.hstack([1 - probabilities, probabilities])
+
+        totals = probabilities.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1
+        return probabilities / totals
+
+
+# Trains a FastModel on raw (unscaled) features.
+# kind is "linear" or "rff" (random Fourier features approximating an RBF kernel).
+def train_fast_model(features, labels, kind="linear", n_components=200, gamma=None, random_state=0):
+    from sklearn import preprocessing
+    from sklearn.kernel_approximation import RBFSampler
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.multiclass import OneVsRestClassifier
+
+    features = np.asarray(features, dtype=float)
+    scaler = preprocessing.StandardScaler().fit(features)
+    scaled = scaler.transform(features)
+
+    mean = scaler.mean_
+    scale = scaler.scale_
+
+    random_weights = None
+    random_offset = None
+    if kind == "rff":
+        # SVC's default gamma is 1 / n_features
+        sampler = RBFSampler(gamma=gamma or 1.0 / features.shape[1], n_components=n_components, random_state=random_state)
+        scaled = sampler.fit_transform(scaled)
+
+        # cos(((x - mean) / scale) W + b) == cos(x (W / scale) + (b - (mean / scale) W))
+        random_weights = sampler.random_weights_ / scale[:, np.newaxis]
+        random_offset = sampler.random_offset_ - (mean / scale).dot(sampler.random_weights_)
+    elif kind != "linear":
+        raise ValueError("Unknown fast model kind: " + str(kind))
+
+    model = OneVsRestClassifier(LogisticRegression()).fit(scaled, labels)
+
+    coef = np.vstack([estimator.coef_[0] for estimator in model.estimators_])
+    intercept = np.array([estimator.intercept_[0] for estimator in model.estimators_])
+    if random_weights is None:
+        # ((x - mean) / scale) w + c == x (w / scale) + (c - (mean / scale) w)
+        intercept = intercept - coef.dot(mean / scale)
+        coef = coef / scale
+
+    return FastModel(model.classes_, coef, intercept, random_weights, random_offset)
+
+
+# Accuracy and single-row latency for each candidate model.
+# candidates maps a name to (classes, predict_proba function on raw features).
+def compare_models(candidates, features, labels, latency_rows=200):
+    features = np.asarray(features, dtype=float)
+    labels = np.asarray(labels)
+
+    report = {}
+    for name, (classes, predict_proba) in candidates.items():
+        predicted = np.asarray(classes)[np.argmax(predict_proba(features), axis=1)]
+
+        rows = [features[i % len(features)][np.newaxis, :] for i in range(latency_rows)]
+        start = time.perf_counter()
+        for row in rows:
+            predict_proba(row)
+        latency = (time.perf_counter() - start) / latency_rows
+
+        report[name] = {
+            "accuracy": float(np.mean(predicted == labels)),
+            "latency_ms": latency * 1000
+        }
+
+    return report
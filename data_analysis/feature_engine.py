@@ -0,0 +1,141 @@
+import re
+
+import numpy as np
+
+
+# Batched keyword-similarity features.
+# Keeps a matrix of path similarities between every headline word seen so far
+# (rows) and every market's target/anti-target words (columns), so features for
+# a batch of headlines against any number of markets come down to a few array
+# lookups instead of nested loops over word pairs.
+class FeatureEngine:
+
+    # Same tokenization CountVectorizer uses by default
+    TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+    # A target word counts as matched when a headline word is at least this similar
+    MATCH_THRESHOLD = 0.5
+
+    def __init__(self, synset_cache, markets=(), max_words=20000):
+        self.synset_cache = synset_cache
+        self.max_words = max_words
+
+        self.market_indices = {}
+        self.columns = {}
+        self.column_synsets = []
+        self.reset_vocabulary()
+
+        for market in markets:
+            self.market_columns(market)
+
+    # Drops all headline words, keeping the target columns.
+    # Row 0 is an all-zero sentinel used for words without a synset.
+    def reset_vocabulary(self):
+        self.rows = {}
+        self.row_synsets = [None]
+        self.matrix = np.zeros((1024, max(16, len(self.column_synsets) + 1)))
+
+    def tokenize(self, headline):
+        return set(self.TOKEN_PATTERN.findall(headline.lower()))
+
+    # Grows the matrix (doubling) so it holds at least the given shape
+    def ensure_capacity(self, rows, columns):
+        current_rows, current_columns = self.matrix.shape
+        if rows <= current_rows and columns <= current_columns:
+            return
+
+        if rows > current_rows:
+            rows = max(rows, current_rows * 2)
+        if columns > current_columns:
+            columns = max(columns, current_columns * 2)
+
+        grown = np.zeros((max(rows, current_rows), max(columns, current_columns)))
+        grown[:current_rows, :current_columns] = self.matrix
+        self.matrix = grown
+
+    # Returns the matrix row for a headline word, computing it on first sight
+    def word_row(self, word):
+        if word in self.rows:
+            return self.rows[word]
+
+        synset = self.synset_cache.synset(word)
+        if synset is None:
+            # No synset available for this word, use the zero row
+            self.rows[word] = 0
+            return 0
+
+        row = len(self.row_synsets)
+        self.ensure_capacity(row + 1, len(self.column_synsets) + 1)
+        for column, target_synset in enumerate(self.column_synsets, 1):
+            if target_synset is not None:
+                self.matrix[row, column] = self.synset_cache.similarity(synset, target_synset)
+
+        self.rows[word] = row
+        self.row_synsets.append(synset)
+        return row
+
+    # Returns the matrix column for a target word, filling it for known rows
+    def target_column(self, word):
+        if word in self.columns:
+            return self.columns[word]
+
+        synset = self.synset_cache.target_synset(word)
+        self.column_synsets.append(synset)
+        column = len(self.column_synsets)
+        self.ensure_capacity(len(self.row_synsets), column + 1)
+
+        if synset is not None:
+            for row, headline_synset in enumerate(self.row_synsets[1:], 1):
+                self.matrix[row, column] = self.synset_cache.similarity(headline_synset, synset)
+
+        self.columns[word] = column
+        return column
+
+    # Returns the (target, anti-target) column indices for a market
+    def market_columns(self, market):
+        key = (tuple(market["target_words"]), tuple(market["anti_target_words"]))
+        if key not in self.market_indices:
+            target = sorted(set(self.target_column(word) for word in market["target_words"]))
+            anti_target = sorted(set(self.target_column(word) for word in market["anti_target_words"]))
+            self.market_indices[key] = (target, anti_target)
+
+        return self.market_indices[key]
+
+    # Packs per-market column lists into a zero-padded index matrix
+    def padded_columns(self, column_lists):
+        width = max([len(columns) for columns in column_lists] or [0]) or 1
+        index = np.zeros((len(column_lists), width), dtype=np.intp)
+        for i, columns in enumerate(column_lists):
+            index[i, :len(columns)] = columns
+
+        return index
+
+    # Computes features for every (headline, market) pair.
+    # Returns an array of shape (headlines, markets, 4) holding the max target
+    # similarity, max anti-target similarity, and the number of target and
+    # anti-target words matched.
+    def features(self, headlines, markets):
+        if len(self.rows) > self.max_words:
+            self.reset_vocabulary()
+
+        market_columns = [self.market_columns(market) for market in markets]
+
+        # Every headline gets the zero row so empty headlines still reduce
+        headline_rows = [[0] + [self.word_row(word) for word in self.tokenize(headline)] for headline in headlines]
+        if not headline_rows or not market_columns:
+            return np.zeros((len(headlines), len(markets), 4))
+
+        rows = np.fromiter((row for word_rows in headline_rows for row in word_rows), dtype=np.intp)
+        offsets = np.cumsum([0] + [len(word_rows) for word_rows in headline_rows[:-1]])
+        best = np.maximum.reduceat(self.matrix[rows, :len(self.column_synsets) + 1], offsets, axis=0)
+
+        target = best[:, self.padded_columns([columns[0] for columns in market_columns])]
+        anti_target = best[:, self.padded_columns([columns[1] for columns in market_columns])]
+
+        features = np.empty((len(headlines), len(markets), 4))
+        features[:, :, 0] = target.max(axis=2)
+        features[:, :, 1] = anti_target.max(axis=2)
+        features[:, :, 2] = (target > self.MATCH_THRESHOLD).sum(axis=2)
+        features[:, :, 3] = (anti_target > self.MATCH_THRESHOLD).sum(axis=2)
+
+        return features
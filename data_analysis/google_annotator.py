@@ -0,0 +1,26 @@
+import os
+
+from google.cloud import language
+
+from data_analysis.annotation_cache import annotation_to_dict
+
+
+# Annotates text with the Google Cloud Language API.
+# Keeps one client per process; the object is built in the parent and then
+# handed to each worker process, so the client is created lazily.
+class GoogleCloudAnnotator:
+
+    def __init__(self):
+        self.client = None
+        self.client_pid = None
+
+    def get_client(self):
+        if self.client is None or self.client_pid != os.getpid():
+            self.client = language.Client()
+            self.client_pid = os.getpid()
+
+        return self.client
+
+    def annotate(self, text):
+        document = self.get_client().document_from_text(text)
+        return annotation_to_dict(document.annotate_text())
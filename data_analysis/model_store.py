@@ -0,0 +1,87 @@
+import os
+import time
+
+from data_analysis.fast_model import FastModel
+
+
+# Versioned model directories, e.g.
+#   data_analysis/models/20170301-120000/   scaler.pkl, model.pkl, fast/*.npy
+#   data_analysis/models/current            name of the version in use
+# Training writes a new version directory and then points "current" at it
+# with an atomic rename, so workers never see a half-written model, and can
+# pick up the new one without a restart. Model arrays are memory-mapped, so
+# all analysis workers share one copy through the page cache.
+class ModelStore:
+
+    ROOT = "data_analysis/models"
+
+    def __init__(self, root=ROOT):
+        self.root = root
+        self.pointer_path = os.path.join(root, "current")
+
+    # Name of the version in use, or None if nothing has been published
+    def current_version(self):
+        try:
+            with open(self.pointer_path, "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def version_path(self, version):
+        return os.path.join(self.root, version)
+
+    # Whether a version has a model of the given kind ("svc" or "fast");
+    # versions trained without --fast-model have no fast model
+    def has_kind(self, version, kind):
+        path = self.version_path(version)
+        if kind == "fast":
+            return os.path.isdir(os.path.join(path, "fast"))
+        return os.path.exists(os.path.join(path, "scaler.pkl")) and os.path.exists(os.path.join(path, "model.pkl"))
+
+    # The version to load as `kind`: the current one if it has that kind of
+    # model, otherwise the newest earlier version that does (later ones may
+    # still be being written). None if there is none.
+    def usable_version(self, kind):
+        current = self.current_version()
+        if current is None or self.has_kind(current, kind):
+            return current
+
+        versions = [version for version in os.listdir(self.root) if version < current and os.path.isdir(self.version_path(version))]
+        for version in sorted(versions, reverse=True):
+            if self.has_kind(version, kind):
+                return version
+        return None
+
+    # Creates an empty, uniquely named version directory; returns its name
+    def new_version(self):
+        base = time.strftime("%Y%m%d-%H%M%S")
+        version = base
+        suffix = 1
+        while True:
+            try:
+                os.makedirs(self.version_path(version))
+                return version
+            except FileExistsError:
+                suffix += 1
+                version = base + "-" + str(suffix)
+
+    # Points "current" at a version
+    def activate(self, version):
+        temp_path = self.pointer_path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(temp_path, self.pointer_path)
+
+    # Returns (scaler, model) for a version. kind is "svc" or "fast"; the fast
+    # model has the scaler folded in, so its scaler is None.
+    def load(self, version, kind):
+        path = self.version_path(version)
+        if kind == "fast":
+            return None, FastModel.load_arrays(os.path.join(path, "fast"), mmap_mode="r")
+
+        from sklearn.externals import joblib
+
+        # Copy-on-write rather than read-only: libsvm's predict_proba takes
+        # the support vectors as writable buffers and fails on read-only
+        # arrays. Pages are still shared until something writes to them.
+        return joblib.load(os.path.join(path, "scaler.pkl"), mmap_mode="c"), joblib.load(os.path.join(path, "model.pkl"), mmap_mode="c")
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+from nltk.corpus import wordnet
+
+
+# Caches WordNet synset lookups and path similarities.
+# Target/anti-target words are resolved once up front (they come from the
+# config, so the set is small and fixed), while headline words and
+# similarity pairs go through bounded LRUs since news vocabulary is open-ended.
+class SynsetCache:
+
+    def __init__(self, markets=(), max_words=20000, max_pairs=200000):
+        self.max_words = max_words
+        self.max_pairs = max_pairs
+
+        self.target_synsets = {}
+        self.word_synsets = OrderedDict()
+        self.similarities = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+        for market in markets:
+            self.add_market(market)
+
+    # Resolves a market's target and anti-target words ahead of time
+    def add_market(self, market):
+        for word in market["target_words"] + market["anti_target_words"]:
+            self.target_synset(word)
+
+    # Returns the first synset for a target word, or None if there isn't one
+    def target_synset(self, word):
+        if word in self.target_synsets:
+            self.hits += 1
+            return self.target_synsets[word]
+
+        self.misses += 1
+        synset = self.lookup(word)
+        self.target_synsets[word] = synset
+        return synset
+
+    # Returns the first synset for a headline word, or None if there isn't one
+    def synset(self, word):
+        if word in self.word_synsets:
+            self.hits += 1
+            self.word_synsets.move_to_end(word)
+            return self.word_synsets[word]
+
+        self.misses += 1
+        synset = self.lookup(word)
+        self.word_synsets[word] = synset
+        if len(self.word_synsets) > self.max_words:
+            self.word_synsets.popitem(last=False)
+        return synset
+
+    # Memoized path similarity between two synsets (0 when there is no path)
+    def similarity(self, a, b):
+        key = (a.name(), b.name())
+        if key in self.similarities:
+            self.hits += 1
+            self.similarities.move_to_end(key)
+            return self.similarities[key]
+
+        self.misses += 1
+        similarity = a.path_similarity(b) or 0
+        self.similarities[key] = similarity
+        if len(self.similarities) > self.max_pairs:
+            self.similarities.popitem(last=False)
+        return similarity
+
+    def lookup(self, word):
+        synsets = wordnet.synsets(word)
+        if synsets:
+            return synsets[0]
+
+        return None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "words": len(self.word_synsets),
+            "pairs": len(self.similarities)
+        }
@@ -1,35 +1,124 @@
-from data_analysis import DataAnalysis
-import json
+# Trains the article model.
+# Run from the project root: python3 -m data_analysis.training [options]
+#
+# Features are generated in a process pool (annotations go through the shared
+# on-disk cache) and saved to a .npy file, so later runs only refit the model.
+import argparse
 import csv
+import json
+import os
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from data_analysis.data_analysis import DataAnalysis
+
+# Per-process DataAnalysis for the feature pool
+worker_analysis = None
+
+
+def init_worker(config):
+    global worker_analysis
+    worker_analysis = DataAnalysis(config, None, None, None, load_model=False)
+
+
+def featurize(article):
+    return worker_analysis.training_features(article)
 
-# Load config
-config = json.load(open("../config.json"))
 
 # Load markets/articles
-articles_csv = csv.reader(open("articles.csv"))
-
-# Parse markets/articles
-articles = []
-for row in articles_csv:
-    if row[0] == "Article Title":
-        # Skip header
-        continue
-
-    article_obj = {}
-    article_obj["article"] = {
-        "title": row[0]
-    }
-    article_obj["market"] = {
-        "symbol": "TEST_MARKET",
-        "entities": row[1].split(","),
-        "wikipedia_urls": row[2].split(","),
-        "target_words": row[3].split(","),
-        "anti_target_words": row[4].split(",")
-    }
-    article_obj["label"] = int(row[5])
-
-    articles.append(article_obj)
-
-da = DataAnalysis(config, load_model=False)
-da.create_model(articles)
-da.load_model()
+def load_articles(path):
+    articles = []
+    with open(path) as f:
+        for row in csv.reader(f):
+            if row[0] == "Article Title":
+                # Skip header
+                continue
+
+            article_obj = {}
+            article_obj["article"] = {
+                "title": row[0]
+            }
+            article_obj["market"] = {
+                "symbol": "TEST_MARKET",
+                "entities": row[1].split(","),
+                "wikipedia_urls": row[2].split(","),
+                "target_words": row[3].split(","),
+                "anti_target_words": row[4].split(",")
+            }
+            article_obj["label"] = int(row[5])
+
+            articles.append(article_obj)
+
+    return articles
+
+
+# Returns (features, labels), generating them in parallel.
+# Articles without a relevant entity are skipped, as in create_model.
+def generate_features(config, articles, workers):
+    with Pool(workers, initializer=init_worker, initargs=(config,)) as pool:
+        rows = pool.map(featurize, articles, chunksize=max(1, len(articles) // (workers * 4)))
+
+    features = []
+    labels = []
+    for i, (article, row) in enumerate(zip(articles, rows)):
+        if row is None:
+            print("Skipping article " + str(i) + "...")
+            continue
+
+        features.append(row)
+        labels.append(article["label"])
+
+    return np.array(features, dtype=float), np.array(labels)
+
+
+# The cache holds the features with the label as the last column.
+# It's stale if the articles file changed after it was written.
+def load_cached_features(path, articles_path):
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(articles_path):
+        return None
+
+    cached = np.load(path)
+    return cached[:, :-1], cached[:, -1].astype(int)
+
+
+def save_cached_features(path, features, labels):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, np.column_stack([features, labels]))
+    os.replace(temp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the article scoring model.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--articles", default="data_analysis/articles.csv")
+    parser.add_argument("--features", default="data_analysis/features.npy", help="feature matrix cache")
+    parser.add_argument("--rebuild-features", action="store_true", help="ignore the feature cache")
+    parser.add_argument("--workers", type=int, default=cpu_count())
+    parser.add_argument("--folds", type=int, default=3, help="cross-validation folds for the grid search (0 to skip)")
+    parser.add_argument("--fast-model", choices=["linear", "rff"], help="also export a FastModel")
+    args = parser.parse_args()
+
+    # Load config
+    with open(args.config) as f:
+        config = json.load(f)
+
+    cached = None if args.rebuild_features else load_cached_features(args.features, args.articles)
+    if cached is not None:
+        print("Using cached features from " + args.features)
+        features, labels = cached
+    else:
+        articles = load_articles(args.articles)
+        print("Generating features for " + str(len(articles)) + " articles with " + str(args.workers) + " workers...")
+        features, labels = generate_features(config, articles, args.workers)
+        save_cached_features(args.features, features, labels)
+
+    da = DataAnalysis(config, None, None, None, load_model=False)
+    da.fit_model(features, labels, fast_model=args.fast_model, folds=args.folds, workers=args.workers)
+    da.load_model()
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,209 @@
 from data_input import news_api
+from data_input.deduplicator import Deduplicator
+from data_input.headline_filter import HeadlineFilter
+from data_input.poller import Poller, SourceSchedule
+from data_input.scheduler import ArticleScheduler
+from metrics import mark, published_at
+from supervisor import HEARTBEAT_INTERVAL
 
+import json
 import time
-import datetime
-import arrow
-from tinydb import *
 
 class DataInput:
 
-    def __init__(self, article_queue, logger, config):
+    # How often (in seconds) the de-dup stores are pruned
+    PRUNE_INTERVAL = 600
+
+    # How often (in seconds) waiting articles are dispatched and expired
+    # while any are held back
+    DISPATCH_INTERVAL = 0.05
+    EXPIRE_INTERVAL = 1
+
+    # backlog, if given, is a shared Value kept at the number of articles
+    # held back by the scheduler, so the service can count them as queued
+    def __init__(self, article_queue, logger, config, backlog=None):
         self.article_queue = article_queue
+        self.backlog = backlog
         self.logger = logger
         self.config = config
+        self.last_prune = time.time()
+
+        input_config = config["data_input"]
+        self.poll_threads = input_config.get("poll_threads", len(input_config["sources"]))
+
+        # One connection pool shared by every source
+        http = news_api.create_pool(maxsize=self.poll_threads)
 
         self.sources = []
-        for source in config["data_input"]["sources"]:
+        for source in input_config["sources"]:
             self.sources.append({
                 "news_api_name": source,
                 "news_api_instance": news_api.NewsApi(
-                    config["data_input"]["news_api"]["api_key"],
+                    input_config["news_api"]["api_key"],
                     source,
-                    logger
-                ),
-                "articles_db": TinyDB("db/" + source + ".newsapi.db.json")
+                    logger,
+                    http=http,
+                    base_uri=input_config["news_api"].get("base_uri"),
+                    timeout=input_config.get("request_timeout", 10)
+                )
             })
 
-    # Continuously polls for new articles and adds them to the article queue
-    def poll_for_articles(self):
-        while True:
-            at = 0
-            for source in self.sources:
-                self.logger.log("Data Input", "informative", "Polling: " + source["news_api_name"])
+        # Shared by every source, so a story is only queued once
+        self.deduplicator = Deduplicator.from_config(config, logger)
+
+        # Headlines that can't be about any market are never queued, so they
+        # never cost an annotation
+        self.headline_filter = HeadlineFilter.from_config(config)
+
+        # New articles wait here and go to the article queue best first
+        self.scheduler = ArticleScheduler.from_config(config)
+        self.last_expire = time.time()
+
+        self.counters = {"headline_filter_passed": 0, "headline_filter_skipped": 0}
+        self.reported_counters = None
+
+        # Optionally record every queued article, for replay.py
+        self.record_path = input_config.get("record_path")
+        self.record_file = None
+
+    # Builds the per-source polling schedules
+    def create_poller(self):
+        input_config = self.config["data_input"]
+        schedules = [SourceSchedule(
+            source["news_api_name"],
+            source["news_api_instance"],
+            input_config["poll_interval"],
+            input_config.get("min_poll_interval", input_config["poll_interval"]),
+            input_config.get("max_poll_interval", input_config["poll_interval"] * 12),
+            input_config.get("max_backoff", 300)
+        ) for source in self.sources]
+
+        return Poller(schedules, self.poll_threads)
+
+    # Continuously polls for new articles and adds them to the article queue,
+    # until stopping is set
+    def poll_for_articles(self, heartbeat=None, stopping=None):
+        poller = self.create_poller()
+        while stopping is None or not stopping.is_set():
+            if heartbeat is not None:
+                heartbeat.beat()
+
+            self.logger.flush()
+            max_wait = self.DISPATCH_INTERVAL if len(self.scheduler) else HEARTBEAT_INTERVAL
+            for schedule, articles, error in poller.poll(max_wait=max_wait):
+                if error is not None:
+                    self.logger.log("Data Input", "error", "Polling %s failed, retrying in %.0fs: %s", schedule.name, schedule.next_poll - time.time(), str(error))
+                    continue
+
+                new_articles = 0
+                for article in articles:
+                    # One bad article shouldn't lose the rest of the poll
+                    try:
+                        # Skip duplicates, including ones from other sources
+                        if self.deduplicator.add(article["title"], schedule.name):
+                            if self.record_path:
+                                self.record_article(article, schedule.name)
+                            strength = self.headline_strength(article)
+                            if strength is not None:
+                                self.schedule_article(article, schedule.name, strength)
+                            new_articles += 1
+                    except Exception as e:
+                        self.logger.log("Data Input", "error", "Error handling article from %s: %s", schedule.name, str(e))
+
+                schedule.record_success(new_articles)
+                self.logger.log("Data Input", "debug", "Polled %s: %d new, next poll in %.1fs", schedule.name, new_articles, schedule.interval)
 
-                articles = source["news_api_instance"].get_articles()
-                if articles is not None:
-                    for article in articles:
-                        # Skip duplicates
-                        q = Query()
-                        if len(self.sources[at]["articles_db"].search(q.title == article["title"])) == 0:
-                            self.queue_article(article)
-                            self.sources[at]["articles_db"].insert({"title": article["title"], "at": str(arrow.now())})
+            self.dispatch_articles()
+            self.report_counters()
 
-                at = at + 1
+            # The stores live in this process, so prune them here too
+            if time.time() - self.last_prune > self.PRUNE_INTERVAL:
+                self.prune_databases()
+                self.last_prune = time.time()
 
-            # Sleep for interval time
-            time.sleep(self.config["data_input"]["poll_interval"])
+    # How strongly the headline matches a market (see headline_filter.py),
+    # or None if it can't be about any
+    def headline_strength(self, article):
+        if self.headline_filter is None:
+            return 0.0
+
+        strength = self.headline_filter.match_strength(article["title"])
+        if strength > 0:
+            self.counters["headline_filter_passed"] += 1
+            return strength
+
+        self.counters["headline_filter_skipped"] += 1
+        self.logger.log("Data Input", "debug", "No market matches, skipped article: %s", article["title"])
+        return None
+
+    # Hands the article to the scheduler, to be queued when its turn comes
+    def schedule_article(self, article, source, strength):
+        # Without a usable publishedAt there's no publish time to measure
+        # from; leave it unset rather than report the arrival time
+        published = published_at(article)
+        if published is not None:
+            mark(article, "published", published)
+        mark(article, "received")
+
+        if not self.scheduler.push(article, source, strength):
+            self.logger.log("Data Input", "debug", "Expired before queueing, dropped article: %s", article["title"])
+
+    # Queues the best waiting articles while the article queue is shallow
+    def dispatch_articles(self):
+        if time.time() - self.last_expire > self.EXPIRE_INTERVAL:
+            self.scheduler.expire()
+            self.last_expire = time.time()
+
+        for article in self.scheduler.dispatch(self.queue_depth):
+            self.queue_article(article)
+
+        if self.backlog is not None:
+            self.backlog.value = len(self.scheduler)
+
+    def queue_depth(self):
+        try:
+            return self.article_queue.qsize()
+        except NotImplementedError:
+            # qsize() isn't available on macOS; dispatch everything
+            return 0
+
+    # Sends the counters to the service as gauges, when they've changed
+    def report_counters(self):
+        counters = dict(self.counters)
+        counters["articles_expired"] = self.scheduler.expired
+        counters["articles_dropped"] = self.scheduler.dropped
+        counters["articles_waiting"] = len(self.scheduler)
+
+        if counters != self.reported_counters:
+            self.logger.metric("Data Input", "counters", counters)
+            self.reported_counters = counters
 
     # Adds the given article to the queue
     def queue_article(self, article):
-        self.logger.log("Data Input", "informative", "Article: " + article["title"])
-        self.article_queue.put(article)
+        self.logger.log("Data Input", "informative", "Article: %s", article["title"])
+        if self.article_queue.put(article) is False:
+            self.logger.log("Data Input", "warning", "Article queue full, shed article: %s", article["title"])
 
-    # Prune all sources' databases
-    def prune_databases(self):
-        for source in self.sources:
-            self.logger.log("Data Input/Pruner", "informative", "Pruning: " + source["news_api_name"])
+    # Appends an article to the recording as a JSON line
+    def record_article(self, article, source):
+        if self.record_file is None:
+            self.record_file = open(self.record_path, "a")
 
-            db = source["articles_db"]
+        self.record_file.write(json.dumps({"at": time.time(), "source": source, "article": article}) + "\n")
+        self.record_file.flush()
 
-            q = Query()
-            test_func = lambda at: arrow.get(at) < (arrow.now() - datetime.timedelta(days=1))
-            docs = db.search(q.at.test(test_func))
+    # Prune the de-dup store
+    def prune_databases(self):
+        self.logger.log("Data Input/Pruner", "informative", "Pruning de-dup store")
 
-            eids = [doc.eid for doc in docs]
-            db.remove(eids=eids)
+        # Expiry already happens as titles are checked; this just
+        # keeps the on-disk log from growing without bound
+        self.deduplicator.prune()
 
     # Entry point for process
-    def run(self):
+    def run(self, heartbeat=None, stopping=None):
         try:
-            self.poll_for_articles()
+            self.poll_for_articles(heartbeat, stopping)
         except Exception as e:
-            self.logger.log("Data Input", "error", "Crashed: " + str(e))
+            self.logger.log("Data Input", "error", "Crashed: %s", str(e))
+            raise
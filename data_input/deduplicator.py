@@ -0,0 +1,221 @@
+import functools
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict
+
+from data_input.seen_store import SeenStore
+
+SUFFIX_PATTERN = re.compile(r"\s+[-|]\s+([^-|]{1,40})$")
+NON_WORD_PATTERN = re.compile(r"[^\w]+")
+
+# Outlet names seen at the end of headlines, besides the configured sources
+SOURCE_NAMES = frozenset([
+    "ap", "associated press", "reuters", "bbc", "bbc news", "cnn", "cnbc", "bloomberg", "business insider",
+    "buzzfeed", "buzzfeed news", "fortune", "newsweek", "the economist", "the huffington post", "huffpost",
+    "the new york times", "nytimes com", "the telegraph", "the verge", "the wall street journal", "wsj",
+    "the washington post", "usa today", "fox news", "abc news", "nbc news", "cbs news", "npr", "politico",
+    "the guardian", "the hill", "independent", "the independent", "time", "axios"
+])
+
+# Words that turn a headline around without being a market keyword
+NEGATIONS = frozenset(["not", "no", "never", "fails", "without", "denies", "rejects"])
+
+
+def normalize_words(text):
+    return " ".join(NON_WORD_PATTERN.sub(" ", text.lower()).split())
+
+
+# Outlet names for the given NewsAPI source ids ("bbc-news" -> "bbc news")
+def source_names(sources):
+    return SOURCE_NAMES | frozenset(normalize_words(source) for source in sources)
+
+
+# Lowercases a title, drops a trailing " - Source Name" / " | Source Name"
+# (only if it's a known outlet, so "Clinton leads - poll shows Trump behind"
+# keeps its second half) and collapses punctuation/whitespace, so wire
+# copies hash the same
+def normalize_title(title, names=SOURCE_NAMES):
+    match = SUFFIX_PATTERN.search(title)
+    if match is not None and normalize_words(match.group(1)) in names:
+        title = title[:match.start()]
+    return normalize_words(title)
+
+
+# Global de-duplication across every source.
+# Exact repeats (after normalization) are caught by a persistent SeenStore.
+# New titles are then checked for near-duplicates with MinHash LSH over title
+# words; candidates are confirmed with the exact Jaccard similarity, since a
+# one-word difference ("wins" vs. "loses") can matter here. For the same
+# reason a candidate is only merged if one title's words are a subset of the
+# other's (words added, like "UPDATE 2" or "AP says", never swapped), and the
+# added words include no market keyword (target/anti-target word) or
+# negation.
+# A duplicate is not re-queued; its source is recorded against the story.
+class Deduplicator:
+
+    # MinHash signature length and rows per LSH band
+    NUM_HASHES = 32
+    BAND_ROWS = 4
+
+    # Large prime for the universal hash family
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, store, logger=None, similarity=0.8, window=6 * 60 * 60, seed=1, clock=time.time, keywords=(), normalize=normalize_title):
+        self.store = store
+        self.logger = logger
+        self.similarity = similarity
+        self.keywords = frozenset(normalize_words(keyword) for keyword in keywords) | NEGATIONS
+        self.normalize = normalize
+        self.window = window
+        self.clock = clock
+
+        rng = random.Random(seed)
+        self.hash_params = [(rng.randrange(1, self.PRIME), rng.randrange(self.PRIME)) for _ in range(self.NUM_HASHES)]
+
+        self.next_story_id = 0
+        self.stories = OrderedDict()
+        self.exact_stories = {}
+        self.band_index = {}
+
+    # path overrides the configured store (and skips importing the old
+    # per-source databases), e.g. for a throwaway store in a replay
+    @classmethod
+    def from_config(cls, config, logger=None, path=None, clock=time.time):
+        dedup_config = config["data_input"].get("dedup", {})
+        if path is None:
+            path = dedup_config.get("path", "db/articles.seen.log")
+            legacy_paths = ["db/" + source + ".newsapi.db.json" for source in config["data_input"]["sources"]]
+        else:
+            legacy_paths = []
+
+        normalize = functools.partial(normalize_title, names=source_names(config["data_input"]["sources"]))
+        keywords = set()
+        for market in config.get("markets", []):
+            keywords.update(market.get("target_words", []))
+            keywords.update(market.get("anti_target_words", []))
+
+        store = SeenStore(
+            path,
+            ttl=dedup_config.get("ttl_hours", 24) * 60 * 60,
+            legacy_paths=legacy_paths,
+            normalize=normalize,
+            clock=clock
+        )
+        return cls(
+            store,
+            logger=logger,
+            similarity=dedup_config.get("similarity", 0.8),
+            window=dedup_config.get("window_hours", 6) * 60 * 60,
+            clock=clock,
+            keywords=keywords,
+            normalize=normalize
+        )
+
+    def signature(self, words):
+        bases = [int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big") for word in words]
+        return [min((a * base + b) % self.PRIME for base in bases) for a, b in self.hash_params]
+
+    def bands(self, signature):
+        return [(i, tuple(signature[i:i + self.BAND_ROWS])) for i in range(0, self.NUM_HASHES, self.BAND_ROWS)]
+
+    # Records a title from a source. Returns True if it's a new story that
+    # should be queued, False if it's a duplicate of one already seen.
+    def add(self, title, source):
+        self.expire()
+
+        key = self.store.key(title)
+        if self.store.contains_key(key):
+            self.record_source(self.exact_stories.get(key), source)
+            return False
+
+        self.store.add_key(key)
+
+        words = set(self.normalize(title).split())
+        if not words:
+            return True
+
+        bands = self.bands(self.signature(words))
+        story_id = self.find_near_duplicate(words, bands)
+        if story_id is not None:
+            self.exact_stories[key] = story_id
+            self.stories[story_id]["keys"].append(key)
+            self.record_source(story_id, source)
+            return False
+
+        story_id = self.next_story_id
+        self.next_story_id += 1
+        self.stories[story_id] = {
+            "title": title,
+            "words": words,
+            "bands": bands,
+            "keys": [key],
+            "sources": [source],
+            "at": self.clock()
+        }
+        self.exact_stories[key] = story_id
+        for band in bands:
+            self.band_index.setdefault(band, set()).add(story_id)
+
+        return True
+
+    def find_near_duplicate(self, words, bands):
+        candidates = set()
+        for band in bands:
+            candidates |= self.band_index.get(band, set())
+
+        best_id = None
+        best_similarity = self.similarity
+        for story_id in candidates:
+            story_words = self.stories[story_id]["words"]
+            similarity = len(words & story_words) / len(words | story_words)
+            if similarity >= best_similarity and self.same_story(words, story_words):
+                best_id = story_id
+                best_similarity = similarity
+
+        return best_id
+
+    # Whether two similar titles can only be copies of one story: one adds
+    # words to the other, and none of those words could change the outcome
+    def same_story(self, words, story_words):
+        if not (words <= story_words or story_words <= words):
+            return False
+
+        return not ((words ^ story_words) & self.keywords)
+
+    def record_source(self, story_id, source):
+        story = self.stories.get(story_id)
+        if story is not None and source not in story["sources"]:
+            story["sources"].append(source)
+
+            if self.logger is not None:
+                self.logger.log("Data Input/Dedup", "informative", "Also reported by %s: %s", source, story["title"])
+
+    # Returns the sources that reported the given title's story
+    def reported_by(self, title):
+        story = self.stories.get(self.exact_stories.get(self.store.key(title)))
+        return list(story["sources"]) if story is not None else []
+
+    # Drops stories older than the near-duplicate window
+    def expire(self, now=None):
+        cutoff = (self.clock() if now is None else now) - self.window
+        while self.stories:
+            story_id, story = next(iter(self.stories.items()))
+            if story["at"] >= cutoff:
+                break
+
+            self.stories.popitem(last=False)
+            for key in story["keys"]:
+                self.exact_stories.pop(key, None)
+            for band in story["bands"]:
+                story_ids = self.band_index.get(band)
+                if story_ids is not None:
+                    story_ids.discard(story_id)
+                    if not story_ids:
+                        del self.band_index[band]
+
+    def prune(self):
+        self.expire()
+        self.store.expire()
+        self.store.compact_if_needed()
@@ -0,0 +1,265 @@
+# Local pre-filter for headlines, run before anything is sent for annotation.
+# Evaluate it against the labeled training set with:
+#   python3 -m data_input.headline_filter [--articles data_analysis/articles.csv]
+import argparse
+import re
+from urllib.parse import unquote
+
+from data_analysis.entity_index import EntityIndex
+
+WORD_SEPARATOR = re.compile(r"[\W_]+")
+
+# Name tokens too common to say anything about a headline on their own
+STOPWORDS = {"the", "and", "for", "van", "von", "der", "del", "las", "los"}
+
+
+# Lowercases and keeps only words, single-space separated
+def normalize(text):
+    return " ".join(WORD_SEPARATOR.sub(" ", text.lower()).split())
+
+
+# "http://en.wikipedia.org/wiki/Donald_Trump_(politician)" -> "donald trump"
+def wikipedia_name(url):
+    title = unquote(url.rstrip("/").rsplit("/", 1)[-1]).replace("_", " ")
+    return normalize(re.sub(r"\(.*?\)", " ", title))
+
+
+# Aho-Corasick automaton over characters: finds every pattern in a text in a
+# single pass, however many patterns there are. Each pattern carries a set of
+# values (market indices); search returns the union of those found.
+class PatternAutomaton:
+
+    def __init__(self, patterns):
+        # patterns: {pattern string: set of values}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+
+        for pattern, values in patterns.items():
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state] |= values
+
+        # Breadth-first, so a state's failure link is done before its children
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, child in self.goto[state].items():
+                queue.append(child)
+
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] |= self.output[self.fail[child]]
+
+    def search(self, text):
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                found |= self.output[state]
+
+        return found
+
+
+# Decides which markets a headline could plausibly be about, from each
+# market's entity names, the names in its Wikipedia URLs and its optional
+# "aliases", so headlines about none of them never cost an annotation.
+#
+# How loose it is:
+#   match "names"   whole names only ("donald trump")
+#   match "tokens"  any name token ("trump"), like get_relevant_markets
+#   fuzzy           also headline words within get_relevant_markets'
+#                   similarity ratio of a name token ("trumps", "clintn")
+#   min_token_length  shorter name tokens are ignored in "tokens" mode
+# Entities the annotator would only link by Wikipedia URL ("POTUS") can't be
+# seen in the text; list them as aliases.
+class HeadlineFilter:
+
+    MATCH_MODES = ("names", "tokens")
+
+    def __init__(self, markets, match="tokens", fuzzy=True, min_token_length=3):
+        if match not in self.MATCH_MODES:
+            raise ValueError("Unknown headline filter match mode: " + str(match))
+
+        self.markets = list(markets)
+        self.match = match
+        self.fuzzy = fuzzy
+        self.min_token_length = min_token_length
+
+        # Patterns are whole names or name tokens; each market keeps the
+        # pattern indices of each of its names, for match_strength
+        self.patterns = []
+        self.pattern_markets = []
+        self.market_names_patterns = []
+        pattern_indices = {}
+        for market_index, market in enumerate(self.markets):
+            names_patterns = []
+            for name in self.market_names(market):
+                if match == "names":
+                    tokens = [name]
+                else:
+                    tokens = [token for token in name.split(" ") if len(token) >= min_token_length and token not in STOPWORDS]
+
+                name_patterns = set()
+                for token in tokens:
+                    if token not in pattern_indices:
+                        pattern_indices[token] = len(self.patterns)
+                        self.patterns.append(token)
+                        self.pattern_markets.append(set())
+                    self.pattern_markets[pattern_indices[token]].add(market_index)
+                    name_patterns.add(pattern_indices[token])
+                if name_patterns:
+                    names_patterns.append(name_patterns)
+            self.market_names_patterns.append(names_patterns)
+
+        # Padded with spaces so patterns only match whole words
+        self.automaton = PatternAutomaton({" " + pattern + " ": {pattern_index} for pattern_index, pattern in enumerate(self.patterns)})
+
+        # Reuses EntityIndex's n-gram candidates and ratio threshold, with one
+        # entry per pattern so it returns pattern indices
+        self.fuzzy_index = None
+        if fuzzy and match == "tokens":
+            self.fuzzy_index = EntityIndex([{"entities": [pattern], "wikipedia_urls": []} for pattern in self.patterns])
+
+    # Reads config["data_input"]["headline_filter"]; None if disabled
+    @classmethod
+    def from_config(cls, config):
+        filter_config = config["data_input"].get("headline_filter", {})
+        if not filter_config.get("enabled", True):
+            return None
+
+        return cls(
+            config["markets"],
+            match=filter_config.get("match", "tokens"),
+            fuzzy=filter_config.get("fuzzy", True),
+            min_token_length=filter_config.get("min_token_length", 3)
+        )
+
+    def market_names(self, market):
+        names = [normalize(name) for name in market.get("entities", []) + market.get("aliases", [])]
+        names.extend(wikipedia_name(url) for url in market.get("wikipedia_urls", []) if url)
+        return [name for name in names if name]
+
+    # Returns (exact, fuzzy): the indices of the patterns found in the
+    # headline, and of those only matched fuzzily
+    def find_patterns(self, title):
+        text = normalize(title)
+        exact = self.automaton.search(" " + text + " ")
+
+        fuzzy = set()
+        if self.fuzzy_index is not None:
+            for token in text.split(" "):
+                if len(token) >= self.min_token_length:
+                    fuzzy |= self.fuzzy_index.token_matches(token)
+
+        return exact, fuzzy - exact
+
+    # Returns the set of indices (into markets) of markets the headline
+    # could be about
+    def matches(self, title):
+        market_indices = set()
+        for pattern_index in set().union(*self.find_patterns(title)):
+            market_indices |= self.pattern_markets[pattern_index]
+
+        return market_indices
+
+    def passes(self, title):
+        return bool(self.matches(title))
+
+    # How strongly the headline points at its best-matching market, from 0
+    # (no market) to 1 (one of a market's names in full): the share of a
+    # name's tokens found, with fuzzy matches counting half
+    def match_strength(self, title):
+        exact, fuzzy = self.find_patterns(title)
+        if not exact and not fuzzy:
+            return 0.0
+
+        strength = 0.0
+        for market_index in self.matches(title):
+            for name_patterns in self.market_names_patterns[market_index]:
+                found = len(name_patterns & exact) + 0.5 * len(name_patterns & fuzzy)
+                strength = max(strength, found / len(name_patterns))
+
+        return strength
+
+
+# Pass rate and recall on labeled articles (see data_analysis.training's
+# load_articles): recall is the share of articles labeled as relevant to
+# their market (0 or 1) whose market the filter kept, the pass rate the
+# share of all articles that would be sent for annotation.
+def evaluate(articles, match="tokens", fuzzy=True, min_token_length=3):
+    markets = []
+    market_indices = {}
+    for article in articles:
+        key = (tuple(article["market"]["entities"]), tuple(article["market"]["wikipedia_urls"]))
+        if key not in market_indices:
+            market_indices[key] = len(markets)
+            markets.append(article["market"])
+
+    headline_filter = HeadlineFilter(markets, match, fuzzy, min_token_length)
+
+    passed = relevant = recalled = irrelevant = irrelevant_passed = 0
+    missed = []
+    for article in articles:
+        key = (tuple(article["market"]["entities"]), tuple(article["market"]["wikipedia_urls"]))
+        matched = headline_filter.matches(article["article"]["title"])
+        passed += bool(matched)
+
+        if article["label"] == -1:
+            irrelevant += 1
+            irrelevant_passed += bool(matched)
+        else:
+            relevant += 1
+            if market_indices[key] in matched:
+                recalled += 1
+            else:
+                missed.append(article["article"]["title"])
+
+    return {
+        "match": match,
+        "fuzzy": fuzzy,
+        "min_token_length": min_token_length,
+        "articles": len(articles),
+        "pass_rate": passed / len(articles) if articles else None,
+        "recall": recalled / relevant if relevant else None,
+        "irrelevant_pass_rate": irrelevant_passed / irrelevant if irrelevant else None,
+        "missed": missed
+    }
+
+
+def main():
+    from data_analysis.training import load_articles
+
+    parser = argparse.ArgumentParser(description="Report the headline pre-filter's pass rate and recall on labeled articles.")
+    parser.add_argument("--articles", default="data_analysis/articles.csv")
+    parser.add_argument("--min-token-length", type=int, default=3)
+    parser.add_argument("--show-missed", action="store_true", help="list the relevant headlines each setting drops")
+    args = parser.parse_args()
+
+    articles = load_articles(args.articles)
+
+    print("match   fuzzy  pass rate  recall  irrelevant pass rate")
+    for match in HeadlineFilter.MATCH_MODES:
+        for fuzzy in (False, True):
+            if fuzzy and match == "names":
+                continue
+
+            result = evaluate(articles, match, fuzzy, args.min_token_length)
+            print("%-6s  %-5s  %9.3f  %6.3f  %20.3f" % (match, fuzzy, result["pass_rate"], result["recall"], result["irrelevant_pass_rate"]))
+            if args.show_missed:
+                for title in result["missed"]:
+                    print("    missed: " + title)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,32 +3,58 @@ import urllib3.request
 import certifi
 
 
+class NewsApiError(Exception):
+    pass
+
+
+# Creates a connection pool that can be shared between NewsApi instances
+def create_pool(maxsize=1):
+    return urllib3.PoolManager(
+        maxsize = maxsize,           # Connections kept per host.
+        block = True,                # Wait for a free connection instead of opening extras.
+        cert_reqs = "CERT_REQUIRED", # Force certificate check.
+        ca_certs = certifi.where(),  # Path to the Certifi bundle.
+    )
+
+
 # Interfaces with the newsapi.org API
 class NewsApi:
 
-    def __init__(self, api_key, source, logger):
+    BASE_URI = "https://newsapi.org/v1/articles"
+
+    def __init__(self, api_key, source, logger, http=None, base_uri=None, timeout=10):
         self.apiKey = api_key
         self.source = source
         self.logger = logger
-        self.sort_error_displayed = False
-        self.http = urllib3.PoolManager(
-            cert_reqs = "CERT_REQUIRED", # Force certificate check.
-            ca_certs = certifi.where(),  # Path to the Certifi bundle.
-        )
+        self.base_uri = base_uri or self.BASE_URI
+        self.timeout = timeout
+        self.http = http or create_pool()
+
+        # Some sources can't be sorted by 'latest'; once we find that out,
+        # stick with 'top' instead of asking again every poll
+        self.sort = "latest"
 
     # Retrieves articles from source
-    def get_articles(self, sort='latest'):
-        request_uri = "https://newsapi.org/v1/articles"
-        request_uri += "?apiKey=" + self.apiKey
-        request_uri += "&source=" + self.source
-        request_uri += "&sortBy=" + sort
-
-        response = self.http.request("GET", request_uri)
-        jsonobj = json.loads(response.data.decode("utf-8"))
-        if not jsonobj["status"] == "error":
-            return jsonobj["articles"]
-        else:
-            if not self.sort_error_displayed:
-                self.sort_error_displayed = True
-                self.logger.log("News API", "error", "Error: the source \'" + self.source + "\' cannot be sorted by \'latest.\'" + " Changing the sort to \'top\'")
-            return self.get_articles(sort='top')
+    def get_articles(self):
+        while True:
+            response = self.http.request(
+                "GET",
+                self.base_uri,
+                fields={
+                    "apiKey": self.apiKey,
+                    "source": self.source,
+                    "sortBy": self.sort
+                },
+                timeout=self.timeout,
+                retries=False
+            )
+            jsonobj = json.loads(response.data.decode("utf-8"))
+            if not jsonobj["status"] == "error":
+                return jsonobj["articles"]
+
+            if self.sort == "latest" and response.status < 500:
+                self.sort = "top"
+                self.logger.log("News API", "error", "Error: the source '%s' cannot be sorted by 'latest.' Changing the sort to 'top'", self.source)
+                continue
+
+            raise NewsApiError(self.source + ": " + str(jsonobj.get("message", "unknown error")))
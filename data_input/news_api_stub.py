@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+# Local stand-in for the newsapi.org articles endpoint, for tests and benchmarks.
+# Serves whatever articles have been published to each source, optionally
+# refuses sortBy=latest for some sources, and can add artificial latency.
+# Point NewsApi at it with config["data_input"]["news_api"]["base_uri"].
+class NewsApiStub:
+
+    def __init__(self, latency=0.0, unsortable_sources=(), failing_sources=()):
+        self.latency = latency
+        self.unsortable_sources = set(unsortable_sources)
+        self.failing_sources = set(failing_sources)
+        self.articles = {}
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    # Adds an article to the front of a source's feed
+    def publish(self, source, article):
+        with self.lock:
+            self.articles.setdefault(source, []).insert(0, article)
+
+    def respond(self, params):
+        source = params.get("source", [""])[0]
+        sort = params.get("sortBy", ["top"])[0]
+
+        with self.lock:
+            self.requests[source] = self.requests.get(source, 0) + 1
+            articles = list(self.articles.get(source, [])[:10])
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if source in self.failing_sources:
+            return 500, {"status": "error", "code": "unexpectedError", "message": "Stub failure"}
+
+        if sort == "latest" and source in self.unsortable_sources:
+            return 200, {"status": "error", "code": "sourceUnavailableSortedBy", "message": "Cannot sort by latest"}
+
+        return 200, {"status": "ok", "source": source, "sortBy": sort, "articles": articles}
+
+    # Starts serving on a background thread and returns the base URI
+    def start(self, host="127.0.0.1", port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = stub.respond(parse_qs(urlparse(self.path).query))
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return "http://%s:%d/v1/articles" % self.server.server_address
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,93 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# Polling schedule for a single source.
+# The interval adapts to how often the source actually publishes: it halves
+# whenever a poll turns up something new and grows when nothing changed.
+# Failures back off exponentially (with jitter) up to max_backoff.
+class SourceSchedule:
+
+    SPEEDUP = 0.5
+    SLOWDOWN = 1.5
+
+    def __init__(self, name, api, interval, min_interval, max_interval, max_backoff):
+        self.name = name
+        self.api = api
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+
+        self.failures = 0
+        self.next_poll = 0
+        self.in_flight = False
+
+    def record_success(self, new_articles, now=None):
+        now = time.time() if now is None else now
+        self.failures = 0
+
+        if new_articles:
+            self.interval = max(self.min_interval, self.interval * self.SPEEDUP)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.SLOWDOWN)
+
+        self.next_poll = now + self.interval
+
+    def record_failure(self, now=None):
+        now = time.time() if now is None else now
+        self.failures += 1
+
+        delay = min(self.max_backoff, self.interval * (2 ** self.failures))
+        self.next_poll = now + delay * random.uniform(0.8, 1.2)
+
+
+# Polls every source concurrently on a thread pool.
+# All NewsApi instances should share one connection pool (see
+# news_api.create_pool), so connections to the API host are reused.
+class Poller:
+
+    def __init__(self, schedules, max_workers):
+        self.schedules = schedules
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.in_flight = {}
+
+    # Starts a fetch for every source that is due and not already being fetched,
+    # then waits for at least one fetch to finish (or for the next source to
+    # become due, or max_wait seconds). Returns a list of (schedule, articles,
+    # error) tuples.
+    def poll(self, max_wait=None):
+        now = time.time()
+        for schedule in self.schedules:
+            if not schedule.in_flight and schedule.next_poll <= now:
+                schedule.in_flight = True
+                self.in_flight[self.executor.submit(schedule.api.get_articles)] = schedule
+
+        idle = [schedule.next_poll for schedule in self.schedules if not schedule.in_flight]
+        timeout = max(0, min(idle) - time.time()) if idle else None
+        if max_wait is not None:
+            timeout = max_wait if timeout is None else min(timeout, max_wait)
+
+        if not self.in_flight:
+            time.sleep(timeout or 0)
+            return []
+
+        done, _ = wait(list(self.in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+
+        results = []
+        for future in done:
+            schedule = self.in_flight.pop(future)
+            schedule.in_flight = False
+
+            error = future.exception()
+            if error is not None:
+                schedule.record_failure()
+                results.append((schedule, None, error))
+            else:
+                results.append((schedule, future.result(), None))
+
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import time
+
+from metrics import published_at
+
+
+# Holds new articles in Data Input and hands them to the article queue best
+# first, only while the queue is shallow, so a fresh article about a market
+# never waits behind a polling burst of stale ones: its queueing delay is at
+# most dispatch_depth articles' worth of analysis.
+#
+# Articles are ranked by when they were (probably) published, moved earlier
+# or later by how strongly the headline matched a market (see
+# HeadlineFilter.match_strength): each unit of strength counts as
+# match_bonus seconds of freshness. Articles without a usable publishedAt are
+# assumed to be as old as that source's articles usually are on arrival.
+# Articles older than max_age seconds are dropped ("expired"), and when more
+# than max_pending are waiting the lowest ranked one is dropped ("dropped").
+class ArticleScheduler:
+
+    # Weight of the newest sample in each source's arrival lag average
+    LAG_SMOOTHING = 0.2
+
+    def __init__(self, max_age=3600, max_pending=1000, dispatch_depth=16, match_bonus=300, clock=time.time):
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.dispatch_depth = dispatch_depth
+        self.match_bonus = match_bonus
+        self.clock = clock
+
+        # Entries are (-rank, sequence, published, article)
+        self.pending = []
+        self.sequence = itertools.count()
+        self.source_lags = {}
+
+        self.expired = 0
+        self.dropped = 0
+
+    # Reads config["data_input"]["scheduler"]
+    @classmethod
+    def from_config(cls, config, clock=time.time):
+        scheduler_config = config["data_input"].get("scheduler", {})
+        analysis_config = config.get("data_analysis", {})
+        return cls(
+            max_age=scheduler_config.get("max_age", 3600),
+            max_pending=scheduler_config.get("max_pending", 1000),
+            dispatch_depth=scheduler_config.get("dispatch_depth", analysis_config.get("max_batch_size", 8) * 2),
+            match_bonus=scheduler_config.get("match_bonus", 300),
+            clock=clock
+        )
+
+    # Expected publish time: publishedAt, or arrival minus the source's
+    # usual lag. Also updates that lag.
+    def estimate_published(self, article, source, now):
+        published = published_at(article)
+        lag = self.source_lags.get(source)
+
+        if published is not None:
+            sample = max(0.0, now - published)
+            self.source_lags[source] = sample if lag is None else lag + self.LAG_SMOOTHING * (sample - lag)
+            return published
+
+        return now - (lag or 0.0)
+
+    # Returns False if the article was already too old to queue
+    def push(self, article, source, strength=0.0):
+        now = self.clock()
+        published = self.estimate_published(article, source, now)
+        if now - published > self.max_age:
+            self.expired += 1
+            return False
+
+        rank = published + self.match_bonus * strength
+        heapq.heappush(self.pending, (-rank, next(self.sequence), published, article))
+
+        if len(self.pending) > self.max_pending:
+            # The lowest ranked entry is among the leaves
+            lowest = max(range(len(self.pending) // 2, len(self.pending)), key=lambda i: self.pending[i][:2])
+            self.pending[lowest] = self.pending[-1]
+            self.pending.pop()
+            heapq.heapify(self.pending)
+            self.dropped += 1
+
+        return True
+
+    # Pops articles best first while queue_depth() is below dispatch_depth,
+    # skipping expired ones; returns them in that order
+    def dispatch(self, queue_depth):
+        now = self.clock()
+        articles = []
+        depth = queue_depth()
+        while self.pending and depth < self.dispatch_depth:
+            _, _, published, article = heapq.heappop(self.pending)
+            if now - published > self.max_age:
+                self.expired += 1
+                continue
+
+            articles.append(article)
+            depth += 1
+
+        return articles
+
+    # Drops every waiting article that has passed max_age
+    def expire(self):
+        now = self.clock()
+        kept = [entry for entry in self.pending if now - entry[2] <= self.max_age]
+        self.expired += len(self.pending) - len(kept)
+        if len(kept) != len(self.pending):
+            self.pending = kept
+            heapq.heapify(self.pending)
+
+    def __len__(self):
+        return len(self.pending)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+import arrow
+
+
+# De-duplication store for article titles.
+# Keeps title hashes in memory (in insertion order, so expiry only ever looks at
+# the oldest entries) and appends each new hash to a log file, which is replayed
+# on startup and rewritten once it is mostly expired lines.
+class SeenStore:
+
+    # Rewrite the log once it has this many times more lines than live entries
+    COMPACT_RATIO = 2
+    COMPACT_MIN_LINES = 1000
+
+    # normalize, if given, is applied to titles before hashing.
+    # clock returns the current timestamp (replays pass a simulated one).
+    def __init__(self, path, ttl=24 * 60 * 60, legacy_paths=(), normalize=None, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.normalize = normalize
+        self.clock = clock
+        self.seen = OrderedDict()
+        self.log_lines = 0
+        self.log = None
+
+        self.load()
+        for legacy_path in legacy_paths:
+            if os.path.exists(legacy_path):
+                self.import_tinydb(legacy_path)
+
+        self.log = open(self.path, "a")
+
+    def key(self, title):
+        if self.normalize is not None:
+            title = self.normalize(title)
+
+        return hashlib.blake2b(title.encode("utf-8"), digest_size=8).hexdigest()
+
+    def __contains__(self, title):
+        return self.contains_key(self.key(title))
+
+    def __len__(self):
+        return len(self.seen)
+
+    def contains_key(self, key):
+        self.expire()
+        return key in self.seen
+
+    # Records a title as seen. Returns False if it already was.
+    def add(self, title, at=None):
+        return self.add_key(self.key(title), at)
+
+    def add_key(self, key, at=None):
+        self.expire()
+
+        if key in self.seen:
+            return False
+
+        at = self.clock() if at is None else at
+        self.seen[key] = at
+        self.log.write(repr(at) + "\t" + key + "\n")
+        self.log.flush()
+        self.log_lines += 1
+
+        return True
+
+    # Drops entries older than the TTL; amortized O(1) per entry
+    def expire(self, now=None):
+        cutoff = (self.clock() if now is None else now) - self.ttl
+        while self.seen:
+            key, at = next(iter(self.seen.items()))
+            if at >= cutoff:
+                break
+            self.seen.popitem(last=False)
+
+    def compact_if_needed(self):
+        if self.log_lines > max(self.COMPACT_MIN_LINES, self.COMPACT_RATIO * len(self.seen)):
+            self.compact()
+
+    # Rewrites the log with only live entries
+    def compact(self):
+        self.expire()
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            for key, at in self.seen.items():
+                f.write(repr(at) + "\t" + key + "\n")
+        os.replace(temp_path, self.path)
+
+        if self.log is not None:
+            self.log.close()
+            self.log = open(self.path, "a")
+        self.log_lines = len(self.seen)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        entries = []
+        with open(self.path, "r") as f:
+            for line in f:
+                self.log_lines += 1
+                try:
+                    at, key = line.rstrip("\n").split("\t")
+                    entries.append((float(at), key))
+                except ValueError:
+                    # Partial line from a crash mid-write
+                    continue
+
+        cutoff = self.clock() - self.ttl
+        for at, key in sorted(entries):
+            if at >= cutoff and key not in self.seen:
+                self.seen[key] = at
+
+    # One-time import of an old TinyDB "<source>.newsapi.db.json" file.
+    # The old file is renamed afterwards so it isn't imported again.
+    def import_tinydb(self, legacy_path):
+        with open(legacy_path, "r") as f:
+            try:
+                tables = json.load(f)
+            except ValueError:
+                tables = {}
+
+        entries = []
+        for table in tables.values():
+            for doc in table.values():
+                try:
+                    entries.append((arrow.get(doc["at"]).float_timestamp, self.key(doc["title"])))
+                except Exception:
+                    # Skip malformed rows
+                    continue
+
+        cutoff = self.clock() - self.ttl
+        for at, key in sorted(entries):
+            if at >= cutoff and key not in self.seen:
+                self.seen[key] = at
+
+        # Keep insertion order == time order after merging
+        self.seen = OrderedDict(sorted(self.seen.items(), key=lambda item: item[1]))
+        self.compact()
+        os.replace(legacy_path, legacy_path + ".imported")
+
+    def close(self):
+        self.log.close()
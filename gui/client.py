@@ -0,0 +1,103 @@
+from multiprocessing.connection import Client
+import tkinter as tk
+
+from gui.page import MainPage, StatsPage
+
+
+# Latest metrics snapshot received from the service, in the shape of
+# Metrics.snapshot() so StatsPage can read it the same way
+class RemoteMetrics:
+
+    def __init__(self):
+        self.latest = {"stages": {}, "gauges": {}}
+
+    def snapshot(self):
+        return self.latest
+
+
+# Tk front end for a running Service (see service.py).
+# Shows the service's log lines and metrics; quitting asks the service to stop.
+class GuiClient:
+
+    # How often (ms) the connection is checked for new messages
+    POLL_INTERVAL = 100
+
+    def __init__(self, address, authkey):
+        self.connection = Client(address, authkey=authkey)
+        self.metrics = RemoteMetrics()
+
+        self.gui = tk.Tk()
+        self.gui.geometry("1080x720")
+
+        tk.Tk.wm_title(self.gui, "Algo Trading Bot")
+
+        container = tk.Frame(self.gui)
+        container.pack(side="top", fill="both", expand=True)
+        container.grid_rowconfigure(0, weight=1)
+        container.grid_columnconfigure(0, weight=1)
+
+        menu = tk.Menu(container)
+        viewmenu = tk.Menu(menu, tearoff=0)
+        menu.add_cascade(label="View", menu=viewmenu)
+        viewmenu.add_command(label="Control", command=lambda: self.show_frame(MainPage))
+        viewmenu.add_command(label="Stats", command=lambda: self.show_frame(StatsPage))
+        tk.Tk.config(self.gui, menu=menu)
+
+        self.frames = {}
+
+        for frameType in (MainPage, StatsPage):
+            frame = frameType(container, self)
+            self.frames[frameType] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+
+        self.show_frame(MainPage)
+
+        self.gui.after(self.POLL_INTERVAL, self.poll_messages)
+
+    def run(self):
+        while True:
+            try:
+                self.gui.mainloop()
+                break
+            except UnicodeDecodeError:
+                pass
+
+    # Reads whatever the service has sent, without blocking the Tk loop
+    def poll_messages(self):
+        lines = []
+        try:
+            while self.connection.poll():
+                kind, data = self.connection.recv()
+                if kind == "lines":
+                    lines.extend(data)
+                elif kind == "metrics":
+                    self.metrics.latest = data
+        except (OSError, EOFError):
+            self.print_to_screen("Lost connection to the service.")
+            return
+
+        if lines:
+            self.frames[MainPage].print_lines(lines)
+
+        self.gui.after(self.POLL_INTERVAL, self.poll_messages)
+
+    # The service is already running by the time a client attaches
+    def start(self):
+        self.print_to_screen("Attached to the bot service.")
+
+    def stop(self):
+        try:
+            self.connection.send(("stop",))
+        except (OSError, EOFError):
+            pass
+        self.gui.destroy()
+
+    def print_trade(self, str):
+        self.frames[MainPage].printtrade(str)
+
+    def print_to_screen(self, str):
+        self.frames[MainPage].print(str)
+
+    def show_frame(self, cont):
+        frame = self.frames[cont]
+        frame.tkraise()
@@ -21,6 +21,9 @@ class MainPage(tk.Frame):
 
     running = False
 
+    # Lines of scrollback kept in the console
+    MAX_CONSOLE_LINES = 5000
+
     def __init__(self, parent, controller):
         tk.Frame.__init__(self, parent)
         self.configure(bg=BG_COLOR)
@@ -79,9 +82,20 @@ class MainPage(tk.Frame):
         self.tradelist.insert(0, str)
 
     def print(self, str):
+        self.print_lines([str])
+
+    # Appends lines to the console in a single widget update,
+    # trimming the oldest lines past MAX_CONSOLE_LINES
+    def print_lines(self, lines):
         self.console.configure(state=tk.NORMAL)
-        self.console.insert(index=tk.END, chars=" > " + str + "\n")
+        self.console.insert(index=tk.END, chars="".join(" > " + line + "\n" for line in lines))
+
+        line_count = int(self.console.index("end-1c").split(".")[0])
+        if line_count > self.MAX_CONSOLE_LINES:
+            self.console.delete("1.0", str(line_count - self.MAX_CONSOLE_LINES + 1) + ".0")
+
         self.console.configure(state=tk.DISABLED)
+        self.console.see(tk.END)
 
 
 class StatsPage(tk.Frame):
@@ -90,6 +104,7 @@ class StatsPage(tk.Frame):
         tk.Frame.__init__(self, parent)
         self.configure(bg=BG_COLOR)
 
+        self.controller = controller
         self.trends = Figure(figsize=(5, 5), dpi=100)
         self.a = self.trends.add_subplot(111)
 
@@ -103,7 +118,21 @@ class StatsPage(tk.Frame):
 
         self.animation = FuncAnimation(self.trends, self.animate, 5000)
 
+    # Grouped p50/p95/p99 latency bars (ms) for each pipeline stage
     def animate(self, i):
+        snapshot = self.controller.metrics.snapshot()
+        stages = list(snapshot["stages"].keys())
+
         self.a.clear()
-        self.a.plot([1,2,3,4,5,6,7,8], [0,5,7,4,12,15,23,20])
+        for offset, percentile in enumerate(("p50", "p95", "p99")):
+            values = [(snapshot["stages"][stage][percentile] or 0) * 1000 for stage in stages]
+            self.a.bar([x + (offset - 1) * 0.25 for x in range(len(stages))], values, width=0.25, label=percentile)
+
+        self.a.set_xticks(range(len(stages)))
+        self.a.set_xticklabels(stages, rotation=20)
+        self.a.set_ylabel("Latency (ms)")
+        self.a.legend()
+
+        gauges = snapshot["gauges"]
+        self.a.set_title("Article queue: " + str(gauges.get("article_queue_depth", "?")) + "    Result queue: " + str(gauges.get("result_queue_depth", "?")))
 
@@ -1,14 +1,153 @@
-# Logs to message queue
+# Structured logging.
+# Each process buffers compact record tuples and ships them to the message
+# queue in batches; the main process formats them for the screen and writes
+# them to a JSON-lines file.
+import json
+import os
+import queue
+import threading
+import time
+
 import arrow
 
+LEVELS = {
+    "debug": 10,
+    "informative": 20,
+    "warning": 30,
+    "error": 40
+}
+
+
 class Logger:
-    def __init__(self, message_queue):
+
+    # A batch is sent when it's this big, when it's this old (seconds),
+    # on any error, or when flush() is called
+    BATCH_SIZE = 64
+    FLUSH_INTERVAL = 0.25
+
+    def __init__(self, message_queue, level="informative"):
         self.message_queue = message_queue
+        self.level = LEVELS[level]
+        self.pid = os.getpid()
+        self.batch = []
+        self.last_flush = time.monotonic()
+
+    def enabled(self, msg_type):
+        return LEVELS.get(msg_type, LEVELS["informative"]) >= self.level
+
+    # Messages may use %-style placeholders filled from args; formatting only
+    # happens in the main process, and only for records that pass the level.
+    def log(self, source, msg_type, message, *args):
+        level = LEVELS.get(msg_type, LEVELS["informative"])
+        if level < self.level:
+            return
+
+        self.append(level, source, msg_type, message, args)
+
+    # Sends a metrics payload (a dict) to the main process as a "metric"
+    # record; metrics aren't level-filtered or shown on screen
+    def metric(self, source, name, data):
+        self.append(LEVELS["informative"], source, "metric", name, (data,))
+
+    def append(self, level, source, msg_type, message, args):
+        # Each process gets its own copy of the logger when it's forked;
+        # don't resend records that were buffered in the parent
+        if os.getpid() != self.pid:
+            self.pid = os.getpid()
+            self.batch = []
+
+        now = time.monotonic()
+        self.batch.append((now, time.time(), self.pid, source, msg_type, message, args))
+
+        if level >= LEVELS["error"] or len(self.batch) >= self.BATCH_SIZE or now - self.last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    # Sends buffered records. Call before blocking, so records don't sit idle.
+    def flush(self):
+        if self.batch and os.getpid() == self.pid:
+            self.message_queue.put(self.batch)
+        self.batch = []
+        self.last_flush = time.monotonic()
+
+
+# Record tuple layout
+MONOTONIC, TIME, PID, SOURCE, TYPE, MESSAGE, ARGS = range(7)
+
+
+def record_message(record):
+    if not record[ARGS]:
+        return record[MESSAGE]
+
+    try:
+        return record[MESSAGE] % record[ARGS]
+    except (TypeError, ValueError):
+        return record[MESSAGE] + " " + " ".join(str(arg) for arg in record[ARGS])
+
+
+# Human-readable line for the console/GUI
+def format_record(record):
+    message = record_message(record)
+
+    # Tk can't display characters outside the BMP
+    try:
+        message.encode("ascii")
+    except UnicodeEncodeError:
+        message = "".join(ch for ch in message if ord(ch) <= 0xFFFF)
+
+    return "[" + str(arrow.get(record[TIME]).to("local")) + "] " + "[" + record[SOURCE] + "] " + "[" + record[TYPE] + "] " + "[" + message + "]"
+
+
+def record_to_json(record):
+    return json.dumps({
+        "time": record[TIME],
+        "monotonic": record[MONOTONIC],
+        "pid": record[PID],
+        "source": record[SOURCE],
+        "level": record[TYPE],
+        "message": record_message(record)
+    })
+
+
+# Writes log records to a file from a background thread, one line per record
+# (by default as JSON). Lines are buffered and flushed about once a second.
+class LogWriter:
+
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, format=record_to_json):
+        self.file = open(path, "w", buffering=64 * 1024)
+        self.format = format
+        self.records = queue.Queue()
+        self.closed = threading.Event()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        self.records.put(record)
+
+    def run(self):
+        last_flush = time.time()
+        while True:
+            try:
+                record = self.records.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                record = None
+
+            if record is not None:
+                self.file.write(self.format(record) + "\n")
+
+            if self.closed.is_set() and self.records.empty():
+                break
 
-    def log(self, source, msg_type, message):
-        time = str(arrow.now())
+            if time.time() - last_flush >= self.FLUSH_INTERVAL:
+                self.file.flush()
+                last_flush = time.time()
 
-        message = ''.join(ch for ch in message if ch.isalnum() or ch == " ")
+        self.file.close()
 
-        message_final = "[" + time + "] " + "[" + source + "] " + "[" + msg_type + "] " + "[" + message + "]"
-        self.message_queue.put(message_final)
+    # Writes out anything still queued and closes the file
+    def close(self):
+        self.closed.set()
+        self.records.put(None)
+        self.thread.join()
@@ -0,0 +1,134 @@
+# Compact encoding of the messages passed between stages.
+# A frame holds a batch of articles or results: an interned string table,
+# then fixed-layout struct records that refer to strings, articles and
+# markets by index. Results carry the market's index in config["markets"]
+# instead of the market dict, and results for the same article share one
+# article record.
+#
+# Only the article fields the later stages use are carried: ARTICLE_FIELDS
+# and the "timings" dict.
+import struct
+
+ARTICLE_FIELDS = ("title", "url", "publishedAt")
+
+FRAME_HEADER = struct.Struct("<III")    # strings, articles, results
+STRING_HEADER = struct.Struct("<I")     # length in bytes
+ARTICLE_RECORD = struct.Struct("<" + "I" * len(ARTICLE_FIELDS) + "B")  # string refs, timings
+TIMING_RECORD = struct.Struct("<Id")    # name ref, timestamp
+RESULT_RECORD = struct.Struct("<HIIB")  # market, article, model version ref, scores
+SCORE = struct.Struct("<d")
+
+
+# Strings in first-use order; ref 0 is None
+class StringTable:
+
+    def __init__(self):
+        self.refs = {}
+        self.strings = []
+
+    def ref(self, string):
+        if string is None:
+            return 0
+
+        ref = self.refs.get(string)
+        if ref is None:
+            self.strings.append(string)
+            ref = self.refs[string] = len(self.strings)
+        return ref
+
+
+def encode_frame(articles, results=()):
+    strings = StringTable()
+    article_indices = {}
+    article_records = []
+
+    def article_index(article):
+        if id(article) not in article_indices:
+            article_indices[id(article)] = len(article_records)
+            timings = article.get("timings", {})
+            record = [ARTICLE_RECORD.pack(*([strings.ref(article.get(field)) for field in ARTICLE_FIELDS] + [len(timings)]))]
+            for name, at in timings.items():
+                record.append(TIMING_RECORD.pack(strings.ref(name), at))
+            article_records.append(b"".join(record))
+        return article_indices[id(article)]
+
+    for article in articles:
+        article_index(article)
+
+    result_records = []
+    for market_index, article, model_version, score in results:
+        record = [RESULT_RECORD.pack(market_index, article_index(article), strings.ref(model_version), len(score))]
+        record.extend(SCORE.pack(value) for value in score)
+        result_records.append(b"".join(record))
+
+    parts = [FRAME_HEADER.pack(len(strings.strings), len(article_records), len(result_records))]
+    for string in strings.strings:
+        data = string.encode("utf-8")
+        parts.append(STRING_HEADER.pack(len(data)))
+        parts.append(data)
+    parts.extend(article_records)
+    parts.extend(result_records)
+    return b"".join(parts)
+
+
+# Returns (articles, results); results are
+# (market index, article, model version, scores)
+def decode_frame(data):
+    num_strings, num_articles, num_results = FRAME_HEADER.unpack_from(data, 0)
+    offset = FRAME_HEADER.size
+
+    strings = [None]
+    for _ in range(num_strings):
+        length, = STRING_HEADER.unpack_from(data, offset)
+        offset += STRING_HEADER.size
+        strings.append(bytes(data[offset:offset + length]).decode("utf-8"))
+        offset += length
+
+    articles = []
+    for _ in range(num_articles):
+        fields = ARTICLE_RECORD.unpack_from(data, offset)
+        offset += ARTICLE_RECORD.size
+
+        article = {field: strings[ref] for field, ref in zip(ARTICLE_FIELDS, fields)}
+        timings = {}
+        for _ in range(fields[-1]):
+            name, at = TIMING_RECORD.unpack_from(data, offset)
+            offset += TIMING_RECORD.size
+            timings[strings[name]] = at
+        article["timings"] = timings
+        articles.append(article)
+
+    results = []
+    for _ in range(num_results):
+        market_index, article_index, model_version, num_scores = RESULT_RECORD.unpack_from(data, offset)
+        offset += RESULT_RECORD.size
+        score = [SCORE.unpack_from(data, offset + i * SCORE.size)[0] for i in range(num_scores)]
+        offset += num_scores * SCORE.size
+        results.append((market_index, articles[article_index], strings[model_version], score))
+
+    return articles, results
+
+
+class ArticleCodec:
+
+    def encode(self, articles):
+        return encode_frame(articles)
+
+    def decode(self, data):
+        return decode_frame(data)[0]
+
+
+# Results are {"market", "article", "score", "model_version"} dicts; markets
+# must come from the `markets` list both ends were built with
+# (config["markets"])
+class ResultCodec:
+
+    def __init__(self, markets):
+        self.markets = markets
+        self.market_indices = {market["contract_id"]: index for index, market in enumerate(markets)}
+
+    def encode(self, results):
+        return encode_frame((), [(self.market_indices[result["market"]["contract_id"]], result["article"], result.get("model_version"), result["score"]) for result in results])
+
+    def decode(self, data):
+        return [{"market": self.markets[market_index], "article": article, "score": score, "model_version": model_version} for market_index, article, model_version, score in decode_frame(data)[1]]
@@ -0,0 +1,92 @@
+# Pipeline latency metrics.
+# Articles carry a "timings" dict of wall-clock timestamps as they move through
+# the pipeline; stages report them to the main process (see Logger.metric),
+# which aggregates them into per-stage latency histograms.
+import collections
+import json
+import os
+import time
+
+import arrow
+
+# (stage name, start timestamp, end timestamp)
+STAGES = [
+    ("publish_to_poll", "published", "received"),
+    ("article_queue", "received", "analysis_dequeued"),
+    ("annotation", "analysis_dequeued", "annotated"),
+    ("scoring", "annotated", "scored"),
+    ("result_queue", "scored", "trader_dequeued"),
+    ("order", "trader_dequeued", "order_submitted"),
+    ("total", "published", "order_submitted")
+]
+
+
+# Records a pipeline timestamp on an article
+def mark(article, name, at=None):
+    article.setdefault("timings", {})[name] = time.time() if at is None else at
+
+
+# Parses NewsAPI's publishedAt into a timestamp, or None
+def published_at(article):
+    try:
+        return arrow.get(article["publishedAt"]).float_timestamp
+    except Exception:
+        return None
+
+
+# Latency samples for one stage; keeps the most recent `size` samples
+class Histogram:
+
+    def __init__(self, size=10000):
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def percentile(self, sorted_samples, fraction):
+        if not sorted_samples:
+            return None
+
+        return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+
+    def summary(self):
+        sorted_samples = sorted(self.samples)
+        return {
+            "count": self.count,
+            "p50": self.percentile(sorted_samples, 0.50),
+            "p95": self.percentile(sorted_samples, 0.95),
+            "p99": self.percentile(sorted_samples, 0.99),
+            "max": sorted_samples[-1] if sorted_samples else None
+        }
+
+
+class Metrics:
+
+    def __init__(self):
+        self.histograms = collections.OrderedDict((name, Histogram()) for name, _, _ in STAGES)
+        self.gauges = {}
+
+    # Adds a sample for every stage whose start and end are both present
+    def record_timings(self, timings):
+        for name, start, end in STAGES:
+            if start in timings and end in timings and timings[start] is not None:
+                self.histograms[name].add(timings[end] - timings[start])
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def snapshot(self):
+        return {
+            "time": time.time(),
+            "stages": collections.OrderedDict((name, histogram.summary()) for name, histogram in self.histograms.items()),
+            "gauges": dict(self.gauges)
+        }
+
+    # Writes a JSON snapshot, replacing the file atomically
+    def write(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temp_path, path)
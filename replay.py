@@ -0,0 +1,266 @@
+# Offline replay / backtest.
+# Feeds a recorded article stream through the real de-duplication, analysis
+# and trading code in a single process, against a simulated clock and a
+# simulated WebInterface, and reports fills, P&L and throughput.
+#
+#   python3 replay.py recording.jsonl [--annotator fake] [--speed 60]
+#
+# The recording is JSON lines, in any order:
+#   {"at": 1488300000.0, "source": "reuters", "article": {"title": ..., ...}}
+#   {"at": "2017-03-01T12:00:00Z", "contract_id": "4446", "yes_price": 0.62}
+# "at" is a timestamp or date string; articles without one fall back to
+# publishedAt. Set data_input.record_path in the config to record a live run.
+import argparse
+import json
+import os
+import queue
+import tempfile
+import time
+
+import arrow
+
+from data_analysis.annotation_cache import AnnotationCache, CachedAnnotator
+from data_analysis.data_analysis import DataAnalysis
+from data_analysis.fake_annotator import FakeAnnotator
+from data_input.deduplicator import Deduplicator
+from data_input.headline_filter import HeadlineFilter
+from data_input.scheduler import ArticleScheduler
+from logger import Logger, TYPE, ARGS
+from metrics import Metrics, mark, published_at
+from trader.simulated_web_interface import SimulatedWebInterface
+from trader.position_store import PositionStore
+from trader.trader import Trader
+
+
+# Clock that only moves when the replay advances it.
+# With speed set, advancing also sleeps, so 1 replays in real time,
+# 60 replays an hour a minute, and None runs as fast as possible.
+class SimulatedClock:
+
+    def __init__(self, start=0.0, speed=None):
+        self.current = start
+        self.speed = speed
+
+    def time(self):
+        return self.current
+
+    def now(self):
+        return arrow.get(self.current)
+
+    def advance_to(self, at):
+        if at <= self.current:
+            return
+
+        if self.speed:
+            time.sleep((at - self.current) / self.speed)
+        self.current = at
+
+
+def record_time(record):
+    if "at" in record:
+        at = record["at"]
+        return float(at) if isinstance(at, (int, float)) else arrow.get(at).float_timestamp
+
+    if "article" in record:
+        return published_at(record["article"])
+
+    return None
+
+
+# Returns the recording's records sorted by time, each with a numeric "at".
+# Records without a usable time are skipped.
+def load_records(path):
+    records = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+
+            record = json.loads(line)
+            try:
+                at = record_time(record)
+            except Exception:
+                at = None
+
+            if at is not None:
+                record["at"] = at
+                records.append(record)
+
+    records.sort(key=lambda record: record["at"])
+    return records
+
+
+class Replay:
+
+    def __init__(self, config, annotator, clock, work_path, log_writer=None):
+        self.config = config
+        self.clock = clock
+        self.log_writer = log_writer
+
+        self.message_queue = queue.Queue()
+        self.result_queue = queue.Queue()
+        self.logger = Logger(self.message_queue, config.get("logging", {}).get("level", "informative"))
+        self.metrics = Metrics()
+
+        self.deduplicator = Deduplicator.from_config(config, self.logger, path=os.path.join(work_path, "articles.seen.log"), clock=clock.time)
+        self.headline_filter = HeadlineFilter.from_config(config)
+
+        # Articles are analyzed as they arrive, so the scheduler only drops
+        # the ones past max_age
+        self.scheduler = ArticleScheduler.from_config(config, clock=clock.time)
+        self.analysis = DataAnalysis(config, self.logger, None, self.result_queue, annotator=annotator)
+        self.web_interface = SimulatedWebInterface(clock=clock.time)
+        self.trader = Trader(self.result_queue, self.logger, config, web_interface=self.web_interface, clock=clock.now, positions=PositionStore(os.path.join(work_path, "positions.db")))
+
+        self.counts = {"records": 0, "articles": 0, "duplicates": 0, "filtered": 0, "expired": 0, "prices": 0, "results": 0}
+
+    # Replays the records and returns a report
+    def run(self, records):
+        start = time.time()
+        if records:
+            self.clock.current = records[0]["at"]
+
+        batch = []
+        batch_start = None
+        for record in records:
+            self.counts["records"] += 1
+
+            # Batch articles that arrive within max_batch_wait of each other,
+            # as DataAnalysis.next_batch would
+            if batch and ("article" not in record or len(batch) >= self.analysis.max_batch_size or record["at"] - batch_start > self.analysis.max_batch_wait):
+                self.analyze(batch)
+                batch = []
+
+            self.sell_positions_until(record["at"])
+            self.clock.advance_to(record["at"])
+
+            if "article" in record:
+                self.counts["articles"] += 1
+                article = record["article"]
+                if not self.deduplicator.add(article["title"], record.get("source", "replay")):
+                    self.counts["duplicates"] += 1
+                elif self.headline_filter is not None and not self.headline_filter.passes(article["title"]):
+                    self.counts["filtered"] += 1
+                else:
+                    # Nothing waits for analysis here, so an article is
+                    # dispatched as soon as it's pushed, unless it expired
+                    self.scheduler.push(article, record.get("source", "replay"))
+                    dispatched = self.scheduler.dispatch(lambda: 0)
+                    if dispatched and not batch:
+                        batch_start = record["at"]
+                    for queued in dispatched:
+                        mark(queued, "received")
+                        batch.append(queued)
+            elif "contract_id" in record:
+                self.counts["prices"] += 1
+                self.web_interface.set_price(record["contract_id"], record["yes_price"], record.get("no_price"))
+
+        if batch:
+            self.analyze(batch)
+        self.drain_messages()
+
+        return self.report(time.time() - start, records)
+
+    def analyze(self, batch):
+        self.analysis.handle_articles(batch)
+
+        while True:
+            try:
+                result = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            self.counts["results"] += 1
+            self.trader.handle_result(result)
+
+        self.drain_messages()
+
+    # Sells positions at the moment their hold time runs out, as the Trader's
+    # run loop would, up to simulated time `at`
+    def sell_positions_until(self, at):
+        while True:
+            expires_at = self.trader.positions.next_expiry()
+            if expires_at is None or expires_at > at:
+                break
+
+            self.clock.advance_to(expires_at)
+            self.trader.sell_positions()
+
+    # Routes logged records: metrics to the histograms, the rest to the log file
+    def drain_messages(self):
+        self.logger.flush()
+        while True:
+            try:
+                records = self.message_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            for record in records:
+                if record[TYPE] == "metric":
+                    self.metrics.record_timings(record[ARGS][0])
+                elif self.log_writer is not None:
+                    self.log_writer.write(record)
+
+    def report(self, wall_seconds, records):
+        self.counts["expired"] = self.scheduler.expired
+        report = dict(self.counts)
+        report.update({
+            "simulated_seconds": records[-1]["at"] - records[0]["at"] if records else 0,
+            "wall_seconds": wall_seconds,
+            "articles_per_second": self.counts["articles"] / wall_seconds if wall_seconds > 0 else None,
+            "fills": len(self.web_interface.fills),
+            "rejected_orders": self.web_interface.rejected,
+            "open_positions": len(self.web_interface.positions),
+            "realized_pnl": self.web_interface.realized_pnl,
+            "unrealized_pnl": self.web_interface.unrealized_pnl(),
+            "annotation_cache": {"hits": self.analysis.annotator.hits, "misses": self.analysis.annotator.misses},
+            "latency": self.metrics.snapshot()["stages"]
+        })
+        return report
+
+
+# "fake" annotates locally; "cache" uses Google Cloud behind the on-disk
+# annotation cache, so only headlines not seen before cost an API call
+def create_annotator(kind, config):
+    if kind == "fake":
+        return CachedAnnotator(FakeAnnotator.from_markets(config["markets"]))
+
+    from data_analysis.google_annotator import GoogleCloudAnnotator
+    return CachedAnnotator(GoogleCloudAnnotator(), AnnotationCache.from_config(config))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded article stream through the pipeline.")
+    parser.add_argument("recording", help="JSON lines file of articles and prices")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--annotator", choices=["fake", "cache"], default="cache")
+    parser.add_argument("--speed", type=float, help="pace the replay at this multiple of real time (default: as fast as possible)")
+    parser.add_argument("--log", help="write the pipeline's log records to this file")
+    parser.add_argument("--output", help="write the report to this file as JSON")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    records = load_records(args.recording)
+
+    log_writer = None
+    if args.log:
+        from logger import LogWriter
+        log_writer = LogWriter(args.log)
+
+    with tempfile.TemporaryDirectory() as work_path:
+        replay = Replay(config, create_annotator(args.annotator, config), SimulatedClock(speed=args.speed), work_path, log_writer)
+        report = replay.run(records)
+
+    if log_writer is not None:
+        log_writer.close()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+from contextlib import contextmanager
+from multiprocessing import Lock, RawArray, RawValue
+import os
+import queue
+import struct
+import time
+
+from bounded_queue import POLICIES
+
+FRAME_LENGTH = struct.Struct("<I")
+
+# Indices into the shared state array
+HEAD = 0        # bytes ever written; positions are these mod capacity
+TAIL = 1        # bytes ever read
+FRAMES = 2      # frames queued
+EPOCH = 3       # lock recoveries so far
+RECOUNT = 4     # 1 if FRAMES may be wrong after a recovery
+HOLDER = 5      # pid of the process holding the lock, or 0
+ACQUIRES = 6    # times the lock has been taken
+STATE_SIZE = 7
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Byte-frame queue in shared memory, for any number of producer and consumer
+# processes. Frames are written into a fixed ring with a length prefix, so a
+# put or get is one copy and no pickling. Same interface and overflow
+# policies as BoundedQueue (see bounded_queue.py); maxsize bounds the number
+# of frames, capacity the bytes.
+#
+# The supervisor kills hung workers, so a process can die at any point,
+# including while it holds the lock. Holders record their pid, and a process
+# that has waited LOCK_TIMEOUT seconds without the lock changing hands checks
+# it: if the holder has exited (the supervisor reaps dead workers), the lock
+# is released on its behalf (once per epoch, under recovery_lock) and the
+# frame count is rebuilt from the length prefixes. A live holder, however
+# slow, is waited for. HEAD only moves after a frame is fully written, so a
+# producer that dies mid-write leaves nothing behind. Nothing waits on a
+# multiprocessing.Condition, whose notify() blocks forever on a waiter that
+# was killed; full and empty rings are polled instead, backing off from
+# MIN_WAIT to MAX_WAIT seconds.
+class RingBuffer:
+
+    LOCK_TIMEOUT = 5
+    MIN_WAIT = 0.0001
+    MAX_WAIT = 0.005
+
+    def __init__(self, capacity=4 * 1024 * 1024, maxsize=0, policy="block"):
+        if policy not in POLICIES:
+            raise ValueError("Unknown queue policy: " + str(policy))
+
+        self.capacity = capacity
+        self.maxsize = maxsize
+        self.policy = policy
+        self.buffer = RawArray("B", capacity)
+
+        self.state = RawArray("q", STATE_SIZE)
+        self.lock = Lock()
+        self.recovery_lock = Lock()
+
+        # Only changed with the lock held
+        self.dropped = RawValue("i", 0)
+        self.view = None
+
+    # Each process maps its own view of the shared buffer
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["view"] = None
+        return state
+
+    def get_view(self):
+        if self.view is None:
+            self.view = memoryview(self.buffer).cast("B")
+        return self.view
+
+    @contextmanager
+    def locked(self):
+        self.acquire()
+        try:
+            if self.state[RECOUNT]:
+                self.recount()
+            yield
+        finally:
+            self.release()
+
+    def acquire(self):
+        while True:
+            epoch = self.state[EPOCH]
+            acquires = self.state[ACQUIRES]
+            if self.lock.acquire(timeout=self.LOCK_TIMEOUT):
+                self.state[HOLDER] = os.getpid()
+                self.state[ACQUIRES] += 1
+                return
+
+            # Other processes are getting the lock, or its holder is alive
+            holder = self.state[HOLDER]
+            if self.state[ACQUIRES] != acquires or (holder and process_alive(holder)):
+                continue
+
+            # Its holder died, or died with no pid recorded, right after
+            # taking the lock or right before releasing it. Unless another
+            # process already recovered it this epoch, release it for them
+            # and try again.
+            with self.recovery_lock:
+                if self.state[EPOCH] == epoch and self.state[HOLDER] == holder:
+                    self.state[EPOCH] = epoch + 1
+                    self.state[RECOUNT] = 1
+                    self.state[HOLDER] = 0
+                    self.lock.release()
+
+    def release(self):
+        self.state[HOLDER] = 0
+        self.lock.release()
+
+    # Rebuilds FRAMES by walking the frames between TAIL and HEAD; a consumer
+    # that died mid-pop may have moved TAIL without updating it
+    def recount(self):
+        position = self.state[TAIL]
+        frames = 0
+        while position < self.state[HEAD]:
+            length, = FRAME_LENGTH.unpack(self.read(position, FRAME_LENGTH.size))
+            position += FRAME_LENGTH.size + length
+            frames += 1
+
+        self.state[FRAMES] = frames
+        self.state[RECOUNT] = 0
+
+    def write(self, position, data):
+        view = self.get_view()
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        view[start:start + first] = data[:first]
+        view[:len(data) - first] = data[first:]
+
+    def read(self, position, length):
+        view = self.get_view()
+        start = position % self.capacity
+        first = min(length, self.capacity - start)
+        return bytes(view[start:start + first]) + bytes(view[:length - first])
+
+    def has_room(self, size):
+        return self.state[HEAD] - self.state[TAIL] + size <= self.capacity and (self.maxsize <= 0 or self.state[FRAMES] < self.maxsize)
+
+    # Returns True if the frame was queued, False if it was shed
+    def put(self, data):
+        size = FRAME_LENGTH.size + len(data)
+        if size > self.capacity:
+            raise ValueError("Frame of %d bytes doesn't fit in a %d byte ring" % (len(data), self.capacity))
+
+        wait = self.MIN_WAIT
+        while True:
+            with self.locked():
+                if self.policy == "drop_oldest":
+                    while not self.has_room(size):
+                        self.pop()
+                        self.dropped.value += 1
+
+                if self.has_room(size):
+                    self.push(data, size)
+                    return True
+
+                if self.policy == "shed":
+                    self.dropped.value += 1
+                    return False
+
+            time.sleep(wait)
+            wait = min(wait * 2, self.MAX_WAIT)
+
+    # Appends a frame; call with the lock held and room for it
+    def push(self, data, size):
+        head = self.state[HEAD]
+        self.write(head, FRAME_LENGTH.pack(len(data)))
+        self.write(head + FRAME_LENGTH.size, data)
+        self.state[HEAD] = head + size
+        self.state[FRAMES] += 1
+
+    # Removes and returns the oldest frame; call with the lock held
+    def pop(self):
+        tail = self.state[TAIL]
+        length, = FRAME_LENGTH.unpack(self.read(tail, FRAME_LENGTH.size))
+        data = self.read(tail + FRAME_LENGTH.size, length)
+        self.state[TAIL] = tail + FRAME_LENGTH.size + length
+        self.state[FRAMES] -= 1
+        return data
+
+    def get(self, block=True, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wait = self.MIN_WAIT
+        while True:
+            if self.state[HEAD] != self.state[TAIL]:
+                with self.locked():
+                    if self.state[HEAD] != self.state[TAIL]:
+                        return self.pop()
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if not block or (remaining is not None and remaining <= 0):
+                raise queue.Empty
+
+            time.sleep(wait if remaining is None else min(wait, remaining))
+            wait = min(wait * 2, self.MAX_WAIT)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self):
+        return self.state[FRAMES]
+
+    def empty(self):
+        return self.state[HEAD] == self.state[TAIL]
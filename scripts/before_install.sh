@@ -5,5 +5,13 @@ sudo rm -rf /home/ubuntu/gui
 sudo rm -rf /home/ubuntu/scripts
 sudo rm -rf /home/ubuntu/requirements.txt
 sudo rm -rf /home/ubuntu/logger.py
+sudo rm -rf /home/ubuntu/metrics.py
+sudo rm -rf /home/ubuntu/service.py
+sudo rm -rf /home/ubuntu/supervisor.py
+sudo rm -rf /home/ubuntu/bounded_queue.py
+sudo rm -rf /home/ubuntu/startup.py
+sudo rm -rf /home/ubuntu/messages.py
+sudo rm -rf /home/ubuntu/ring_buffer.py
+sudo rm -rf /home/ubuntu/transport.py
 sudo rm -rf /home/ubuntu/main.py
 sudo rm -rf /home/ubuntu/env.sh
@@ -5,23 +5,20 @@ import boto3
 import json
 from sh import tail
 
-# Open most recently edited log file, and get last 500 lines
-newest_file = open(max(glob.iglob("logs/*.txt"), key=os.path.getctime))
+# Open most recently edited log file, and get last 5000 lines
+newest_file = open(max(glob.iglob("logs/*.jsonl"), key=os.path.getctime))
 newest_file_lines = tail("-5000", newest_file.name, _iter=True)
 
 # Go through file and get last time for each log source
 log_sources = {}
 for line in newest_file_lines:
-    split = line.split("[")
+    try:
+        record = json.loads(line)
+    except ValueError:
+        # Partially written last line
+        continue
 
-    # Extract relevant info from logline, and remove brackets
-    log_time = split[1].replace("]", "").replace(" ", "")
-    log_source = split[2].replace("]", "").replace(" ", "")
-
-    # Parse time
-    log_time_parsed = arrow.get(log_time)
-
-    log_sources[log_source] = log_time_parsed
+    log_sources[record["source"]] = arrow.get(record["time"])
 
 # Compile message with data
 messages = []
@@ -2,7 +2,6 @@
 sudo apt-get -f --assume-yes install
 sudo apt-get --assume-yes install python3-tk
 sudo apt-get --assume-yes install python3-pip
-sudo apt-get --assume-yes install xvfb
 pip3 install -r /home/ubuntu/requirements.txt
 
 # Make necessary folders
@@ -14,12 +13,15 @@ sudo apt-get install libxss1 libappindicator1 libindicator7
 wget https://dl.google.com/linux/direct/google-chrome-stable_current_amd64.deb
 sudo dpkg -i google-chrome*.deb
 sudo apt-get install -f
-sudo apt-get install xvfb
 sudo apt-get install unzip
-wget -N http://chromedriver.storage.googleapis.com/2.26/chromedriver_linux64.zip
-unzip chromedriver_linux64.zip
-chmod +x chromedriver
-sudo mv -f chromedriver /usr/local/share/chromedriver
+# Chromedriver matching the installed Chrome; the trader runs Chrome with
+# --headless, which needs Chrome 59 and chromedriver 2.29 or later
+CHROME_MAJOR=$(google-chrome --version | grep -oE '[0-9]+' | head -1)
+CHROMEDRIVER_VERSION=$(wget -qO- https://googlechromelabs.github.io/chrome-for-testing/LATEST_RELEASE_$CHROME_MAJOR)
+wget -N https://storage.googleapis.com/chrome-for-testing-public/$CHROMEDRIVER_VERSION/linux64/chromedriver-linux64.zip
+unzip -o chromedriver-linux64.zip
+chmod +x chromedriver-linux64/chromedriver
+sudo mv -f chromedriver-linux64/chromedriver /usr/local/share/chromedriver
 sudo ln -s /usr/local/share/chromedriver /usr/local/bin/chromedriver
 sudo ln -s /usr/local/share/chromedriver /usr/bin/chromedriver
 
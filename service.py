@@ -0,0 +1,405 @@
+# Headless bot service.
+# Owns the pipeline processes, the periodic jobs and the log/metrics draining,
+# driven by a small scheduler loop instead of Tk callbacks. GUIs (see
+# gui/client.py) are optional clients that attach over a local socket.
+from multiprocessing import Queue, Value, AuthenticationError
+from multiprocessing.connection import Listener
+import collections
+import heapq
+import itertools
+import os
+import queue
+import secrets
+import signal
+import threading
+import time
+import uuid
+
+from logger import Logger, LogWriter, format_record, SOURCE, TYPE, MESSAGE, ARGS
+from messages import ArticleCodec, ResultCodec
+from metrics import Metrics
+from startup import StageLauncher, StartupReport
+from supervisor import Supervisor, RestartPolicy, Autoscaler
+from transport import MessageQueue
+
+DEFAULT_ADDRESS = "127.0.0.1:6001"
+PLACEHOLDER_AUTHKEY = "CHANGE_ME"
+DEFAULT_AUTHKEY_PATH = "db/service.key"
+
+
+# "host:port" -> (host, port)
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return (host, int(port))
+
+
+def client_address(config):
+    return parse_address(config.get("service", {}).get("address", DEFAULT_ADDRESS))
+
+
+# service.authkey, or None if it's missing or still the sample's placeholder
+def configured_authkey(config):
+    authkey = config.get("service", {}).get("authkey")
+    if not authkey or authkey == PLACEHOLDER_AUTHKEY:
+        return None
+    return authkey.encode("utf-8")
+
+
+def authkey_path(config):
+    return config.get("service", {}).get("authkey_path", DEFAULT_AUTHKEY_PATH)
+
+
+# Key the service listens with: service.authkey if one is set, otherwise a
+# random key for this session, written to service.authkey_path (readable
+# only by this user) for clients to pick up
+def create_authkey(config):
+    authkey = configured_authkey(config)
+    if authkey is not None:
+        return authkey
+
+    authkey = secrets.token_hex(32)
+    path = authkey_path(config)
+    temp_path = path + ".tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        os.unlink(temp_path)
+    except FileNotFoundError:
+        pass
+
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(authkey)
+    os.replace(temp_path, path)
+    return authkey.encode("utf-8")
+
+
+# Address and key for a client attaching to a running service
+def client_settings(config):
+    authkey = configured_authkey(config)
+    if authkey is None:
+        with open(authkey_path(config), "r") as f:
+            authkey = f.read().strip().encode("utf-8")
+
+    return client_address(config), authkey
+
+
+# Runs jobs at fixed intervals. Jobs run on the caller's thread, from run_pending.
+class Scheduler:
+
+    def __init__(self):
+        self.jobs = []
+        self.counter = itertools.count()
+
+    # Runs job every `interval` seconds, the first time after `delay` (default: interval)
+    def every(self, interval, job, delay=None):
+        due = time.monotonic() + (interval if delay is None else delay)
+        heapq.heappush(self.jobs, (due, next(self.counter), interval, job))
+
+    # Runs every job that's due; returns the seconds until the next one
+    def run_pending(self):
+        now = time.monotonic()
+        while self.jobs and self.jobs[0][0] <= now:
+            due, _, interval, job = heapq.heappop(self.jobs)
+            job()
+
+            # Don't try to catch up on runs missed while a job was slow
+            heapq.heappush(self.jobs, (max(due + interval, now), next(self.counter), interval, job))
+
+        return max(0, self.jobs[0][0] - time.monotonic()) if self.jobs else None
+
+
+# Accepts GUI clients on a local socket and streams them log lines and metrics.
+# Each client gets a bounded outbox and its own sender thread, so a slow or
+# stalled client never holds up the service; its oldest messages are dropped.
+class ClientServer:
+
+    OUTBOX_SIZE = 1000
+
+    # Log lines replayed to a client when it attaches
+    BACKLOG_LINES = 1000
+
+    def __init__(self, address, authkey, on_command):
+        self.listener = Listener(address, authkey=authkey)
+        self.on_command = on_command
+        self.clients = {}
+        self.backlog = collections.deque(maxlen=self.BACKLOG_LINES)
+        self.lock = threading.Lock()
+
+        threading.Thread(target=self.accept_clients, daemon=True).start()
+
+    def accept_clients(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                # Listener closed
+                break
+
+            outbox = queue.Queue(self.OUTBOX_SIZE)
+            with self.lock:
+                self.clients[connection] = outbox
+                if self.backlog:
+                    outbox.put(("lines", list(self.backlog)))
+
+            threading.Thread(target=self.send_to_client, args=(connection, outbox), daemon=True).start()
+            threading.Thread(target=self.receive_from_client, args=(connection,), daemon=True).start()
+
+    def send_to_client(self, connection, outbox):
+        try:
+            while True:
+                message = outbox.get()
+                if message is None:
+                    break
+                connection.send(message)
+        except (OSError, EOFError):
+            pass
+
+        self.remove(connection)
+
+    def receive_from_client(self, connection):
+        try:
+            while True:
+                self.on_command(connection.recv())
+        except (OSError, EOFError):
+            pass
+
+        self.remove(connection)
+
+    def remove(self, connection):
+        with self.lock:
+            outbox = self.clients.pop(connection, None)
+        if outbox is not None:
+            self.put(outbox, None)
+            connection.close()
+
+    def put(self, outbox, message):
+        while True:
+            try:
+                outbox.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    outbox.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def send(self, message):
+        with self.lock:
+            if message[0] == "lines":
+                self.backlog.extend(message[1])
+            for outbox in self.clients.values():
+                self.put(outbox, message)
+
+    def close(self):
+        self.listener.close()
+        with self.lock:
+            connections = list(self.clients)
+        for connection in connections:
+            self.remove(connection)
+
+
+class Service:
+
+    # Most log records drained from the queue per loop
+    MESSAGE_BATCH_SIZE = 500
+
+    # Longest the loop blocks waiting for log records (seconds)
+    POLL_INTERVAL = 0.1
+
+    # Periodic jobs (seconds)
+    CHECK_INTERVAL = 0.5
+    METRICS_INTERVAL = 5
+
+    # Default restart policy settings per stage (see supervisor.RestartPolicy)
+    STAGE_POLICIES = {
+        "data_input": {},
+        "data_analysis": {},
+        "trader": {"heartbeat_timeout": 120}  # Orders go through a browser
+    }
+
+    def __init__(self, config):
+        # Assign random session ID for logs, etc
+        self.session_id = str(uuid.uuid4())
+        self.config = config
+        self.running = False
+
+        # Only needed if the browser can't run headless
+        self.display = None
+        if config["trader"].get("virtual_display", False):
+            from pyvirtualdisplay import Display
+            self.display = Display(visible=0, size=(800, 800))
+            self.display.start()
+
+        # Queues to be delegated to sub-processes
+        self.message_queue = Queue()
+        self.article_queue = MessageQueue.from_config(config, "article_queue", ArticleCodec())
+        self.result_queue = MessageQueue.from_config(config, "result_queue", ResultCodec(config["markets"]))
+
+        # Articles Data Input is holding back until the queue has room
+        self.article_backlog = Value("i", 0)
+
+        self.log_writer = LogWriter("logs/" + self.session_id + ".jsonl")
+        self.logger = Logger(self.message_queue, config.get("logging", {}).get("level", "informative"))
+        self.metrics = Metrics()
+        self.startup = StartupReport()
+
+        # Stages are imported and built in their own processes, so this one
+        # never loads sklearn, nltk, selenium or the Cloud client
+        self.scraper = StageLauncher("Data Input", "data_input.data_input", "DataInput", self.logger, self.article_queue, self.logger, self.config, self.article_backlog)
+        self.analysis = StageLauncher("Data Analysis", "data_analysis.data_analysis", "DataAnalysis", self.logger, self.config, self.logger, self.article_queue, self.result_queue)
+        self.trader = StageLauncher("Trader", "trader.trader", "Trader", self.logger, self.result_queue, self.logger, self.config)
+
+        self.policies = {stage: RestartPolicy.from_config(config, stage, **defaults) for stage, defaults in self.STAGE_POLICIES.items()}
+        self.supervisor = Supervisor(self.logger)
+        self.supervisor.add("data_input", "Data Input", self.scraper, self.policies["data_input"])
+        for num in range(config["data_analysis"]["num_workers"]):
+            self.supervisor.add("data_analysis", "Data Analysis", self.analysis, self.policies["data_analysis"])
+        self.supervisor.add("trader", "Trader", self.trader, self.policies["trader"])
+        self.autoscaler = Autoscaler.from_config(config)
+
+        self.scheduler = Scheduler()
+        self.scheduler.every(self.CHECK_INTERVAL, self.supervise)
+        self.scheduler.every(self.METRICS_INTERVAL, self.update_metrics)
+
+        self.clients = None
+        if config.get("service", {}).get("listen", True):
+            address = client_address(config)
+            try:
+                self.clients = ClientServer(address, create_authkey(config), self.handle_command)
+            except OSError as e:
+                self.logger.log("Main", "error", "Not accepting GUI clients, can't listen on %s:%d: %s", address[0], address[1], str(e))
+
+    # Starts the processes
+    def start(self):
+        self.running = True
+        self.logger.log("Main", "informative", "Starting bot...")
+
+        self.supervisor.start()
+
+        # After forking, so the children keep the default handlers
+        if threading.current_thread() is threading.main_thread():
+            self.install_signal_handlers()
+
+    # Runs the scheduler loop until stop() is called
+    def run(self):
+        if not self.running:
+            self.start()
+
+        try:
+            while self.running:
+                next_job = self.scheduler.run_pending()
+                self.poll_messages(self.POLL_INTERVAL if next_job is None else min(next_job, self.POLL_INTERVAL))
+        finally:
+            self.shutdown()
+
+    # Asks the loop to exit; safe to call from signal handlers and other threads
+    def stop(self):
+        self.running = False
+
+    def install_signal_handlers(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: self.stop())
+
+    def handle_command(self, command):
+        if command == ("stop",):
+            self.logger.log("Main", "informative", "Stop requested by a client")
+            self.stop()
+
+    # Waits up to `timeout` for log records, then drains whatever else is
+    # waiting (up to a batch of records)
+    def poll_messages(self, timeout):
+        self.logger.flush()
+
+        records = []
+        try:
+            records.extend(self.message_queue.get(True, timeout))
+            while len(records) < self.MESSAGE_BATCH_SIZE:
+                records.extend(self.message_queue.get_nowait())
+        except queue.Empty:
+            pass
+        except Exception as e:
+            self.logger.log("Main", "error", "Error polling messages: %s", str(e))
+
+        # Metric records feed the latency histograms, gauges and startup
+        # report rather than the log
+        metrics = [record for record in records if record[TYPE] == "metric"]
+        records = [record for record in records if record[TYPE] != "metric"]
+        for record in metrics:
+            if record[MESSAGE] == "startup":
+                self.record_startup(record[SOURCE], record[ARGS][0])
+            elif record[MESSAGE] == "counters":
+                for name, value in record[ARGS][0].items():
+                    self.metrics.set_gauge(name, value)
+            else:
+                self.metrics.record_timings(record[ARGS][0])
+
+        if records:
+            lines = [format_record(record) for record in records]
+            print("\n".join(lines))
+            for record in records:
+                self.log_writer.write(record)
+            if self.clients is not None:
+                self.clients.send(("lines", lines))
+
+    # timings: seconds spent importing, building and warming up a process
+    def record_startup(self, source, timings):
+        self.startup.record(source, timings)
+        try:
+            self.startup.write("logs/" + self.session_id + ".startup.json")
+        except Exception as e:
+            self.logger.log("Main", "error", "Error writing startup report: %s", str(e))
+
+    # Restarts dead or hung workers and sizes the analysis stage to the backlog
+    def supervise(self):
+        self.supervisor.check()
+
+        try:
+            depth = self.article_queue.qsize() + self.article_backlog.value
+        except NotImplementedError:
+            # qsize() isn't available on macOS
+            return
+
+        workers = len(self.supervisor.stage_workers("data_analysis"))
+        desired = self.autoscaler.desired(workers, depth)
+        if desired != workers:
+            self.supervisor.scale("data_analysis", desired, "Data Analysis", self.analysis, self.policies["data_analysis"])
+
+    # Samples queue depths, writes a metrics snapshot next to the log and
+    # sends it to any attached clients
+    def update_metrics(self):
+        for name, q in (("article_queue_depth", self.article_queue), ("result_queue_depth", self.result_queue)):
+            try:
+                self.metrics.set_gauge(name, q.qsize())
+            except NotImplementedError:
+                # qsize() isn't available on macOS
+                pass
+
+        self.metrics.set_gauge("article_queue_dropped", self.article_queue.dropped.value)
+        self.metrics.set_gauge("result_queue_dropped", self.result_queue.dropped.value)
+        self.metrics.set_gauge("analysis_workers", len(self.supervisor.stage_workers("data_analysis")))
+        self.metrics.set_gauge("restarts", self.supervisor.restarts())
+
+        try:
+            self.metrics.write("logs/" + self.session_id + ".metrics.json")
+        except Exception as e:
+            self.logger.log("Main", "error", "Error writing metrics: %s", str(e))
+
+        if self.clients is not None:
+            self.clients.send(("metrics", self.metrics.snapshot()))
+
+    # Stops the processes and flushes the logs
+    def shutdown(self):
+        self.running = False
+        self.logger.log("Main", "informative", "Shutting down...")
+
+        # The trader closes its browser as it exits
+        self.supervisor.stop()
+
+        self.poll_messages(0)
+        if self.clients is not None:
+            self.clients.close()
+        self.log_writer.close()
+        if self.display is not None:
+            self.display.stop()
@@ -0,0 +1,84 @@
+# Startup cost of each pipeline process.
+# Stages are imported and built inside their own worker process (see
+# StageLauncher), so a process only loads the libraries its stage needs:
+# Data Input never loads sklearn or nltk, Data Analysis never loads selenium.
+# Each worker reports how long its imports, constructor and warm-up took as a
+# "startup" metric, which the service collects into a StartupReport.
+import importlib
+import json
+import os
+import time
+
+
+# Supervisor target that imports, builds, warms up and runs one stage in the
+# worker process. `args` are passed to the stage's constructor.
+class StageLauncher:
+
+    def __init__(self, source, module, class_name, logger, *args):
+        self.source = source
+        self.module = module
+        self.class_name = class_name
+        self.logger = logger
+        self.args = args
+
+    def __call__(self, heartbeat=None, stopping=None):
+        started = time.perf_counter()
+        stage_class = getattr(importlib.import_module(self.module), self.class_name)
+        imported = time.perf_counter()
+
+        try:
+            stage = stage_class(*self.args)
+            built = time.perf_counter()
+            if hasattr(stage, "warm_up"):
+                stage.warm_up()
+        except Exception as e:
+            self.logger.log(self.source, "error", "Failed to start: %s", str(e))
+            self.logger.flush()
+            raise
+        ready = time.perf_counter()
+
+        timings = {
+            "pid": os.getpid(),
+            "import": imported - started,
+            "init": built - imported,
+            "warm_up": ready - built
+        }
+        self.logger.log(self.source, "informative", "Started in %.2fs (import %.2fs, init %.2fs, warm-up %.2fs)", ready - started, timings["import"], timings["init"], timings["warm_up"])
+        self.logger.metric(self.source, "startup", timings)
+        self.logger.flush()
+
+        # Ends the supervisor's startup grace period (see RestartPolicy)
+        if heartbeat is not None:
+            heartbeat.beat()
+
+        stage.run(heartbeat=heartbeat, stopping=stopping)
+
+
+# Every process start seen this session, grouped by source, with the latest
+# and slowest start of each
+class StartupReport:
+
+    def __init__(self):
+        self.starts = {}
+
+    # timings: seconds per phase ("import", "init", "warm_up"), plus the pid
+    def record(self, source, timings):
+        self.starts.setdefault(source, []).append(dict(timings, at=time.time()))
+
+    def snapshot(self):
+        report = {}
+        for source, starts in self.starts.items():
+            totals = [sum(value for name, value in start.items() if name not in ("pid", "at")) for start in starts]
+            report[source] = {
+                "starts": len(starts),
+                "latest": starts[-1],
+                "slowest_seconds": max(totals),
+                "mean_seconds": sum(totals) / len(totals)
+            }
+        return report
+
+    def write(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temp_path, path)
@@ -0,0 +1,231 @@
+# Process supervision for the pipeline stages.
+# Each worker process beats a heartbeat in shared memory from its run loop;
+# the supervisor restarts workers that exit or stop beating, backing off
+# exponentially per stage, and can grow or shrink a stage's worker count.
+from multiprocessing import Process, Event, Value
+import os
+import signal
+import time
+
+# How often (seconds) run loops beat while they're idle
+HEARTBEAT_INTERVAL = 1.0
+
+
+# Timestamp of a worker's last sign of life, in shared memory
+class Heartbeat:
+
+    def __init__(self):
+        self.value = Value("d", time.time(), lock=False)
+
+    def beat(self):
+        self.value.value = time.time()
+
+    def age(self):
+        return time.time() - self.value.value
+
+
+class RestartPolicy:
+
+    # Defaults per stage; override with config["supervisor"][stage]
+    DEFAULTS = {
+        "initial_backoff": 1,
+        "max_backoff": 60,
+        "reset_after": 300,
+        "heartbeat_timeout": 60,
+        "startup_timeout": 300
+    }
+
+    # startup_timeout replaces heartbeat_timeout until a new worker's first
+    # heartbeat, while it imports, builds and warms up its stage
+    def __init__(self, initial_backoff=1, max_backoff=60, reset_after=300, heartbeat_timeout=60, startup_timeout=300):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.reset_after = reset_after
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_timeout = startup_timeout
+
+    @classmethod
+    def from_config(cls, config, stage, **defaults):
+        settings = dict(cls.DEFAULTS)
+        settings.update(defaults)
+        settings.update(config.get("supervisor", {}).get(stage, {}))
+        return cls(**settings)
+
+    # Delay before the next restart, after `restarts` restarts in a row
+    def backoff(self, restarts):
+        return min(self.max_backoff, self.initial_backoff * (2 ** restarts))
+
+
+# One supervised process. target is called in the child as
+# target(heartbeat=..., stopping=...), and should return once stopping is set.
+class Worker:
+
+    def __init__(self, stage, name, target, policy):
+        self.stage = stage
+        self.name = name
+        self.target = target
+        self.policy = policy
+        self.heartbeat = Heartbeat()
+        self.stopping = Event()
+        self.process = None
+        self.restarts = 0
+        self.started_at = None
+        self.restart_at = None
+        self.retiring = False
+
+    def start(self):
+        self.heartbeat.beat()
+        self.started_at = time.time()
+        self.stopping.clear()
+        self.process = Process(target=self.target, kwargs={"heartbeat": self.heartbeat, "stopping": self.stopping}, name=self.name)
+        self.process.start()
+        self.restart_at = None
+
+    # A worker that hasn't beaten since it was started is still starting up
+    def heartbeat_timeout(self):
+        if self.heartbeat.value.value <= self.started_at:
+            return self.policy.startup_timeout
+        return self.policy.heartbeat_timeout
+
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(5)
+            if self.process.is_alive():
+                # Process.kill() is Python 3.7+
+                os.kill(self.process.pid, signal.SIGKILL)
+                self.process.join()
+
+
+class Supervisor:
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.workers = []
+        self.counter = 0
+
+    def add(self, stage, name, target, policy):
+        self.counter += 1
+        worker = Worker(stage, name + " #" + str(self.counter), target, policy)
+        self.workers.append(worker)
+        return worker
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def stage_workers(self, stage):
+        return [worker for worker in self.workers if worker.stage == stage and not worker.retiring]
+
+    # Restarts workers that have exited or stopped beating, once their
+    # backoff has passed, and forgets retired workers that have exited
+    def check(self):
+        now = time.time()
+        for worker in list(self.workers):
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    self.logger.log("Supervisor", "informative", "Restarting %s (restart %d)", worker.name, worker.restarts)
+                    worker.start()
+                continue
+
+            alive = worker.process.is_alive()
+            if worker.retiring:
+                if not alive:
+                    self.logger.log("Supervisor", "informative", "%s retired", worker.name)
+                    self.workers.remove(worker)
+                continue
+
+            if alive and worker.heartbeat.age() <= worker.heartbeat_timeout():
+                # Healthy for long enough that earlier crashes are forgiven
+                if worker.restarts and now - worker.started_at > worker.policy.reset_after:
+                    worker.restarts = 0
+                continue
+
+            if alive:
+                self.logger.log("Supervisor", "error", "%s hasn't reported in %.0fs; killing it", worker.name, worker.heartbeat.age())
+                worker.kill()
+            else:
+                self.logger.log("Supervisor", "error", "%s exited with code %s", worker.name, worker.process.exitcode)
+
+            delay = worker.policy.backoff(worker.restarts)
+            worker.restarts += 1
+            worker.restart_at = now + delay
+            self.logger.log("Supervisor", "informative", "Restarting %s in %.1fs", worker.name, delay)
+
+    # Adds workers, or asks the newest ones to finish their current work and
+    # exit, until the stage has `count` workers
+    def scale(self, stage, count, name, target, policy):
+        workers = self.stage_workers(stage)
+        while len(workers) < count:
+            worker = self.add(stage, name, target, policy)
+            worker.start()
+            workers.append(worker)
+            self.logger.log("Supervisor", "informative", "Scaled %s up to %d workers", stage, len(workers))
+
+        while len(workers) > count:
+            worker = workers.pop()
+            worker.retiring = True
+            worker.stopping.set()
+            self.logger.log("Supervisor", "informative", "Scaled %s down to %d workers", stage, len(workers))
+
+    def restarts(self):
+        return sum(worker.restarts for worker in self.workers)
+
+    # Asks every worker to exit, giving them up to `grace` seconds to finish
+    # their current work (and e.g. close the browser) before killing them
+    def stop(self, grace=HEARTBEAT_INTERVAL * 3):
+        for worker in self.workers:
+            worker.stopping.set()
+        deadline = time.time() + grace
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(max(0, deadline - time.time()))
+            worker.kill()
+
+
+# Picks the analysis worker count from the article queue depth: one more
+# worker once the queue has held more than scale_up_depth articles per worker
+# for scale_up_after seconds, one fewer once it has been empty for
+# scale_down_after seconds.
+class Autoscaler:
+
+    def __init__(self, min_workers, max_workers, scale_up_depth=20, scale_up_after=5, scale_down_after=120):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.scale_up_depth = scale_up_depth
+        self.scale_up_after = scale_up_after
+        self.scale_down_after = scale_down_after
+        self.backlogged_since = None
+        self.idle_since = None
+
+    @classmethod
+    def from_config(cls, config):
+        analysis_config = config["data_analysis"]
+        num_workers = analysis_config["num_workers"]
+        return cls(
+            analysis_config.get("min_workers", num_workers),
+            analysis_config.get("max_workers", num_workers),
+            scale_up_depth=analysis_config.get("scale_up_depth", 20),
+            scale_down_after=analysis_config.get("scale_down_after", 120)
+        )
+
+    def desired(self, workers, depth, now=None):
+        now = time.time() if now is None else now
+
+        if depth > self.scale_up_depth * workers and workers < self.max_workers:
+            self.backlogged_since = self.backlogged_since or now
+            if now - self.backlogged_since >= self.scale_up_after:
+                self.backlogged_since = None
+                return workers + 1
+        else:
+            self.backlogged_since = None
+
+        if depth == 0 and workers > self.min_workers:
+            self.idle_since = self.idle_since or now
+            if now - self.idle_since >= self.scale_down_after:
+                self.idle_since = None
+                return workers - 1
+        else:
+            self.idle_since = None
+
+        return max(self.min_workers, min(self.max_workers, workers))
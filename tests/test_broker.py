@@ -0,0 +1,150 @@
+import time
+import unittest
+
+from trader.broker import Broker, SessionPool
+from trader.mock_broker import MockBroker
+
+
+# MockBroker whose sessions can be made to fail
+class FlakyBroker(MockBroker):
+
+    def __init__(self, **kwargs):
+        MockBroker.__init__(self, **kwargs)
+        self.fail_logins = False
+
+    def create_session(self):
+        if self.fail_logins:
+            raise RuntimeError("Login failed")
+        return MockBroker.create_session(self)
+
+
+class BrokerTest(unittest.TestCase):
+
+    def test_buy_and_sell(self):
+        backend = MockBroker()
+        broker = Broker(backend, sessions=2, position_cache_seconds=0)
+
+        self.assertTrue(broker.buy("4446", Broker.YES, 1, 60))
+        self.assertTrue(broker.have_position_in_market("4446"))
+        broker.sell("4446", Broker.YES, 1)
+        self.assertFalse(broker.have_position_in_market("4446"))
+        broker.quit()
+
+    def test_logs_in_sessions_up_front_in_parallel(self):
+        backend = MockBroker(login_latency=0.2)
+
+        start = time.monotonic()
+        broker = Broker(backend, sessions=4)
+
+        self.assertEqual(backend.sessions_created, 4)
+        self.assertLess(time.monotonic() - start, 0.6)
+        broker.quit()
+
+    def test_orders_run_concurrently(self):
+        backend = MockBroker(latency=0.1)
+        broker = Broker(backend, sessions=4)
+
+        start = time.monotonic()
+        outcomes = broker.buy_many([(str(i), Broker.YES, 1, 60) for i in range(4)])
+
+        self.assertEqual(outcomes, [True] * 4)
+        self.assertLess(time.monotonic() - start, 0.35)
+        broker.quit()
+
+    def test_outcome_per_order(self):
+        backend = MockBroker()
+        backend.account.set_price("expensive", 0.9)
+        broker = Broker(backend, sessions=2)
+
+        outcomes = broker.buy_many([("cheap", Broker.YES, 1, 60), ("expensive", Broker.YES, 1, 60)])
+
+        self.assertEqual(outcomes, [True, False])
+        broker.quit()
+
+    def test_sell_many_skips_positions_already_gone(self):
+        backend = MockBroker()
+        broker = Broker(backend, sessions=2, position_cache_seconds=0)
+        broker.buy("held", Broker.YES, 1, 60)
+
+        outcomes = broker.sell_many([("held", Broker.YES, 1), ("gone", Broker.YES, 1)])
+
+        self.assertIsNone(outcomes[1])
+        self.assertEqual([fill["action"] for fill in backend.account.fills], ["buy", "sell"])
+        broker.quit()
+
+    def test_sell_many_uses_one_session(self):
+        backend = MockBroker()
+        broker = Broker(backend, sessions=3)
+        for contract in ("1", "2", "3"):
+            broker.buy(contract, Broker.YES, 1, 60)
+        backend.latency = 0.05
+
+        start = time.monotonic()
+        outcomes = broker.sell_many([(contract, Broker.YES, 1) for contract in ("1", "2", "3")])
+
+        # A position check and a sale per position, one after another
+        self.assertEqual(outcomes, [True] * 3)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        broker.quit()
+
+    def test_caches_position_checks(self):
+        backend = MockBroker()
+        broker = Broker(backend, sessions=1, position_cache_seconds=60)
+
+        self.assertFalse(broker.have_position_in_market("4446"))
+        backend.account.buy("4446", Broker.YES, 1, 60)
+        self.assertFalse(broker.have_position_in_market("4446"))
+
+        # Orders through the broker invalidate the cached answer
+        broker.sell("4446", Broker.YES, 1)
+        self.assertFalse(broker.have_position_in_market("4446"))
+        broker.buy("4446", Broker.YES, 1, 60)
+        self.assertTrue(broker.have_position_in_market("4446"))
+        broker.quit()
+
+    def test_from_config(self):
+        broker = Broker.from_config({"trader": {"broker": "mock", "sessions": 3}})
+
+        self.assertIsInstance(broker.backend, MockBroker)
+        self.assertEqual(broker.backend.sessions_created, 3)
+        broker.quit()
+
+
+class SessionPoolTest(unittest.TestCase):
+
+    def test_replaces_broken_session(self):
+        backend = FlakyBroker()
+        pool = SessionPool(backend, 1)
+        broken = pool.idle.queue[0]
+
+        with self.assertRaises(ValueError):
+            pool.call(lambda session: int("not a number"))
+
+        self.assertTrue(broken.closed)
+        self.assertEqual(backend.sessions_created, 2)
+        self.assertFalse(pool.call(lambda session: session.have_position_in_market("4446")))
+        pool.close()
+
+    def test_keeps_session_if_replacement_fails(self):
+        backend = FlakyBroker()
+        pool = SessionPool(backend, 1)
+        session = pool.idle.queue[0]
+        backend.fail_logins = True
+
+        with self.assertRaises(ValueError):
+            pool.call(lambda session: int("not a number"))
+
+        self.assertIs(pool.idle.queue[0], session)
+        self.assertFalse(session.closed)
+        pool.close()
+
+    def test_failed_login_quits_other_sessions(self):
+        backend = FlakyBroker()
+        backend.fail_logins = True
+
+        with self.assertRaises(RuntimeError):
+            SessionPool(backend, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
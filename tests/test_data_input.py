@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_input.data_input import DataInput
+
+
+class Logger:
+
+    def log(self, source, msg_type, message, *args):
+        pass
+
+
+class DataInputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = {
+            "markets": [{"entities": ["Donald Trump"], "wikipedia_urls": []}],
+            "data_input": {
+                "sources": ["reuters"],
+                "poll_interval": 60,
+                "news_api": {"api_key": "key"},
+                "dedup": {"path": os.path.join(self.directory, "articles.seen.log")}
+            }
+        }
+        self.data_input = DataInput(None, Logger(), config)
+
+    def tearDown(self):
+        self.data_input.deduplicator.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_marks_published_time(self):
+        article = {"title": "Trump speaks", "publishedAt": "2017-03-01T12:00:00Z"}
+
+        self.data_input.schedule_article(article, "reuters", 1.0)
+
+        self.assertEqual(article["timings"]["published"], 1488369600.0)
+        self.assertIn("received", article["timings"])
+
+    # A missing or malformed publishedAt mustn't pass for a publish time
+    def test_leaves_unknown_published_time_unset(self):
+        for published in (None, "yesterday"):
+            article = {"title": "Trump speaks", "publishedAt": published}
+
+            self.data_input.schedule_article(article, "reuters", 1.0)
+
+            self.assertNotIn("published", article["timings"])
+            self.assertIn("received", article["timings"])
+
+
+if __name__ == "__main__":
+    unittest.main()
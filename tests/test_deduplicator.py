@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_input.deduplicator import Deduplicator, normalize_title
+
+HEADLINE = "Trump wins the Republican nomination in Indiana primary election tonight"
+
+
+class Clock:
+
+    def __init__(self, now=1488300000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class NormalizeTitleTest(unittest.TestCase):
+
+    def test_strips_known_source_suffix(self):
+        self.assertEqual(normalize_title("Trump wins Indiana - Reuters"), "trump wins indiana")
+        self.assertEqual(normalize_title("Trump wins Indiana | BBC News"), "trump wins indiana")
+
+    def test_keeps_other_suffixes(self):
+        self.assertEqual(normalize_title("Clinton leads - poll shows Trump behind"), "clinton leads poll shows trump behind")
+
+    def test_collapses_case_and_punctuation(self):
+        self.assertEqual(normalize_title("  Trump WINS: Indiana!! "), "trump wins indiana")
+
+
+class DeduplicatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.clock = Clock()
+        config = {
+            "markets": [{"target_words": ["wins", "clinches"], "anti_target_words": ["loses", "concedes"]}],
+            "data_input": {"sources": ["bbc-news", "cnn"], "dedup": {"window_hours": 6}}
+        }
+        self.deduplicator = Deduplicator.from_config(config, path=os.path.join(self.work_path, "seen.log"), clock=self.clock)
+
+    def tearDown(self):
+        self.deduplicator.store.close()
+        shutil.rmtree(self.work_path)
+
+    def test_exact_repeat(self):
+        self.assertTrue(self.deduplicator.add(HEADLINE, "cnn"))
+        self.assertFalse(self.deduplicator.add(HEADLINE, "bbc-news"))
+        self.assertEqual(self.deduplicator.reported_by(HEADLINE), ["cnn", "bbc-news"])
+
+    def test_wire_copies_are_merged(self):
+        self.assertTrue(self.deduplicator.add(HEADLINE, "cnn"))
+        self.assertFalse(self.deduplicator.add(HEADLINE + " - BBC News", "bbc-news"))
+        self.assertFalse(self.deduplicator.add("UPDATE 2 " + HEADLINE, "bbc-news"))
+
+    def test_outcome_words_keep_stories_apart(self):
+        self.assertTrue(self.deduplicator.add(HEADLINE, "cnn"))
+        self.assertTrue(self.deduplicator.add(HEADLINE.replace("wins", "loses"), "cnn"))
+
+    def test_swapped_words_keep_stories_apart(self):
+        self.assertTrue(self.deduplicator.add("Senate votes to approve the new budget plan for next fiscal year", "cnn"))
+        self.assertTrue(self.deduplicator.add("Senate votes to reject the new budget plan for next fiscal year", "cnn"))
+
+    def test_added_keyword_or_negation_keeps_stories_apart(self):
+        self.assertTrue(self.deduplicator.add("Republican nomination in Indiana primary election decided tonight", "cnn"))
+        self.assertTrue(self.deduplicator.add("Trump clinches Republican nomination in Indiana primary election decided tonight", "cnn"))
+        self.assertTrue(self.deduplicator.add("Trump wins the Republican nomination in Indiana primary election", "cnn"))
+        self.assertTrue(self.deduplicator.add("Trump not wins the Republican nomination in Indiana primary election", "cnn"))
+
+    def test_near_duplicates_expire_with_window(self):
+        self.assertTrue(self.deduplicator.add(HEADLINE, "cnn"))
+        self.clock.now += 7 * 60 * 60
+
+        self.assertTrue(self.deduplicator.add("UPDATE 2 " + HEADLINE, "cnn"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from data_input.headline_filter import HeadlineFilter, PatternAutomaton, wikipedia_name
+
+MARKETS = [
+    {"entities": ["Donald Trump"], "wikipedia_urls": ["http://en.wikipedia.org/wiki/Hillary_Clinton_(politician)"], "aliases": ["POTUS"]},
+    {"entities": ["Brexit"], "wikipedia_urls": []}
+]
+
+
+class PatternAutomatonTest(unittest.TestCase):
+
+    # Against plain substring search, on overlapping patterns from a tiny alphabet
+    def test_matches_substring_search(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            patterns = {"".join(rng.choice("ab ") for _ in range(rng.randint(1, 4))): {i} for i in range(6)}
+            text = "".join(rng.choice("ab ") for _ in range(20))
+
+            expected = set()
+            for pattern, values in patterns.items():
+                if pattern in text:
+                    expected |= values
+            self.assertEqual(PatternAutomaton(patterns).search(text), expected)
+
+
+class HeadlineFilterTest(unittest.TestCase):
+
+    def test_wikipedia_name(self):
+        self.assertEqual(wikipedia_name("http://en.wikipedia.org/wiki/Donald_Trump_(politician)"), "donald trump")
+
+    def test_tokens(self):
+        headline_filter = HeadlineFilter(MARKETS, fuzzy=False)
+
+        self.assertEqual(headline_filter.matches("Trump's tweets"), {0})
+        self.assertEqual(headline_filter.matches("Clinton wins"), {0})
+        self.assertEqual(headline_filter.matches("POTUS speaks"), {0})
+        self.assertEqual(headline_filter.matches("Brexit vote"), {1})
+        self.assertEqual(headline_filter.matches("Trumpet solo"), set())
+        self.assertFalse(headline_filter.passes("Weather is nice"))
+
+    def test_fuzzy(self):
+        headline_filter = HeadlineFilter(MARKETS, fuzzy=True)
+
+        self.assertEqual(headline_filter.matches("Brexitt vote"), {1})
+
+    def test_names(self):
+        headline_filter = HeadlineFilter(MARKETS, match="names")
+
+        self.assertEqual(headline_filter.matches("Trump's tweets"), set())
+        self.assertEqual(headline_filter.matches("Donald Trump speaks"), {0})
+
+    def test_match_strength(self):
+        headline_filter = HeadlineFilter(MARKETS, fuzzy=True)
+
+        self.assertEqual(headline_filter.match_strength("Donald Trump wins"), 1.0)
+        self.assertEqual(headline_filter.match_strength("Trump wins"), 0.5)
+        self.assertEqual(headline_filter.match_strength("Brexitt vote"), 0.5)
+        self.assertEqual(headline_filter.match_strength("Weather is nice"), 0.0)
+
+    def test_disabled_in_config(self):
+        config = {"markets": MARKETS, "data_input": {"headline_filter": {"enabled": False}}}
+
+        self.assertIsNone(HeadlineFilter.from_config(config))
+
+
+if __name__ == "__main__":
+    unittest.main()
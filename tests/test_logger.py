@@ -0,0 +1,47 @@
+import queue
+import unittest
+
+from logger import Logger, format_record, record_message
+
+
+def record(message, *args):
+    return (0.0, 1488300000.0, 1, "Data Input", "informative", message, args)
+
+
+class FormatRecordTest(unittest.TestCase):
+
+    def test_fills_placeholders(self):
+        self.assertEqual(record_message(record("Got %d articles from %s", 3, "cnn")), "Got 3 articles from cnn")
+
+    def test_appends_args_that_dont_fit(self):
+        self.assertEqual(record_message(record("Got articles", 3)), "Got articles 3")
+
+    def test_keeps_ascii_and_bmp(self):
+        line = format_record(record("Café %s", "news"))
+
+        self.assertTrue(line.endswith("[Data Input] [informative] [Café news]"))
+
+    def test_strips_characters_outside_bmp(self):
+        line = format_record(record("Markets \U0001F4C8 up"))
+
+        self.assertTrue(line.endswith("[Markets  up]"))
+
+
+class LoggerTest(unittest.TestCase):
+
+    def test_batches_until_error(self):
+        messages = queue.Queue()
+        logger = Logger(messages, level="informative")
+        logger.FLUSH_INTERVAL = 60
+
+        logger.log("Trader", "debug", "Filtered out")
+        logger.log("Trader", "informative", "Bought %s", "4446")
+        self.assertTrue(messages.empty())
+
+        logger.log("Trader", "error", "Sell failed")
+        batch = messages.get_nowait()
+        self.assertEqual([entry[5] for entry in batch], ["Bought %s", "Sell failed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
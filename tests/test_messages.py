@@ -0,0 +1,75 @@
+import unittest
+
+from messages import ArticleCodec, ResultCodec, decode_frame, encode_frame
+
+
+def make_article(title, **fields):
+    article = {"title": title, "url": "http://example.com/" + title, "publishedAt": "2017-03-01T12:00:00Z", "timings": {"received": 1.5, "published": 1.0}}
+    article.update(fields)
+    return article
+
+
+class ArticleCodecTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        articles = [make_article("Trump wins"), make_article("Clinton – “quoted” ünïcode", publishedAt=None)]
+        codec = ArticleCodec()
+
+        self.assertEqual(codec.decode(codec.encode(articles)), articles)
+
+    def test_drops_fields_later_stages_dont_use(self):
+        article = make_article("Trump wins", description="long text", author="someone")
+        codec = ArticleCodec()
+
+        decoded, = codec.decode(codec.encode([article]))
+        self.assertNotIn("description", decoded)
+        self.assertNotIn("author", decoded)
+
+    def test_missing_timings(self):
+        article = {"title": "No timings", "url": None, "publishedAt": None}
+        codec = ArticleCodec()
+
+        self.assertEqual(codec.decode(codec.encode([article])), [dict(article, timings={})])
+
+    def test_empty_frame(self):
+        self.assertEqual(decode_frame(encode_frame([])), ([], []))
+
+
+class ResultCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        self.markets = [{"contract_id": "4446", "entities": ["Donald Trump"]}, {"contract_id": "4447", "entities": ["Hillary Clinton"]}]
+        self.codec = ResultCodec(self.markets)
+
+    def test_round_trip(self):
+        article = make_article("Trump and Clinton debate")
+        results = [
+            {"market": self.markets[1], "article": article, "score": [0.1, 0.2, 0.7], "model_version": "20170301-120000"},
+            {"market": self.markets[0], "article": article, "score": [0.5, 0.25, 0.25], "model_version": "20170301-120000"}
+        ]
+
+        decoded = self.codec.decode(self.codec.encode(results))
+
+        self.assertEqual(decoded, results)
+        # Markets come back as the caller's own dicts
+        self.assertIs(decoded[0]["market"], self.markets[1])
+
+    def test_results_for_one_article_share_it(self):
+        article = make_article("Trump and Clinton debate")
+        results = [{"market": market, "article": article, "score": [1.0]} for market in self.markets]
+
+        data = self.codec.encode(results)
+        decoded = self.codec.decode(data)
+
+        self.assertIs(decoded[0]["article"], decoded[1]["article"])
+        self.assertLess(len(data), 2 * len(self.codec.encode(results[:1])))
+
+    def test_missing_model_version(self):
+        decoded, = self.codec.decode(self.codec.encode([{"market": self.markets[0], "article": make_article("x"), "score": []}]))
+
+        self.assertIsNone(decoded["model_version"])
+        self.assertEqual(decoded["score"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from data_input.news_api import NewsApi, NewsApiError, create_pool
+from data_input.news_api_stub import NewsApiStub
+
+
+class Logger:
+
+    def __init__(self):
+        self.records = []
+
+    def log(self, source, msg_type, message, *args):
+        self.records.append((source, msg_type, message % args))
+
+
+class NewsApiTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = NewsApiStub(unsortable_sources=["bloomberg"], failing_sources=["cnn"])
+        self.base_uri = self.stub.start()
+        self.http = create_pool(maxsize=2)
+        self.logger = Logger()
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def api(self, source):
+        return NewsApi("key", source, self.logger, http=self.http, base_uri=self.base_uri, timeout=5)
+
+    def test_gets_newest_articles_first(self):
+        self.stub.publish("reuters", {"title": "First"})
+        self.stub.publish("reuters", {"title": "Second"})
+
+        self.assertEqual([article["title"] for article in self.api("reuters").get_articles()], ["Second", "First"])
+
+    def test_falls_back_to_top_once(self):
+        self.stub.publish("bloomberg", {"title": "Top story"})
+        api = self.api("bloomberg")
+
+        self.assertEqual(api.get_articles(), [{"title": "Top story"}])
+        self.assertEqual(api.sort, "top")
+        api.get_articles()
+        self.assertEqual(self.stub.requests["bloomberg"], 3)
+        self.assertEqual(len(self.logger.records), 1)
+
+    def test_server_error_raises(self):
+        with self.assertRaises(NewsApiError):
+            self.api("cnn").get_articles()
+
+
+if __name__ == "__main__":
+    unittest.main()
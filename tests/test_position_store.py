@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from trader.position_store import PositionStore
+
+
+class PositionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_path, "positions.db")
+        self.store = PositionStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.work_path)
+
+    def test_open_and_lookup(self):
+        position = self.store.open("4446", 1, 1, 100.0, 3700.0)
+
+        self.assertTrue(self.store.has_open("4446"))
+        self.assertFalse(self.store.has_open("4447"))
+        self.assertIs(self.store.get("4446"), position)
+        self.assertEqual(len(self.store), 1)
+
+    def test_expired_pops_due_positions_soonest_first(self):
+        self.store.open("late", 1, 1, 0.0, 300.0)
+        self.store.open("early", 1, 1, 0.0, 100.0)
+        self.store.open("middle", 1, 1, 0.0, 200.0)
+
+        self.assertEqual([position["contract_id"] for position in self.store.expired(250.0)], ["early", "middle"])
+        self.assertEqual(self.store.expired(250.0), [])
+        self.assertEqual(self.store.next_expiry(), 300.0)
+
+    def test_reschedule(self):
+        position = self.store.open("4446", 1, 1, 0.0, 100.0)
+        due, = self.store.expired(100.0)
+        self.store.reschedule(due, 160.0)
+
+        self.assertEqual(self.store.next_expiry(), 160.0)
+        self.assertEqual(self.store.expired(150.0), [])
+        self.assertEqual(self.store.expired(160.0), [position])
+
+    def test_archive_closes_position(self):
+        position = self.store.open("4446", 1, 1, 0.0, 100.0)
+        self.store.archive(position, 120.0)
+
+        self.assertFalse(self.store.has_open("4446"))
+        self.assertIsNone(self.store.next_expiry())
+        self.assertEqual(self.store.db.execute("SELECT contract_id, closed_at FROM closed_positions").fetchall(), [("4446", 120.0)])
+
+    def test_reopens_with_open_positions(self):
+        self.store.open("kept", 0, 2, 0.0, 100.0)
+        closed = self.store.open("closed", 1, 1, 0.0, 50.0)
+        self.store.archive(closed, 60.0)
+        self.store.close()
+
+        self.store = PositionStore(self.path)
+        self.assertEqual([(position["contract_id"], position["side"], position["amount"]) for position in self.store.open_positions()], [("kept", 0, 2)])
+        self.assertEqual(self.store.next_expiry(), 100.0)
+
+    def test_imports_tinydb_positions(self):
+        legacy_path = os.path.join(self.work_path, "positions.db.json")
+        with open(legacy_path, "w") as f:
+            json.dump({"_default": {
+                "1": {"contract_id": "4446", "side": 1, "amount": 1, "at": "2017-03-01T12:00:00+00:00", "closed": False},
+                "2": {"contract_id": "4447", "side": 0, "amount": 1, "at": "2017-03-01T11:00:00+00:00", "closed": True}
+            }}, f)
+        self.store.close()
+
+        self.store = PositionStore(os.path.join(self.work_path, "imported.db"), legacy_path=legacy_path)
+        position = self.store.get("4446")
+
+        self.assertIsNotNone(position)
+        self.assertEqual(position["expires_at"] - position["opened_at"], 3600)
+        self.assertFalse(self.store.has_open("4447"))
+        self.assertTrue(os.path.exists(legacy_path + ".imported"))
+
+
+if __name__ == "__main__":
+    unittest.main()
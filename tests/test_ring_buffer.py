@@ -0,0 +1,215 @@
+import os
+import queue
+import signal
+import time
+import unittest
+from multiprocessing import Process
+
+from messages import ArticleCodec
+from ring_buffer import RingBuffer, EPOCH, FRAME_LENGTH
+from transport import MessageQueue
+
+
+def produce(ring, count):
+    for i in range(count):
+        ring.put(str(i).encode("utf-8") * 3)
+
+
+def hold_lock(ring, seconds):
+    with ring.locked():
+        time.sleep(seconds)
+
+
+# Dies holding the lock before it could record its pid
+def take_lock_unrecorded(ring):
+    ring.lock.acquire()
+    time.sleep(60)
+
+
+def wait_until_locked(ring):
+    while ring.lock.acquire(False):
+        ring.lock.release()
+        time.sleep(0.01)
+
+
+def wait_for_frame(ring):
+    ring.get(True)
+
+
+class RingBufferTest(unittest.TestCase):
+
+    def test_round_trip_in_order(self):
+        ring = RingBuffer(1024)
+        frames = [b"", b"a", b"hello" * 20, bytes(range(256))]
+        for frame in frames:
+            self.assertTrue(ring.put(frame))
+
+        self.assertEqual(ring.qsize(), len(frames))
+        self.assertEqual([ring.get_nowait() for _ in frames], frames)
+        self.assertTrue(ring.empty())
+
+    def test_wraparound(self):
+        # Frames of 4 + 9 bytes in a 32 byte ring straddle the end every few puts
+        ring = RingBuffer(32)
+        for i in range(100):
+            frame = bytes([i % 256]) * 9
+            ring.put(frame)
+            self.assertEqual(ring.get_nowait(), frame)
+
+        self.assertGreater(ring.state[0], 32 * 10)
+
+    def test_length_prefix_split_across_end(self):
+        ring = RingBuffer(16)
+        ring.put(b"abcdefghij")  # 14 bytes
+        ring.get_nowait()
+        ring.put(b"xyz")          # prefix starts 2 bytes before the end
+
+        self.assertEqual(ring.get_nowait(), b"xyz")
+
+    def test_get_times_out_when_empty(self):
+        ring = RingBuffer(64)
+
+        with self.assertRaises(queue.Empty):
+            ring.get_nowait()
+        start = time.monotonic()
+        with self.assertRaises(queue.Empty):
+            ring.get(True, 0.05)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_frame_larger_than_ring(self):
+        with self.assertRaises(ValueError):
+            RingBuffer(16).put(b"x" * 13)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            RingBuffer(16, policy="sometimes")
+
+    def test_shed_drops_new_frames(self):
+        ring = RingBuffer(1024, maxsize=2, policy="shed")
+
+        self.assertTrue(ring.put(b"1"))
+        self.assertTrue(ring.put(b"2"))
+        self.assertFalse(ring.put(b"3"))
+        self.assertEqual(ring.dropped.value, 1)
+        self.assertEqual([ring.get_nowait(), ring.get_nowait()], [b"1", b"2"])
+
+    def test_drop_oldest_when_out_of_frames(self):
+        ring = RingBuffer(1024, maxsize=2, policy="drop_oldest")
+        for frame in (b"1", b"2", b"3"):
+            self.assertTrue(ring.put(frame))
+
+        self.assertEqual(ring.dropped.value, 1)
+        self.assertEqual([ring.get_nowait(), ring.get_nowait()], [b"2", b"3"])
+
+    def test_drop_oldest_when_out_of_bytes(self):
+        ring = RingBuffer(3 * (FRAME_LENGTH.size + 8), policy="drop_oldest")
+        for i in range(5):
+            ring.put(bytes([i]) * 8)
+
+        self.assertEqual(ring.dropped.value, 2)
+        self.assertEqual([ring.get_nowait()[0] for _ in range(3)], [2, 3, 4])
+
+    def test_block_waits_for_room(self):
+        ring = RingBuffer(1024, maxsize=1)
+        ring.put(b"1")
+
+        consumer = Process(target=wait_for_frame, args=(ring,))
+        start = time.monotonic()
+        consumer.start()
+        ring.put(b"2")
+        consumer.join(5)
+
+        self.assertEqual(ring.get(True, 1), b"2")
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_across_processes(self):
+        ring = RingBuffer(64)
+        producer = Process(target=produce, args=(ring, 200))
+        producer.start()
+
+        received = [ring.get(True, 5) for _ in range(200)]
+        producer.join()
+
+        self.assertEqual(received, [str(i).encode("utf-8") * 3 for i in range(200)])
+
+    def test_recovers_lock_held_by_killed_process(self):
+        ring = RingBuffer(1024, policy="shed")
+        ring.LOCK_TIMEOUT = 0.2
+        ring.put(b"before")
+
+        holder = Process(target=hold_lock, args=(ring, 60))
+        holder.start()
+        wait_until_locked(ring)
+        os.kill(holder.pid, signal.SIGKILL)
+        holder.join()
+
+        self.assertTrue(ring.put(b"after"))
+        self.assertEqual(ring.state[EPOCH], 1)
+        self.assertEqual(ring.qsize(), 2)
+        self.assertEqual([ring.get_nowait(), ring.get_nowait()], [b"before", b"after"])
+
+    def test_recovers_lock_without_recorded_holder(self):
+        ring = RingBuffer(1024, policy="shed")
+        ring.LOCK_TIMEOUT = 0.2
+
+        holder = Process(target=take_lock_unrecorded, args=(ring,))
+        holder.start()
+        wait_until_locked(ring)
+        os.kill(holder.pid, signal.SIGKILL)
+        holder.join()
+
+        self.assertTrue(ring.put(b"after"))
+        self.assertEqual(ring.get_nowait(), b"after")
+
+    # A holder that's slow but alive keeps the lock
+    def test_waits_for_slow_holder(self):
+        ring = RingBuffer(1024, policy="shed")
+        ring.LOCK_TIMEOUT = 0.2
+
+        holder = Process(target=hold_lock, args=(ring, 1))
+        holder.start()
+        wait_until_locked(ring)
+        start = time.monotonic()
+
+        self.assertTrue(ring.put(b"after"))
+        self.assertGreater(time.monotonic() - start, 0.5)
+        self.assertEqual(ring.state[EPOCH], 0)
+        holder.join()
+
+    def test_killed_waiter_doesnt_block_producers(self):
+        ring = RingBuffer(1024, policy="shed")
+        waiter = Process(target=wait_for_frame, args=(ring,))
+        waiter.start()
+        time.sleep(0.1)
+        os.kill(waiter.pid, signal.SIGKILL)
+        waiter.join()
+
+        self.assertTrue(ring.put(b"1"))
+        self.assertEqual(ring.get(True, 1), b"1")
+
+
+class MessageQueueTest(unittest.TestCase):
+
+    def test_batches_over_ring(self):
+        articles = [{"title": str(i), "url": None, "publishedAt": None, "timings": {}} for i in range(5)]
+        article_queue = MessageQueue(RingBuffer(4096), ArticleCodec())
+
+        article_queue.put_many(articles[:3])
+        article_queue.put(articles[3])
+        article_queue.put_many([])
+
+        # Frames in the ring, plus what's been unpacked locally
+        self.assertEqual(article_queue.qsize(), 2)
+        self.assertEqual([article_queue.get(True, 1) for _ in range(4)], articles[:4])
+        self.assertTrue(article_queue.empty())
+
+    def test_from_config(self):
+        config = {"queues": {"article_queue": {"size": 3, "policy": "shed", "transport": "queue"}}}
+        article_queue = MessageQueue.from_config(config, "article_queue", ArticleCodec())
+
+        self.assertNotIsInstance(article_queue.channel, RingBuffer)
+        self.assertIsInstance(MessageQueue.from_config({}, "article_queue", ArticleCodec()).channel, RingBuffer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+import arrow
+
+from data_input.scheduler import ArticleScheduler
+
+NOW = 1488300000.0
+
+
+class Clock:
+
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def article(title, age=None):
+    article = {"title": title}
+    if age is not None:
+        article["publishedAt"] = arrow.get(NOW - age).isoformat()
+    return article
+
+
+class ArticleSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.scheduler = ArticleScheduler(max_age=600, max_pending=3, dispatch_depth=10, match_bonus=100, clock=self.clock)
+
+    def titles(self, articles):
+        return [article["title"] for article in articles]
+
+    def test_freshest_first(self):
+        for title, age in (("old", 300), ("fresh", 10), ("middle", 100)):
+            self.scheduler.push(article(title, age), "cnn")
+
+        self.assertEqual(self.titles(self.scheduler.dispatch(lambda: 0)), ["fresh", "middle", "old"])
+
+    def test_match_strength_counts_as_freshness(self):
+        self.scheduler.push(article("fresh", 10), "cnn", 0.0)
+        self.scheduler.push(article("strong", 80), "cnn", 1.0)
+        self.scheduler.push(article("weak", 80), "cnn", 0.5)
+
+        self.assertEqual(self.titles(self.scheduler.dispatch(lambda: 0)), ["strong", "fresh", "weak"])
+
+    def test_expired_on_push(self):
+        self.assertFalse(self.scheduler.push(article("ancient", 700), "cnn"))
+        self.assertEqual(self.scheduler.expired, 1)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_expire_drops_articles_that_aged_while_waiting(self):
+        self.scheduler.push(article("old", 500), "cnn")
+        self.scheduler.push(article("fresh", 10), "cnn")
+        self.clock.now += 200
+
+        self.scheduler.expire()
+        self.assertEqual(self.scheduler.expired, 1)
+        self.assertEqual(self.titles(self.scheduler.dispatch(lambda: 0)), ["fresh"])
+
+    def test_dispatch_skips_expired(self):
+        self.scheduler.push(article("old", 500), "cnn")
+        self.clock.now += 200
+
+        self.assertEqual(self.scheduler.dispatch(lambda: 0), [])
+        self.assertEqual(self.scheduler.expired, 1)
+
+    def test_drops_lowest_ranked_when_full(self):
+        for title, age in (("a", 10), ("stalest", 400), ("b", 20), ("c", 30)):
+            self.assertTrue(self.scheduler.push(article(title, age), "cnn"))
+
+        self.assertEqual(self.scheduler.dropped, 1)
+        self.assertEqual(self.titles(self.scheduler.dispatch(lambda: 0)), ["a", "b", "c"])
+
+    def test_dispatch_stops_at_depth(self):
+        self.scheduler.dispatch_depth = 3
+        for title, age in (("a", 10), ("b", 20), ("c", 30)):
+            self.scheduler.push(article(title, age), "cnn")
+
+        self.assertEqual(self.titles(self.scheduler.dispatch(lambda: 1)), ["a", "b"])
+        self.assertEqual(self.scheduler.dispatch(lambda: 3), [])
+        self.assertEqual(len(self.scheduler), 1)
+
+    def test_missing_published_at_uses_source_lag(self):
+        self.scheduler.push(article("dated", 400), "slow-source")
+        self.clock.now += 10
+        self.scheduler.push(article("undated slow"), "slow-source")
+        self.scheduler.push(article("undated new source"), "other")
+
+        self.assertEqual(self.titles(self.scheduler.dispatch(lambda: 0)), ["undated new source", "undated slow", "dated"])
+
+    def test_from_config(self):
+        config = {"data_input": {"scheduler": {"max_age": 60}}, "data_analysis": {"max_batch_size": 4}}
+        scheduler = ArticleScheduler.from_config(config)
+
+        self.assertEqual(scheduler.max_age, 60)
+        self.assertEqual(scheduler.dispatch_depth, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_input.seen_store import SeenStore
+
+
+class Clock:
+
+    def __init__(self, now=1488300000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SeenStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_path, "seen.log")
+        self.clock = Clock()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def open(self):
+        return SeenStore(self.path, ttl=100, clock=self.clock)
+
+    def test_add_and_contains(self):
+        store = self.open()
+
+        self.assertTrue(store.add("Trump wins"))
+        self.assertFalse(store.add("Trump wins"))
+        self.assertIn("Trump wins", store)
+        self.assertNotIn("Clinton wins", store)
+        store.close()
+
+    def test_entries_expire(self):
+        store = self.open()
+        store.add("Trump wins")
+        self.clock.now += 50
+        store.add("Clinton wins")
+        self.clock.now += 60
+
+        self.assertNotIn("Trump wins", store)
+        self.assertIn("Clinton wins", store)
+        self.assertEqual(len(store), 1)
+        store.close()
+
+    def test_reloads_live_entries(self):
+        store = self.open()
+        store.add("Trump wins")
+        self.clock.now += 50
+        store.add("Clinton wins")
+        store.close()
+
+        self.clock.now += 60
+        store = self.open()
+        self.assertNotIn("Trump wins", store)
+        self.assertIn("Clinton wins", store)
+        store.close()
+
+    def test_skips_partial_last_line(self):
+        store = self.open()
+        store.add("Trump wins")
+        store.close()
+        with open(self.path, "a") as f:
+            f.write("14883000")
+
+        store = self.open()
+        self.assertIn("Trump wins", store)
+        self.assertEqual(len(store), 1)
+        store.close()
+
+    def test_compaction_keeps_only_live_entries(self):
+        store = self.open()
+        store.COMPACT_MIN_LINES = 10
+        for i in range(20):
+            store.add("Old story " + str(i))
+        self.clock.now += 200
+        for i in range(3):
+            store.add("New story " + str(i))
+
+        store.compact_if_needed()
+        store.add("Newest story")
+        store.close()
+
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 4)
+        store = self.open()
+        self.assertIn("New story 0", store)
+        self.assertIn("Newest story", store)
+        self.assertNotIn("Old story 0", store)
+        store.close()
+
+    def test_no_compaction_below_ratio(self):
+        store = self.open()
+        store.COMPACT_MIN_LINES = 1
+        for i in range(5):
+            store.add("Story " + str(i))
+
+        store.compact_if_needed()
+        self.assertEqual(store.log_lines, 5)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from service import Service
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Stands in for every stage, so no stage's dependencies are needed
+class Stage:
+
+    def __init__(self, *args):
+        pass
+
+    def run(self, heartbeat=None, stopping=None):
+        while not stopping.is_set():
+            heartbeat.beat()
+            time.sleep(0.05)
+
+
+class ServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(PROJECT_PATH, "config.json.sample")) as f:
+            config = json.load(f)
+        config["service"]["listen"] = False
+
+        # The service writes its logs under the working directory
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        os.mkdir("logs")
+
+        self.service = Service(config)
+        for launcher in (self.service.scraper, self.service.analysis, self.service.trader):
+            launcher.module = __name__
+            launcher.class_name = "Stage"
+
+    def tearDown(self):
+        self.service.shutdown()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_scales_analysis_up_under_backlog(self):
+        self.service.supervisor.start()
+        self.service.autoscaler.scale_up_after = 0
+        self.service.article_backlog.value = 1000
+
+        self.service.supervise()
+
+        workers = self.service.supervisor.stage_workers("data_analysis")
+        self.assertEqual(len(workers), 2)
+        self.assertIs(workers[-1].target, self.service.analysis)
+
+        time.sleep(0.5)
+        self.service.article_backlog.value = 0
+        self.service.supervise()
+        self.assertTrue(all(worker.process.is_alive() for worker in workers))
+        self.assertEqual(self.service.supervisor.restarts(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import signal
+import time
+import unittest
+
+from supervisor import Autoscaler, RestartPolicy, Supervisor
+
+
+class Logger:
+
+    def __init__(self):
+        self.messages = []
+
+    def log(self, source, msg_type, message, *args):
+        self.messages.append(message % args)
+
+
+# Takes a while to start, then beats until asked to stop
+def slow_start(heartbeat, stopping):
+    time.sleep(1)
+    while not stopping.is_set():
+        heartbeat.beat()
+        time.sleep(0.05)
+
+
+# Starts, then hangs without beating and ignores SIGTERM
+def hang(heartbeat, stopping):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    heartbeat.beat()
+    while True:
+        time.sleep(1)
+
+
+def exit_now(heartbeat, stopping):
+    pass
+
+
+class SupervisorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = Logger()
+        self.supervisor = Supervisor(self.logger)
+
+    def tearDown(self):
+        self.supervisor.stop(grace=1)
+
+    def watch(self, seconds):
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            self.supervisor.check()
+            time.sleep(0.05)
+
+    def test_slow_start_isnt_hung(self):
+        worker = self.supervisor.add("stage", "Slow", slow_start, RestartPolicy(heartbeat_timeout=0.5, startup_timeout=5))
+        self.supervisor.start()
+
+        self.watch(1.5)
+
+        self.assertEqual(worker.restarts, 0)
+        self.assertTrue(worker.process.is_alive())
+
+    def test_kills_hung_worker(self):
+        worker = self.supervisor.add("stage", "Hung", hang, RestartPolicy(initial_backoff=60, heartbeat_timeout=0.5))
+        self.supervisor.start()
+        process = worker.process
+
+        self.watch(1)
+
+        self.assertEqual(worker.restarts, 1)
+        self.assertFalse(process.is_alive())
+        self.assertEqual(process.exitcode, -signal.SIGKILL)
+
+    def test_restarts_with_backoff(self):
+        worker = self.supervisor.add("stage", "Exits", exit_now, RestartPolicy(initial_backoff=0.1, max_backoff=0.2))
+        self.supervisor.start()
+
+        self.watch(1)
+
+        self.assertGreaterEqual(worker.restarts, 2)
+        self.assertIn("exited with code 0", "\n".join(self.logger.messages))
+
+    def test_scale(self):
+        policy = RestartPolicy()
+        self.supervisor.scale("stage", 2, "Slow", slow_start, policy)
+        self.assertEqual(len(self.supervisor.stage_workers("stage")), 2)
+
+        self.supervisor.scale("stage", 1, "Slow", slow_start, policy)
+        self.assertEqual(len(self.supervisor.stage_workers("stage")), 1)
+        self.assertEqual(len(self.supervisor.workers), 2)
+
+
+class AutoscalerTest(unittest.TestCase):
+
+    def test_scales_up_after_sustained_backlog(self):
+        autoscaler = Autoscaler(1, 4, scale_up_depth=20, scale_up_after=5)
+
+        self.assertEqual(autoscaler.desired(1, 100, now=1000), 1)
+        self.assertEqual(autoscaler.desired(1, 100, now=1005), 2)
+        self.assertEqual(autoscaler.desired(4, 1000, now=1100), 4)
+
+    def test_scales_down_after_idle(self):
+        autoscaler = Autoscaler(1, 4, scale_down_after=120)
+
+        self.assertEqual(autoscaler.desired(3, 0, now=1000), 3)
+        self.assertEqual(autoscaler.desired(3, 0, now=1120), 2)
+        self.assertEqual(autoscaler.desired(1, 0, now=1500), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import arrow
+
+from trader.position_store import PositionStore
+from trader.trader import SELL_RETRY_SECONDS, Trader
+
+
+class Logger:
+
+    def log(self, source, msg_type, message, *args):
+        pass
+
+    def metric(self, source, name, data):
+        pass
+
+
+# Answers sell_many with scripted outcomes, one per contract
+class WebInterface:
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.batches = []
+
+    def sell_many(self, orders):
+        self.batches.append(orders)
+        return [self.outcomes[contract] for contract, option, quantity in orders]
+
+
+class Clock:
+
+    def __init__(self, now=1488300000.0):
+        self.now = now
+
+    def __call__(self):
+        return arrow.get(self.now)
+
+
+class SellPositionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.positions = PositionStore(os.path.join(self.work_path, "positions.db"))
+        self.clock = Clock()
+
+    def tearDown(self):
+        self.positions.close()
+        shutil.rmtree(self.work_path)
+
+    def trader(self, outcomes):
+        config = {"trader": {"close_coalesce_seconds": 1}}
+        return Trader(None, Logger(), config, web_interface=WebInterface(outcomes), clock=self.clock, positions=self.positions)
+
+    def test_archives_sold_and_retries_the_rest(self):
+        outcomes = {"sold": True, "gone": None, "rejected": False, "failed": RuntimeError("Session lost")}
+        trader = self.trader(outcomes)
+        for contract in outcomes:
+            self.positions.open(contract, 1, 1, self.clock.now - 3600, self.clock.now)
+
+        trader.sell_positions()
+
+        self.assertEqual(len(trader.web_interface.batches), 1)
+        self.assertFalse(self.positions.has_open("sold"))
+        self.assertFalse(self.positions.has_open("gone"))
+        self.assertTrue(self.positions.has_open("rejected"))
+        self.assertTrue(self.positions.has_open("failed"))
+        self.assertEqual(self.positions.next_expiry(), self.clock.now + SELL_RETRY_SECONDS)
+
+    def test_coalesces_positions_due_together(self):
+        trader = self.trader({"now": True, "soon": True, "later": True})
+        self.positions.open("now", 1, 1, 0.0, self.clock.now)
+        self.positions.open("soon", 1, 1, 0.0, self.clock.now + 0.5)
+        self.positions.open("later", 1, 1, 0.0, self.clock.now + 10)
+
+        trader.sell_positions()
+
+        self.assertEqual([[order[0] for order in batch] for batch in trader.web_interface.batches], [["now", "soon"]])
+        self.assertTrue(self.positions.has_open("later"))
+
+    def test_failed_batch_is_retried(self):
+        trader = self.trader({})
+        self.positions.open("4446", 1, 1, 0.0, self.clock.now)
+
+        trader.sell_positions()
+
+        self.assertTrue(self.positions.has_open("4446"))
+        self.assertEqual(self.positions.next_expiry(), self.clock.now + SELL_RETRY_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
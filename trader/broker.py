@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Order execution for the Trader, with the same API as WebInterface.
+# Keeps a pool of broker sessions that are logged in up front, so an order
+# never waits for a browser to start; sends independent buys concurrently,
+# one per session, and closes due positions together in one session; and
+# caches position checks for a few seconds.
+#
+# Sessions come from a backend: any object with create_session(), returning a
+# logged-in session with WebInterface's have_position_in_market, buy, sell
+# and quit. SeleniumBackend drives Chrome; trader/mock_broker.py is an
+# in-memory broker for tests and benchmarks. A direct HTTP client for the
+# exchange would be another backend.
+class Broker:
+    YES = 1
+    NO = 0
+
+    def __init__(self, backend, sessions=2, position_cache_seconds=5):
+        self.backend = backend
+        self.position_cache_seconds = position_cache_seconds
+        self.position_cache = {}
+        self.cache_lock = threading.Lock()
+
+        self.pool = SessionPool(backend, sessions)
+        self.executor = ThreadPoolExecutor(max_workers=sessions)
+
+    # config["trader"]["broker"] picks the backend: "selenium" (default) or "mock"
+    @classmethod
+    def from_config(cls, config):
+        trader_config = config["trader"]
+        kind = trader_config.get("broker", "selenium")
+        if kind == "mock":
+            from trader.mock_broker import MockBroker
+            backend = MockBroker()
+        else:
+            backend = SeleniumBackend(trader_config["user"], trader_config["pass"], trader_config.get("headless_browser", True))
+
+        return cls(backend, trader_config.get("sessions", 2), trader_config.get("position_cache_seconds", 5))
+
+    def have_position_in_market(self, contract_id):
+        with self.cache_lock:
+            cached = self.position_cache.get(contract_id)
+        if cached is not None and time.time() - cached[1] < self.position_cache_seconds:
+            return cached[0]
+
+        have_position = self.pool.call(lambda session: session.have_position_in_market(contract_id))
+        with self.cache_lock:
+            self.position_cache[contract_id] = (have_position, time.time())
+        return have_position
+
+    def forget_position(self, contract_id):
+        with self.cache_lock:
+            self.position_cache.pop(contract_id, None)
+
+    def buy(self, contract, option, quantity, max_price):
+        try:
+            return self.pool.call(lambda session: session.buy(contract, option, quantity, max_price))
+        finally:
+            self.forget_position(contract)
+
+    def sell(self, contract, option, quantity):
+        try:
+            return self.pool.call(lambda session: session.sell(contract, option, quantity))
+        finally:
+            self.forget_position(contract)
+
+    # orders are (contract, option, quantity, max_price). Orders run
+    # concurrently; returns each order's result, or the exception it raised.
+    def buy_many(self, orders):
+        return self.run_all(self.buy, orders)
+
+    # orders are (contract, option, quantity). The positions are closed one
+    # after another in a single session; those that are already gone are
+    # skipped (None). If a sale raises, the whole batch raises, so the
+    # caller retries it; positions sold by then are skipped on the retry.
+    def sell_many(self, orders):
+        def sell_all(session):
+            return [session.sell(*order) if session.have_position_in_market(order[0]) else None for order in orders]
+
+        try:
+            return self.pool.call(sell_all)
+        finally:
+            for order in orders:
+                self.forget_position(order[0])
+
+    def run_all(self, function, orders):
+        futures = [self.executor.submit(function, *order) for order in orders]
+
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+
+        return outcomes
+
+    def quit(self):
+        self.executor.shutdown()
+        self.pool.close()
+
+
+# Logged-in sessions, created in parallel up front. A session that raises is
+# assumed broken: it's quit and replaced.
+class SessionPool:
+
+    def __init__(self, backend, size):
+        self.backend = backend
+        self.idle = queue.Queue()
+
+        sessions = []
+        errors = []
+
+        def create():
+            try:
+                sessions.append(backend.create_session())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=create) for _ in range(size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            for session in sessions:
+                session.quit()
+            raise errors[0]
+
+        for session in sessions:
+            self.idle.put(session)
+
+    # Runs function(session) on an idle session, waiting for one if needed
+    def call(self, function):
+        session = self.idle.get()
+        try:
+            result = function(session)
+        except Exception:
+            self.replace(session)
+            raise
+
+        self.idle.put(session)
+        return result
+
+    def replace(self, session):
+        try:
+            replacement = self.backend.create_session()
+        except Exception:
+            # Keep the old session rather than shrink the pool; it's replaced
+            # on its next failure
+            self.idle.put(session)
+            return
+
+        try:
+            session.quit()
+        except Exception:
+            pass
+        self.idle.put(replacement)
+
+    def close(self):
+        while True:
+            try:
+                session = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            session.quit()
+
+
+# Chrome sessions driven through Selenium (see web_interface.py)
+class SeleniumBackend:
+
+    def __init__(self, user, pwd, headless=True):
+        self.user = user
+        self.pwd = pwd
+        self.headless = headless
+
+    def create_session(self):
+        from trader.web_interface import WebInterface
+        return WebInterface(self.user, self.pwd, self.headless)
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from trader.simulated_web_interface import SimulatedWebInterface
+
+
+# In-memory broker backend for Broker (see trader/broker.py), for tests and
+# benchmarks. Every session trades against one shared SimulatedWebInterface
+# account; latency is added to each call, and login_latency to each new
+# session, to stand in for the exchange.
+class MockBroker:
+
+    def __init__(self, latency=0.0, login_latency=0.0, account=None):
+        self.latency = latency
+        self.login_latency = login_latency
+        self.account = account or SimulatedWebInterface(clock=time.time)
+        self.lock = threading.Lock()
+        self.sessions_created = 0
+
+    def create_session(self):
+        time.sleep(self.login_latency)
+        with self.lock:
+            self.sessions_created += 1
+        return MockSession(self)
+
+
+class MockSession:
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.closed = False
+
+    def call(self, function, *args):
+        if self.closed:
+            raise RuntimeError("Session is closed")
+
+        time.sleep(self.broker.latency)
+        with self.broker.lock:
+            return function(*args)
+
+    def have_position_in_market(self, contract_id):
+        return self.call(self.broker.account.have_position_in_market, contract_id)
+
+    def buy(self, contract, option, quantity, max_price):
+        return self.call(self.broker.account.buy, contract, option, quantity, max_price)
+
+    def sell(self, contract, option, quantity):
+        return self.call(self.broker.account.sell, contract, option, quantity)
+
+    def quit(self):
+        self.closed = True
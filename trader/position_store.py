@@ -0,0 +1,169 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+
+import arrow
+
+
+# Open positions, indexed in memory and persisted in SQLite.
+# Open positions are kept by contract (for the "already have a position"
+# check) and in a heap by expiry time, so finding the positions due to be
+# sold only touches those. Closed positions are moved to an archive table,
+# so the open set stays small no matter how long the bot runs.
+# Safe to share between threads.
+class PositionStore:
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        self.by_id = {}
+        self.by_contract = {}
+        self.expiry = []
+        self.lock = threading.RLock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS positions (id INTEGER PRIMARY KEY, contract_id TEXT, side INTEGER, amount INTEGER, opened_at REAL, expires_at REAL)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS closed_positions (position_id INTEGER, contract_id TEXT, side INTEGER, amount INTEGER, opened_at REAL, expires_at REAL, closed_at REAL)")
+
+        self.load()
+        if legacy_path is not None and os.path.exists(legacy_path):
+            self.import_tinydb(legacy_path)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def load(self):
+        for row in self.db.execute("SELECT id, contract_id, side, amount, opened_at, expires_at FROM positions"):
+            self.index(self.row_to_position(row))
+
+    def row_to_position(self, row):
+        return {
+            "id": row[0],
+            "contract_id": row[1],
+            "side": row[2],
+            "amount": row[3],
+            "opened_at": row[4],
+            "expires_at": row[5]
+        }
+
+    def index(self, position):
+        self.by_id[position["id"]] = position
+        self.by_contract[position["contract_id"]] = position
+        heapq.heappush(self.expiry, (position["expires_at"], position["id"]))
+
+    def has_open(self, contract_id):
+        return contract_id in self.by_contract
+
+    def get(self, contract_id):
+        return self.by_contract.get(contract_id)
+
+    def open_positions(self):
+        return list(self.by_id.values())
+
+    # Records a new position; times are timestamps
+    def open(self, contract_id, side, amount, opened_at, expires_at):
+        with self.lock:
+            with self.db:
+                cursor = self.db.execute(
+                    "INSERT INTO positions (contract_id, side, amount, opened_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (contract_id, side, amount, opened_at, expires_at)
+                )
+
+            position = {
+                "id": cursor.lastrowid,
+                "contract_id": contract_id,
+                "side": side,
+                "amount": amount,
+                "opened_at": opened_at,
+                "expires_at": expires_at
+            }
+            self.index(position)
+            return position
+
+    # Removes and returns the open positions that expire at or before `now`,
+    # soonest first. The caller archives them once sold, or reschedules them.
+    def expired(self, now):
+        with self.lock:
+            positions = []
+            while self.expiry and self.expiry[0][0] <= now:
+                expires_at, position_id = heapq.heappop(self.expiry)
+                position = self.by_id.get(position_id)
+
+                # Skip entries left behind by archives and reschedules
+                if position is not None and position["expires_at"] == expires_at:
+                    positions.append(position)
+
+            return positions
+
+    # Expiry time of the next position due, or None if there are none open
+    def next_expiry(self):
+        with self.lock:
+            while self.expiry:
+                expires_at, position_id = self.expiry[0]
+                position = self.by_id.get(position_id)
+                if position is not None and position["expires_at"] == expires_at:
+                    return expires_at
+                heapq.heappop(self.expiry)
+
+            return None
+
+    # Moves an open position's expiry, e.g. to retry a failed sale later
+    def reschedule(self, position, expires_at):
+        with self.lock:
+            with self.db:
+                self.db.execute("UPDATE positions SET expires_at = ? WHERE id = ?", (expires_at, position["id"]))
+            position["expires_at"] = expires_at
+            heapq.heappush(self.expiry, (expires_at, position["id"]))
+
+    # Moves a position out of the open set once it has been sold
+    def archive(self, position, closed_at):
+        with self.lock:
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO closed_positions (position_id, contract_id, side, amount, opened_at, expires_at, closed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (position["id"], position["contract_id"], position["side"], position["amount"], position["opened_at"], position["expires_at"], closed_at)
+                )
+                self.db.execute("DELETE FROM positions WHERE id = ?", (position["id"],))
+
+            del self.by_id[position["id"]]
+            if self.by_contract.get(position["contract_id"]) is position:
+                del self.by_contract[position["contract_id"]]
+
+    # One-time import of the old TinyDB positions.db.json, where positions
+    # were held for an hour. The old file is renamed afterwards so it isn't
+    # imported again.
+    def import_tinydb(self, legacy_path, hold_seconds=60 * 60):
+        with open(legacy_path, "r") as f:
+            try:
+                tables = json.load(f)
+            except ValueError:
+                tables = {}
+
+        rows = []
+        for table in tables.values():
+            for doc in table.values():
+                try:
+                    opened_at = arrow.get(doc["at"]).float_timestamp
+                    rows.append((doc["contract_id"], doc["side"], doc["amount"], opened_at, opened_at + hold_seconds, doc["closed"]))
+                except Exception:
+                    # Skip malformed rows
+                    continue
+
+        for contract_id, side, amount, opened_at, expires_at, closed in sorted(rows, key=lambda row: row[3]):
+            if closed:
+                # The old file didn't record when positions were closed
+                with self.db:
+                    self.db.execute(
+                        "INSERT INTO closed_positions (contract_id, side, amount, opened_at, expires_at, closed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (contract_id, side, amount, opened_at, expires_at, None)
+                    )
+            else:
+                self.open(contract_id, side, amount, opened_at, expires_at)
+
+        os.replace(legacy_path, legacy_path + ".imported")
+
+    def close(self):
+        self.db.close()
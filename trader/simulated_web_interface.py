@@ -0,0 +1,89 @@
+# Stand-in for WebInterface, for replays and benchmarks.
+# Fills orders at the last recorded price for each contract (or default_price,
+# in dollars per share), keeps one position per contract and tracks fills and
+# profit/loss. Buys whose price is above max_price (in cents) are rejected.
+class SimulatedWebInterface:
+    # Same values as WebInterface's, without loading selenium
+    YES = 1
+    NO = 0
+
+    def __init__(self, clock=None, default_price=0.5):
+        self.clock = clock
+        self.default_price = default_price
+        self.prices = {}
+        self.positions = {}
+        self.fills = []
+        self.rejected = 0
+        self.sell_batches = 0
+        self.realized_pnl = 0.0
+
+    # Records the current YES/NO share prices for a contract.
+    # The NO price defaults to 1 - the YES price.
+    def set_price(self, contract_id, yes_price, no_price=None):
+        self.prices[contract_id] = {
+            self.YES: yes_price,
+            self.NO: 1 - yes_price if no_price is None else no_price
+        }
+
+    def price(self, contract_id, option):
+        prices = self.prices.get(contract_id)
+        return prices[option] if prices is not None else self.default_price
+
+    def record_fill(self, contract_id, action, option, quantity, price):
+        self.fills.append({
+            "at": self.clock() if self.clock is not None else None,
+            "contract_id": contract_id,
+            "action": action,
+            "side": option,
+            "quantity": quantity,
+            "price": price
+        })
+
+    def quit(self):
+        pass
+
+    def have_position_in_market(self, contract_id):
+        return contract_id in self.positions
+
+    def buy(self, contract, option, quantity, max_price):
+        price = self.price(contract, option)
+        if price * 100 > max_price:
+            self.rejected += 1
+            return False
+
+        position = self.positions.setdefault(contract, {"side": option, "quantity": 0, "cost": 0.0})
+        position["quantity"] += quantity
+        position["cost"] += price * quantity
+
+        self.record_fill(contract, "buy", option, quantity, price)
+        return True
+
+    def sell(self, contract, option, quantity):
+        position = self.positions.get(contract)
+        if position is None or position["side"] != option:
+            return False
+
+        quantity = min(quantity, position["quantity"])
+        price = self.price(contract, option)
+        average_cost = position["cost"] / position["quantity"]
+
+        self.realized_pnl += (price - average_cost) * quantity
+        position["quantity"] -= quantity
+        position["cost"] -= average_cost * quantity
+        if position["quantity"] == 0:
+            del self.positions[contract]
+
+        self.record_fill(contract, "sell", option, quantity, price)
+        return True
+
+    def buy_many(self, orders):
+        return [self.buy(*order) for order in orders]
+
+    # Positions that are already gone are skipped, as with WebInterface
+    def sell_many(self, orders):
+        self.sell_batches += 1
+        return [self.sell(contract, option, quantity) if contract in self.positions else None for contract, option, quantity in orders]
+
+    # Profit/loss of the open positions at the current prices
+    def unrealized_pnl(self):
+        return sum(self.price(contract, position["side"]) * position["quantity"] - position["cost"] for contract, position in self.positions.items())
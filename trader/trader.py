@@ -1,38 +1,141 @@
-import time
-from trader.web_interface import WebInterface
-from tinydb import *
-import datetime
+import queue
 import arrow
+from metrics import mark
+from trader.position_store import PositionStore
+from supervisor import HEARTBEAT_INTERVAL
+
+# Timestamps the trader reports; earlier stages are reported by Data Analysis
+TRADER_TIMINGS = ("published", "scored", "trader_dequeued", "order_submitted")
+
+# How long positions are held before they're sold, unless the market or
+# config["trader"] sets "hold_minutes"
+DEFAULT_HOLD_MINUTES = 60
+
+# How long (seconds) to wait before retrying a failed sale
+SELL_RETRY_SECONDS = 60
+
+# Most results traded together, so their orders can be sent concurrently
+MAX_ORDER_BATCH = 16
 
 class Trader:
 
-    def __init__(self, result_queue, logger, config):
+    # web_interface, clock (returns the current time as an arrow object) and
+    # positions (a PositionStore) can be swapped out, e.g. for a replay
+    def __init__(self, result_queue, logger, config, web_interface=None, clock=arrow.now, positions=None):
         self.result_queue = result_queue
         self.logger = logger
         self.config = config
-        self.web_interface = WebInterface(config["trader"]["user"], config["trader"]["pass"])
-        self.position_db = TinyDB("db/positions.db.json")
+        self.clock = clock
+
+        # Positions due within this many seconds of each other are sold together
+        self.close_coalesce_seconds = config["trader"].get("close_coalesce_seconds", 1)
+
+        # Orders go through a pool of broker sessions (see trader/broker.py)
+        if web_interface is None:
+            from trader.broker import Broker
+            web_interface = Broker.from_config(config)
+        self.web_interface = web_interface
+        if positions is None:
+            positions = PositionStore("db/positions.db", legacy_path="db/positions.db.json")
+        self.positions = positions
+
+    def hold_seconds(self, market):
+        return market.get("hold_minutes", self.config["trader"].get("hold_minutes", DEFAULT_HOLD_MINUTES)) * 60
+
+    # Seconds until the next position is due to be sold, or None if none are open
+    def seconds_until_sale(self):
+        expires_at = self.positions.next_expiry()
+        if expires_at is None:
+            return None
+
+        return max(0, expires_at - self.clock().float_timestamp)
 
+    # Sells and archives the positions whose hold time is up, along with any
+    # due within close_coalesce_seconds, in one sell_many call
     def sell_positions(self):
-        q = Query()
-        test_func = lambda closed: not closed
-        docs = self.position_db.search(q.closed.test(test_func))
+        now = self.clock().float_timestamp
+        positions = self.positions.expired(now + self.close_coalesce_seconds)
+        if not positions:
+            return
+
+        for position in positions:
+            self.logger.log("Trader/Seller", "informative", "Selling position for contract %s!", position["contract_id"])
+
+        try:
+            outcomes = self.web_interface.sell_many([(position["contract_id"], position["side"], position["amount"]) for position in positions])
+        except Exception as e:
+            outcomes = [e] * len(positions)
+
+        # True is sold and None already gone; anything else is retried, as the
+        # position may still be open at the broker
+        for position, outcome in zip(positions, outcomes):
+            if isinstance(outcome, Exception):
+                self.logger.log("Trader/Seller", "error", "Error selling position for contract %s, retrying in %ds: %s", position["contract_id"], SELL_RETRY_SECONDS, str(outcome))
+                self.positions.reschedule(position, now + SELL_RETRY_SECONDS)
+            elif outcome is False:
+                self.logger.log("Trader/Seller", "warning", "Sale rejected for contract %s, retrying in %ds", position["contract_id"], SELL_RETRY_SECONDS)
+                self.positions.reschedule(position, now + SELL_RETRY_SECONDS)
+            else:
+                self.positions.archive(position, now)
+
+    # Places one buy per (result, side) with a single buy_many call, and
+    # records the positions whose orders weren't rejected
+    def buy(self, orders):
+        if not orders:
+            return
 
-        # Sell and remove position if >1hr old
-        for doc in docs:
-            if arrow.get(doc["at"]) < (arrow.now() - datetime.timedelta(hours=1)):
-                self.logger.log("Trader/Seller", "informative", "Selling position for contract " + doc["contract_id"] + "!")
+        outcomes = self.web_interface.buy_many([(result["market"]["contract_id"], side, 1, 50) for result, side in orders])
+        opened_at = self.clock().float_timestamp
 
-                if self.web_interface.have_position_in_market(doc["contract_id"]):
-                    self.web_interface.sell(doc["contract_id"], doc["side"], doc["amount"])
+        for (result, side), outcome in zip(orders, outcomes):
+            contract = result["market"]["contract_id"]
+            mark(result["article"], "order_submitted")
 
-                self.position_db.update({ "closed": True }, eids=[doc.eid])
+            if isinstance(outcome, Exception):
+                self.logger.log("Trader", "error", "Error buying shares for market %s: %s", contract, str(outcome))
+            elif outcome is False:
+                self.logger.log("Trader", "warning", "Order rejected for market %s", contract)
+            else:
+                self.positions.open(contract, side, 1, opened_at, opened_at + self.hold_seconds(result["market"]))
+
+    def sell_if_due(self):
+        due_in = self.seconds_until_sale()
+        if due_in is None or due_in > 0:
+            return
+
+        try:
+            self.sell_positions()
+        except Exception as e:
+            self.logger.log("Trader", "error", "Error selling positions: %s", str(e))
 
     # Make a trade based on the result
     def handle_result(self, result):
+        self.handle_results([result])
+
+    # Makes trades based on a batch of results, sending their orders together
+    def handle_results(self, results):
+        orders = []
+        for result in results:
+            mark(result["article"], "trader_dequeued")
+
+            # Results earlier in the batch count as positions we already have
+            side = self.trade(result, [order[0]["market"]["contract_id"] for order in orders])
+            if side is not None:
+                orders.append((result, side))
+
+        self.buy(orders)
+
+        # Only report the timestamps the analysis stage hasn't already
+        for result in results:
+            timings = result["article"]["timings"]
+            self.logger.metric("Trader", "timings", {name: timings[name] for name in TRADER_TIMINGS if name in timings})
+
+    # Returns the side to buy for the result, or None. pending are contracts
+    # with orders about to be placed.
+    def trade(self, result, pending=()):
         contract = result["market"]["contract_id"]
 
-        self.logger.log("Trader", "informative", "Received article for market " + contract + ": " + result["article"]["title"])
+        self.logger.log("Trader", "informative", "Received article for market %s: %s", contract, result["article"]["title"])
 
         what_to_buy = None
         scores = list(result["score"])
@@ -40,45 +143,67 @@ class Trader:
 
         # Skip if we already have a position in this market
         # (prevents duplicate trades)
-        if self.web_interface.have_position_in_market(contract):
-            self.logger.log("Trader", "informative", "Skipping article, already have position in market " + contract + ": " + result["article"]["title"])
+        if self.positions.has_open(contract) or contract in pending:
+            self.logger.log("Trader", "informative", "Skipping article, already have position in market %s: %s", contract, result["article"]["title"])
             return
 
         # Make a trade if the score > 0.5 (i.e. we're confident)
         if scores[max_index] > 0.5:
             if max_index == 2:
-                self.logger.log("Trader", "informative", "Buying YES shares for market " + contract + ": " + result["article"]["title"])
-                self.position_db.insert({
-                    "contract_id": contract,
-                    "side": WebInterface.YES,
-                    "amount": 1,
-                    "closed": False,
-                    "at": str(arrow.now())
-                })
-                self.web_interface.buy(contract, WebInterface.YES, 1, 50)
+                self.logger.log("Trader", "informative", "Buying YES shares for market %s: %s", contract, result["article"]["title"])
+                return self.web_interface.YES
             elif max_index == 1:
-                self.logger.log("Trader", "informative", "Buying NO shares for market " + contract + ": " + result["article"]["title"])
-                self.position_db.insert({
-                    "contract_id": contract,
-                    "side": WebInterface.NO,
-                    "amount": 1,
-                    "closed": False,
-                    "at": str(arrow.now())
-                })
-                self.web_interface.buy(contract, WebInterface.NO, 1, 50)
+                self.logger.log("Trader", "informative", "Buying NO shares for market %s: %s", contract, result["article"]["title"])
+                return self.web_interface.NO
             else:
                 # The machine learning algorithm thinks this article is irrelevant,
                 # so skip it.
-                self.logger.log("Trader", "informative", "Not buying shares for market " + contract + ": " + result["article"]["title"])
+                self.logger.log("Trader", "informative", "Not buying shares for market %s: %s", contract, result["article"]["title"])
 
-    # Entry point for process
-    def run(self):
+    # Entry point for process; runs until stopping is set
+    def run(self, heartbeat=None, stopping=None):
         try:
-            while True:
-                result = self.result_queue.get(True)     # Continuously gets results from the queue
-                self.handle_result(result)             # Makes trades based on the result
+            while stopping is None or not stopping.is_set():
+                if heartbeat is not None:
+                    heartbeat.beat()
+
+                self.sell_if_due()
+                self.logger.flush()
+
+                # Wake up when the next position is due, not just on results
+                timeout = HEARTBEAT_INTERVAL
+                due_in = self.seconds_until_sale()
+                if due_in is not None:
+                    timeout = min(timeout, due_in)
+
+                try:
+                    results = [self.result_queue.get(True, timeout)]     # Continuously gets results from the queue
+                except queue.Empty:
+                    continue
+
+                # Take whatever else is already waiting, so independent
+                # orders go out together
+                while len(results) < MAX_ORDER_BATCH:
+                    try:
+                        results.append(self.result_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                try:
+                    self.handle_results(results)             # Makes trades based on the results
+                except Exception as e:
+                    self.logger.log("Trader", "error", "Error handling results for market(s) %s: %s", ", ".join(result["market"]["contract_id"] for result in results), str(e))
         except Exception as e:
-            self.logger.log("Trader", "error", "Crashed: " + str(e))
+            self.logger.log("Trader", "error", "Crashed: %s", str(e))
+            raise
+        finally:
+            # The browser belongs to this process, so it's closed here
+            try:
+                self.quit()
+            except Exception as e:
+                self.logger.log("Trader", "error", "Error closing the browser: %s", str(e))
+            self.logger.flush()
 
     def quit(self):
         self.web_interface.quit()
+        self.positions.close()
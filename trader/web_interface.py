@@ -8,8 +8,13 @@ class WebInterface():
     YES = 1
     NO = 0
 
-    def __init__(self, user, pwd):
-        self.webdriver = webdriver.Chrome()
+    # headless runs Chrome without a display, so no Xvfb is needed
+    def __init__(self, user, pwd, headless=True):
+        options = webdriver.ChromeOptions()
+        if headless:
+            options.add_argument("--headless")
+            options.add_argument("--window-size=800,800")
+        self.webdriver = webdriver.Chrome(chrome_options=options)
         self.se = SeElements(self.webdriver)
 
     def quit(self):
@@ -26,3 +31,14 @@ class WebInterface():
     def sell(self, contract, option, quantity):
         # TODO
         pass
+
+    # Places several orders in this browser session, one after another.
+    # orders are (contract, option, quantity, max_price); returns each
+    # order's result.
+    def buy_many(self, orders):
+        return [self.buy(*order) for order in orders]
+
+    # orders are (contract, option, quantity); positions that are already
+    # gone are skipped
+    def sell_many(self, orders):
+        return [self.sell(*order) if self.have_position_in_market(order[0]) else None for order in orders]
@@ -0,0 +1,59 @@
+import collections
+
+from bounded_queue import BoundedQueue
+from ring_buffer import RingBuffer
+
+
+# Queue of articles or results between stages, sent as compact frames (see
+# messages.py) over a shared-memory RingBuffer, or over a BoundedQueue when
+# config["queues"][name]["transport"] is "queue".
+# put_many sends a batch as one frame; get hands items out one at a time,
+# keeping the rest of a frame in this process. qsize() counts frames.
+class MessageQueue:
+
+    def __init__(self, channel, codec):
+        self.channel = channel
+        self.codec = codec
+        self.pending = collections.deque()
+
+    # Reads config["queues"][name]: {"size", "policy", "transport", "ring_bytes"}
+    @classmethod
+    def from_config(cls, config, name, codec):
+        queue_config = config.get("queues", {}).get(name, {})
+        size = queue_config.get("size", 0)
+        policy = queue_config.get("policy", "block")
+
+        if queue_config.get("transport", "ring") == "ring":
+            channel = RingBuffer(queue_config.get("ring_bytes", 4 * 1024 * 1024), size, policy)
+        else:
+            channel = BoundedQueue(size, policy)
+        return cls(channel, codec)
+
+    @property
+    def dropped(self):
+        return self.channel.dropped
+
+    # Returns True if the item was queued, False if it was shed
+    def put(self, item):
+        return self.put_many([item])
+
+    def put_many(self, items):
+        if not items:
+            return True
+
+        return self.channel.put(self.codec.encode(items))
+
+    def get(self, block=True, timeout=None):
+        if not self.pending:
+            self.pending.extend(self.codec.decode(self.channel.get(block, timeout)))
+
+        return self.pending.popleft()
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self):
+        return self.channel.qsize() + len(self.pending)
+
+    def empty(self):
+        return not self.pending and self.channel.empty()